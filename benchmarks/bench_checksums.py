@@ -0,0 +1,44 @@
+"""Time the BSD checksum computed as files are downloaded, by the `sum`
+command and by the interpreter.
+
+Run from the repository root with::
+
+    python -m benchmarks.bench_checksums [megabytes]
+
+.. moduleauthor:: Tyler Biggs <biggstd@gmail.com>
+"""
+
+# General Python imports.
+import os
+import sys
+import time
+
+# Inter-package imports.
+from pynome.checksums import BSDSum, SumProcess
+
+
+def time_checksum(checksum, blocks):
+    """Feed every block to a checksum, and return the seconds taken along
+    with its value."""
+    start = time.perf_counter()
+
+    for block in blocks:
+        checksum.update(block)
+
+    value = checksum.value()
+    return time.perf_counter() - start, value
+
+
+def main(megabytes=32):
+    # Feed the data in the block size used by ftplib.FTP.retrbinary().
+    data = os.urandom(megabytes * 2**20)
+    blocks = [data[i:i + 8192] for i in range(0, len(data), 8192)]
+
+    for name, checksum_class in (('sum', SumProcess), ('BSDSum', BSDSum)):
+        seconds, value = time_checksum(checksum_class(), blocks)
+        print(f'{name:<8} {megabytes} MB in {seconds:.2f}s '
+              f'({megabytes / seconds:.1f} MB/s), checksum {value}')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 32)
@@ -0,0 +1,71 @@
+"""Compare the cost of crawl results held as Assembly models and as
+AssemblyRecords.
+
+Run from the repository root with::
+
+    python -m benchmarks.bench_records [count]
+
+.. moduleauthor:: Tyler Biggs <biggstd@gmail.com>
+"""
+
+# General Python imports.
+import gc
+import sys
+import time
+import tracemalloc
+
+# Inter-package imports.
+from pynome.assembly import Assembly, AssemblyRecord
+
+
+def make_kwargs(count):
+    """Build the keyword arguments of `count` parsed fasta files, in the
+    form produced by `EnsemblDatabase.record_to_assembly`."""
+    return [{
+        'source_database': 'ensembl',
+        'species': f'species{i}',
+        'genus': 'genus',
+        'intraspecific_name': f'strain_{i}' if i % 2 else None,
+        'assembly_id': f'ASM{i}v1',
+        'version': 'release-38',
+        'fasta_remote_path': f'pub/fungi/release-38/fasta/genus_species{i}/'
+                             f'dna/Genus_species{i}.ASM{i}v1.dna.toplevel'
+                             '.fa.gz',
+        'fasta_remote_size': 1000 + i,
+    } for i in range(count)]
+
+
+def measure(cls, all_kwargs):
+    """Create an instance of `cls` for every set of kwargs.
+
+    :returns:
+        A tuple of the elapsed seconds and the peak bytes allocated.
+    """
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+
+    instances = [cls(**kwargs) for kwargs in all_kwargs]
+
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    del instances
+    return elapsed, peak
+
+
+def main(count=100000):
+    all_kwargs = make_kwargs(count)
+
+    print(f'{count} crawl results')
+    print(f'{"type":<16}{"seconds":>10}{"us/record":>12}{"bytes/record":>15}')
+
+    for cls in (Assembly, AssemblyRecord):
+        elapsed, peak = measure(cls, all_kwargs)
+        print(f'{cls.__name__:<16}{elapsed:>10.3f}'
+              f'{elapsed / count * 1e6:>12.2f}{peak / count:>15.0f}')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,58 @@
+"""Time catalog searches on a large, synthetic catalog.
+
+Run from the repository root with::
+
+    python -m benchmarks.bench_search [count]
+
+.. moduleauthor:: Tyler Biggs <biggstd@gmail.com>
+"""
+
+# General Python imports.
+import sys
+import time
+import random
+import string
+
+# Inter-package imports.
+from pynome.assembly import AssemblyRecord
+from pynome.assemblystorage import AssemblyStorage
+
+
+def random_word(rng, length):
+    """Return a random lowercase word."""
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(length))
+
+
+def main(count=50000):
+    rng = random.Random(0)
+    genera = [random_word(rng, 9).capitalize() for _ in range(count // 20)]
+
+    storage = AssemblyStorage()
+    storage.upsert_assemblies(
+        AssemblyRecord(
+            genus=rng.choice(genera),
+            species=random_word(rng, 10),
+            intraspecific_name=random_word(rng, 6) if i % 3 else None,
+            assembly_id=f'ASM{i}v1')
+        for i in range(count))
+
+    genus = genera[0].lower()
+    queries = {
+        'prefix': genus[:4],
+        'genus and assembly id': f'{genus} asm1',
+        'misspelled': genus[:3] + genus[4:],
+    }
+
+    print(f'{count} assemblies')
+
+    for label, query in queries.items():
+        start = time.perf_counter()
+        for _ in range(20):
+            results = storage.search(query)
+        elapsed = (time.perf_counter() - start) / 20
+        print(f'{label:<24}{query!r:<24}{len(results):>4} results'
+              f'{elapsed * 1000:>10.2f} ms')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
@@ -12,7 +12,8 @@ import os
 import logging
 
 # SQLAlchemy imports.
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Integer, String, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.ext.hybrid import hybrid_property
 
@@ -20,6 +21,25 @@ from sqlalchemy.ext.hybrid import hybrid_property
 Base = declarative_base()
 
 
+def assembly_names(species, genus, assembly_id, intraspecific_name=None):
+    """Build the identifier strings of an assembly.
+
+    :returns:
+        A tuple of the base filename (the primary key used by the SQLite
+        database), the base filepath and the taxonomy name.
+    """
+    if intraspecific_name is not None:
+        name = '_'.join((genus, species, intraspecific_name))
+
+    else:
+        name = '_'.join((genus, species))
+
+    base_filename = '-'.join((name, assembly_id))
+    base_filepath = os.path.join(name, assembly_id)
+
+    return base_filename, base_filepath, name
+
+
 class Assembly(Base):
     """Models a genome assembly for use by Pynome.
 
@@ -37,18 +57,21 @@ class Assembly(Base):
     # self.column_name, that is, the same as other attributes.
     base_filename = Column(String, primary_key=True)
     base_filepath = Column(String)
-    species = Column(String)
-    genus = Column(String)
+    species = Column(String, index=True)
+    genus = Column(String, index=True)
     intraspecific_name = Column(String)
     assembly_id = Column(String)
-    version = Column(String)
+    # The release of the source database the assembly was found in. It is
+    # part of the primary key, so that several releases can be catalogued
+    # side by side. Assemblies without a release use an empty string.
+    version = Column(String, primary_key=True, default='')
     gff3_remote_path = Column(String)
     gff3_remote_size = Column(Integer)
     fasta_remote_path = Column(String)
     fasta_remote_size = Column(Integer)
     taxonomy_name = Column(String)
-    taxonomy_id = Column(String)
-    source_database = Column(String)
+    taxonomy_id = Column(String, index=True)
+    source_database = Column(String, index=True)
 
     def __init__(self, species, genus, assembly_id, intraspecific_name=None,
                  **kwargs):
@@ -71,28 +94,22 @@ class Assembly(Base):
         self.genus = genus
         self.assembly_id = assembly_id
         self.intraspecific_name = intraspecific_name
-        self.base_filename = None
 
-        if intraspecific_name is not None:
-            name = '_'.join((
-                self.genus,
-                self.species,
-                self.intraspecific_name))
-
-        else:
-            name = '_'.join((self.genus, self.species))
-
-        self.base_filename = '-'.join((name, self.assembly_id))
-        self.taxonomy_name = name
-
-        self.base_filepath = os.path.join(name, self.assembly_id)
-        # logging.warning(f'base filepath: {self.base_filepath}')
+        (self.base_filename,
+         self.base_filepath,
+         self.taxonomy_name) = assembly_names(
+             species, genus, assembly_id, intraspecific_name)
 
         # Iterater through the kwargs parameter and set the SQLAlchemy
         # table columns accordingly.
         for key, value in kwargs.items():
             setattr(self, key, value)
 
+        # The version is part of the primary key, so an assembly without
+        # one must match its stored row when it is merged into a session.
+        if self.version is None:
+            self.version = ''
+
     def __repr__(self):
         """The string representation of an Assembly object.
         """
@@ -113,3 +130,114 @@ class Assembly(Base):
             f'Source Database:       {self.source_database}\n'
         )
         return out_str
+
+
+# The names of every column of the Assemblies table.
+ASSEMBLY_COLUMNS = tuple(column.name for column in Assembly.__table__.columns)
+
+
+class AssemblyRecord:
+    """A lightweight record of an assembly, as found by a crawl.
+
+    Records have the same attributes as the Assembly model, but are plain
+    slotted objects without any SQLAlchemy instrumentation, so they are much
+    cheaper to create and hold. Assembly objects are only built from them
+    when they are saved, see `to_assembly()`.
+    """
+
+    __slots__ = ASSEMBLY_COLUMNS
+
+    def __init__(self, species, genus, assembly_id, intraspecific_name=None,
+                 **kwargs):
+        """Initialization of the AssemblyRecord class. Takes the same
+        arguments as Assembly.
+        """
+        for column in ASSEMBLY_COLUMNS:
+            setattr(self, column, kwargs.pop(column, None))
+
+        self.species = species
+        self.genus = genus
+        self.assembly_id = assembly_id
+        self.intraspecific_name = intraspecific_name
+
+        (self.base_filename,
+         self.base_filepath,
+         self.taxonomy_name) = assembly_names(
+             species, genus, assembly_id, intraspecific_name)
+
+        # Any remaining keywords are not columns of the Assemblies table.
+        if kwargs:
+            raise AttributeError(
+                f'AssemblyRecord has no attribute {next(iter(kwargs))!r}')
+
+    def __repr__(self):
+        """The string representation of an AssemblyRecord object.
+        """
+        return f'AssemblyRecord({self.base_filename!r})'
+
+    def as_dict(self):
+        """Return the record as a dictionary of column values."""
+        return assembly_row(self)
+
+    def to_assembly(self):
+        """Build an Assembly from the record.
+
+        Only columns with a value are set on the Assembly, so merging it
+        into a session does not overwrite existing values with `None`.
+        """
+        kwargs = {column: value for column, value in self.as_dict().items()
+                  if value is not None}
+        kwargs['intraspecific_name'] = self.intraspecific_name
+
+        return Assembly(**kwargs)
+
+
+def assembly_row(assembly):
+    """Return the column values of an Assembly, AssemblyRecord or
+    dictionary as a dictionary, with `None` for any column without a value.
+
+    The `version` of an assembly without one is an empty string, as it is
+    part of the primary key.
+    """
+    if isinstance(assembly, dict):
+        row = {column: assembly.get(column) for column in ASSEMBLY_COLUMNS}
+    else:
+        row = {column: getattr(assembly, column, None)
+               for column in ASSEMBLY_COLUMNS}
+
+    if row['version'] is None:
+        row['version'] = ''
+
+    return row
+
+
+def assembly_upsert_statement():
+    """Build an upsert of rows into the Assemblies table.
+
+    A row whose `base_filename` and `version` are already present updates
+    the existing row. Only the non-null values of the new row replace existing values,
+    so a fasta-only row and a gff3-only row of an assembly combine into one.
+    """
+    table = Assembly.__table__
+    statement = sqlite_insert(table)
+
+    return statement.on_conflict_do_update(
+        index_elements=list(table.primary_key.columns),
+        set_={column.name: func.coalesce(
+                  statement.excluded[column.name], column)
+              for column in table.columns if not column.primary_key})
+
+
+def as_assembly(assembly):
+    """Return an Assembly for either an Assembly or an AssemblyRecord.
+
+    The `version` of an assembly without one is set to an empty string, as
+    in `assembly_row()`.
+    """
+    if isinstance(assembly, AssemblyRecord):
+        return assembly.to_assembly()
+
+    if assembly.version is None:
+        assembly.version = ''
+
+    return assembly
@@ -10,9 +10,11 @@
 
 # Import general python packages.
 import abc
+import logging
 
 # Inter-package imports.
 from pynome.assembly import Assembly
+from pynome.assembly import AssemblyRecord
 
 
 class AssemblyDatabase(abc.ABC):
@@ -20,6 +22,11 @@ class AssemblyDatabase(abc.ABC):
 
     .. warning:: This class cannot be directly instantiated.
     """
+
+    # The catalog columns needed by `download()`. If `None`, whole Assembly
+    # objects are loaded.
+    download_fields = None
+
     def __init__(self, name, url, description, assemblies=None):
         """Initialization function, set up and assign attributes.
         """
@@ -49,13 +56,15 @@ class AssemblyDatabase(abc.ABC):
         """The setter for the assemblies list.
 
         Ensures that all objects passed to / stored in this
-        private attribute are instances of the Assembly class.
+        private attribute are instances of the Assembly or AssemblyRecord
+        classes.
         """
         # If the value is not empty and is can be iterated,
         # check to see if each internal value is an Assembly object.
         # If so, assign them to the private self.__assemblies attribute.
         if val is not None and hasattr(val, '__iter__'):
-            if val == [] or all(isinstance(x, Assembly) for x in val):
+            if val == [] or all(isinstance(x, (Assembly, AssemblyRecord))
+                                for x in val):
                 self.__assemblies = list(val)
 
         # Otherwise, raise an error complaining about invalid attributes.
@@ -70,9 +79,121 @@ class AssemblyDatabase(abc.ABC):
         """
         pass
 
+    def iter_crawl(self, *args, **kwargs):
+        """Crawl the database and yield each assembly found.
+
+        Child classes should override this with a crawl that yields
+        assemblies as they are found. This default runs `crawl()` and then
+        yields the contents of the assemblies list.
+        """
+        self.crawl(*args, **kwargs)
+        for assembly in self.assemblies:
+            yield assembly
+
     def list_assemblies(self):
         """Returns a list of all assembly objects within the assemblies list.
         """
         # Return a list generator containing every object within the
         # self.__assemblies list.
         return [a for a in self.__assemblies]
+
+
+class AssemblyCoalescer:
+    """Combines the separate files found for each assembly into one record.
+
+    A crawl finds the fasta and gff3 files of a genome separately. Records
+    are indexed by their `base_filename` until every expected file type has
+    been seen, at which point the combined record is emitted. Only records
+    still waiting on a partner are held in memory.
+
+    Records that never find their partner are emitted by `flush()`, and are
+    listed in `incomplete` along with the file types they are missing.
+    """
+
+    def __init__(self, kinds=('fasta', 'gff3')):
+        """Initialization of the AssemblyCoalescer class.
+
+        :param [kinds]:
+            The file types expected for every assembly. Each type must have
+            matching `<kind>_remote_path` and `<kind>_remote_size`
+            attributes.
+        """
+        self.kinds = tuple(kinds)
+        self.incomplete = list()
+
+        # Define private attributes of the class.
+        self._pending = dict()
+
+    def missing_kinds(self, record):
+        """Return a list of the file types a record has no path for."""
+        return [kind for kind in self.kinds
+                if getattr(record, f'{kind}_remote_path', None) is None]
+
+    def add(self, record):
+        """Add a record to the index.
+
+        :param record:
+            An Assembly or AssemblyRecord with the path and size of one or
+            more files.
+
+        :returns:
+            The combined record if every file type has now been found,
+            otherwise `None`.
+        """
+        key = record.base_filename
+        pending = self._pending.get(key)
+
+        if pending is None:
+            if not self.missing_kinds(record):
+                return record
+            self._pending[key] = record
+            return None
+
+        # Copy the files found by this record onto the pending one.
+        for kind in self.kinds:
+            path = getattr(record, f'{kind}_remote_path', None)
+            if path is not None:
+                setattr(pending, f'{kind}_remote_path', path)
+                setattr(pending, f'{kind}_remote_size',
+                        getattr(record, f'{kind}_remote_size', None))
+
+        if self.missing_kinds(pending):
+            return None
+
+        return self._pending.pop(key)
+
+    def flush(self):
+        """Return every record still waiting on a partner, and record them
+        as incomplete.
+
+        :returns:
+            A list of the incomplete records.
+        """
+        pending = list(self._pending.values())
+        self._pending = dict()
+
+        for record in pending:
+            missing = self.missing_kinds(record)
+            self.incomplete.append((record.base_filename, missing))
+            logging.warning(
+                f'{record.base_filename} has no {" or ".join(missing)} file.')
+
+        return pending
+
+    def coalesce(self, records):
+        """Combine the records of an iterable, such as a running crawl.
+
+        :param records:
+            An iterable of records.
+
+        :returns:
+            A generator of combined records. Complete records are yielded as
+            soon as their last file is found, incomplete ones at the end.
+        """
+        for record in records:
+            combined = self.add(record)
+            if combined is not None:
+                yield combined
+
+        for record in self.flush():
+            yield record
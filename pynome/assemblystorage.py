@@ -9,17 +9,157 @@
 
 # General Python imports.
 import os
+import time
+import datetime
+import logging
 import subprocess
 import collections
+import concurrent.futures
 
 # SQLAlchemy imports.
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import bindparam, func, select, update
 
 # Inter-package imports.
 from pynome.assembly import Base
 from pynome.assembly import Assembly
+from pynome.assembly import ASSEMBLY_COLUMNS
+from pynome.assembly import as_assembly
+from pynome.assembly import assembly_row
+from pynome.assembly import assembly_upsert_statement
+from pynome.blobstore import BlobStore
+from pynome.catalog import Catalog
+from pynome.checksums import FileChecksum
+from pynome.export import read_catalog, write_catalog
+from pynome.crawlstate import SnapshotStore
+from pynome.migrations import migrate
+from pynome.pipeline import DECOMPRESS_STAGE, PREPARE_STAGES, PipelineState
+from pynome.pipeline import file_fingerprint, stage_outputs
+from pynome.search import search_assemblies
 from pynome.sra import download_sra_json
+from pynome.utils import iter_batches
+
+
+# The outcome of crawling one source with `AssemblyStorage.crawl_all()`.
+# The `error` is `None` unless the crawl or the save of the source failed.
+CrawlResult = collections.namedtuple(
+    'CrawlResult', 'source assemblies crawl_seconds save_seconds error')
+
+
+def format_crawl_summary(results):
+    """Format the results of `AssemblyStorage.crawl_all()` as a table.
+
+    :param results:
+        A list of CrawlResult tuples.
+
+    :returns:
+        A string with one line per source.
+    """
+    lines = [f'{"source":<20}{"assemblies":>12}{"crawl (s)":>12}'
+             f'{"save (s)":>12}  status']
+
+    for result in results:
+        status = 'ok' if result.error is None else f'failed: {result.error}'
+        lines.append(
+            f'{result.source:<20}{result.assemblies:>12}'
+            f'{result.crawl_seconds:>12.1f}{result.save_seconds:>12.1f}'
+            f'  {status}')
+
+    return '\n'.join(lines)
+
+# The columns of the catalog used to prepare an assembly.
+PREPARE_FIELDS = ('base_filename', 'base_filepath')
+
+# The remote file columns compared between releases by
+# `AssemblyStorage.diff_releases()`.
+DIFF_FIELDS = ('fasta_remote_path', 'fasta_remote_size',
+               'gff3_remote_path', 'gff3_remote_size')
+
+# The outcome of `AssemblyStorage.diff_releases()`. Each field is a sorted
+# list of base filenames.
+ReleaseDiff = collections.namedtuple('ReleaseDiff', 'added removed changed')
+
+
+def release_relative_path(path, version):
+    """Replace the release within a remote path, so that the paths of two
+    releases can be compared.
+
+    Both the release directory, such as 'release-38', and the release
+    number within the filename, such as the '.38.' of
+    'Saccharomyces_cerevisiae.R64-1-1.38.gff3.gz', are replaced.
+    """
+    if path is None:
+        return None
+
+    parts = ['{release}' if part == version else part
+             for part in path.split('/')]
+
+    # Ensembl gives the release number, without its 'release-' prefix,
+    # after the assembly name of gff3 files. Only the last occurrence is
+    # replaced, in case the assembly name itself is a number.
+    number = version.rpartition('-')[2]
+    head, separator, tail = parts[-1].rpartition(f'.{number}.')
+
+    if separator:
+        parts[-1] = f'{head}.{{release}}.{tail}'
+
+    return '/'.join(parts)
+
+
+def assembly_column(field):
+    """Return the Assembly column attribute with the given name."""
+    if field not in ASSEMBLY_COLUMNS:
+        raise AttributeError(f'Assembly has no column {field!r}.')
+    return getattr(Assembly, field)
+
+
+def assembly_criteria(filters):
+    """Build the where clauses of a catalog query.
+
+    :param filters:
+        A dictionary of ``{column name: value}``. A value of `None` matches
+        null columns, and a list, tuple or set matches any of its members.
+        Every filter must match.
+
+    :returns:
+        A list of SQLAlchemy expressions.
+    """
+    criteria = list()
+
+    for field, value in filters.items():
+        column = assembly_column(field)
+
+        if value is None:
+            criteria.append(column.is_(None))
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            criteria.append(column.in_(value))
+        else:
+            criteria.append(column == value)
+
+    return criteria
+
+
+def assembly_ordering(order_by):
+    """Build the order by clauses of a catalog query.
+
+    :param order_by:
+        A column name, or a list of column names. Names prefixed with '-'
+        are sorted in descending order.
+
+    :returns:
+        A list of SQLAlchemy expressions.
+    """
+    if isinstance(order_by, str):
+        order_by = [order_by]
+
+    ordering = list()
+
+    for field in order_by:
+        if field.startswith('-'):
+            ordering.append(assembly_column(field[1:]).desc())
+        else:
+            ordering.append(assembly_column(field))
+
+    return ordering
 
 
 class AssemblyStorage:
@@ -32,13 +172,18 @@ class AssemblyStorage:
             self,
             sqlite_path=None,
             base_path=None,
-            irods_base_path=None):
+            irods_base_path=None,
+            batch_size=1000,
+            busy_timeout=30000):
         """Initialization of the AssemblyStorage class.
 
         :param [sqlite_path]:
-            The local path to the sqlite database used to store metadata of
-            the found genome assemblies. If no value is given, this defaults
-            to `"sqlite:///genomes.db"`.
+            The local directory of the sqlite database used to store
+            metadata of the found genome assemblies, in which the file
+            "Genome.db" is created. A SQLite url, such as
+            `"sqlite:///genomes.db"`, is used as given, and `":memory:"`
+            gives an in-memory database. If no value is given, the
+            database is created in memory.
 
         :param base_path:
             The local filepath where Pynome will save its files. If no value
@@ -47,12 +192,24 @@ class AssemblyStorage:
 
         :param irods_base_path:
             The base path to be used with iRODs integration.
+
+        :param [batch_size]:
+            The number of assemblies saved in each transaction when saving a
+            stream of assemblies.
+
+        :param [busy_timeout]:
+            The number of milliseconds to wait for a lock on the SQLite
+            database held by another process.
         """
 
         # If the sqlite path is not give, create one in memory.
-        if sqlite_path is None:
+        if sqlite_path is None or sqlite_path == ':memory:':
             sqlite_path = "sqlite://"
 
+        # A SQLite url, including an in-memory one, is used as it is.
+        elif sqlite_path.startswith('sqlite:'):
+            pass
+
         # Otherwise, create the intermediate path, then append the
         # database filename to the class attribute.
         else:
@@ -72,54 +229,262 @@ class AssemblyStorage:
         # Create sub-paths for each type of file to be downloaded.
         self.base_genome_path = os.path.join(self.base_path, 'Genome')
         self.base_sra_path = os.path.join(self.base_path, 'RNA-Seq')
+        self.base_blob_path = os.path.join(self.base_path, 'Blobs')
 
         # Define the public attributes of the class.
         self.sources = dict()
 
         # self.sqlite_session = sqlite_session
         self.irods_base_path = irods_base_path
-        Session = sessionmaker()
+        self.batch_size = batch_size
 
-        # Prepare the SQLite engine and session.
-        self.engine = create_engine(self.sqlite_path)
-        # Create the tables.
+        # Prepare the SQLite engine, sessions and writer.
+        self.catalog = Catalog(self.sqlite_path, busy_timeout)
+        # Create the tables, then upgrade those of an existing catalog.
         Base.metadata.create_all(self.engine)
-        self.session = Session(bind=self.engine)
+        migrate(self.engine)
+
+        # Downloaded and prepared files are deduplicated by the blob store.
+        self.blobs = BlobStore(self.base_blob_path, self.catalog)
+
+    @property
+    def engine(self):
+        """The SQLAlchemy engine of the local SQLite database."""
+        return self.catalog.engine
+
+    @property
+    def session(self):
+        """The SQLAlchemy session of the calling thread.
+
+        Each thread has its own session, which is used to read from the
+        local SQLite database. Writes are made with `write()`.
+        """
+        return self.catalog.session
+
+    def write(self, function, *args, **kwargs):
+        """Run a write to the local SQLite database, and wait for it.
+
+        Writes from every thread are run, one at a time, by a single writer
+        thread, see `pynome.catalog.CatalogWriter`.
+
+        :param function:
+            A callable, which is passed a session followed by `args` and
+            `kwargs`. The session is committed once it returns.
+
+        :returns:
+            The value returned by `function`.
+        """
+        return self.catalog.write(function, *args, **kwargs)
+
+    def close(self):
+        """Finish any pending writes, and close the local SQLite database."""
+        self.catalog.close()
 
     def save_assembly(self, new_assembly):
         """Save a given assembly object to the SQLite database.
 
         :param new_assembly:
-            A pynome.Assembly object to be saved in the local sql database.
+            A pynome.Assembly or pynome.AssemblyRecord object to be saved in
+            the local sql database.
         """
-        self.session.merge(new_assembly)
-        self.session.commit()
+        self.write(lambda session: session.merge(as_assembly(new_assembly)))
 
-    def save_assemblies(self):
+    def save_assemblies(self, bulk=True, batch_size=None):
         """Save a list of assembly objects to the SQLite database.
+
+        :param [bulk]:
+            If `True`, the assemblies of each source are written with
+            `upsert_assemblies()`. Otherwise each assembly is merged and
+            committed individually by `save_assembly()`.
+
+        :param [batch_size]:
+            The number of assemblies per transaction of a bulk save.
+            Defaults to `self.batch_size`.
         """
         for src_name, source in self.sources.items():
-            for assembly in source.assemblies:
-                self.save_assembly(assembly)
+            if bulk:
+                self.upsert_assemblies(source.assemblies, batch_size)
+            else:
+                for assembly in source.assemblies:
+                    self.save_assembly(assembly)
+
+    def upsert_assemblies(self, assemblies, batch_size=None):
+        """Write assemblies to the SQLite database in batched transactions.
+
+        Each batch is written by a single ``INSERT ... ON CONFLICT DO
+        UPDATE`` statement, see `assembly_upsert_statement()`, and then
+        committed. No rows are read back from the database.
+
+        :param assemblies:
+            An iterable of pynome.Assembly or pynome.AssemblyRecord objects,
+            or of dictionaries of column values.
+
+        :param [batch_size]:
+            The number of assemblies per transaction. Defaults to
+            `self.batch_size`.
+
+        :returns:
+            The number of assemblies written.
+        """
+        if batch_size is None:
+            batch_size = self.batch_size
+
+        statement = assembly_upsert_statement()
+        saved_count = 0
+
+        for batch in iter_batches(assemblies, batch_size):
+            self.write(
+                lambda session, rows: session.execute(statement, rows),
+                [assembly_row(assembly) for assembly in batch])
+            saved_count += len(batch)
+
+        return saved_count
+
+    def save_assembly_stream(self, assemblies, batch_size=None):
+        """Save assemblies from an iterable, such as a running crawl, in
+        fixed-size batches. Each batch is committed as soon as it is full,
+        so assemblies are not held in memory until the stream is exhausted.
+
+        :param assemblies:
+            An iterable of pynome.Assembly or pynome.AssemblyRecord objects.
+
+        :param [batch_size]:
+            The number of assemblies per transaction. Defaults to
+            `self.batch_size`.
+
+        :returns:
+            The number of assemblies saved.
+        """
+        return self.upsert_assemblies(assemblies, batch_size)
 
     def update_assembly(self, assembly_base_filename, update_dict):
         """Update the SQLite entry of a given assembly with update_dict.
 
+        The entries of every release of the assembly are updated.
+
         :param assembly_base_filename:
             The base filename and primary key of an assembly.
 
         :param update_dict:
             A dictionary with values to update the SQLite table with.
         """
-        self.session.query(Assembly).filter_by(
-            base_filename=assembly_base_filename).update(update_dict)
+        self.write(lambda session: session.query(Assembly).filter_by(
+            base_filename=assembly_base_filename).update(update_dict))
+
+    def bulk_update_assemblies(self, rows):
+        """Apply many updates to the SQLite database in one transaction.
+
+        Rows are grouped by the fields they update, and each group is sent
+        as a single executemany of an ``UPDATE`` statement. The entries of
+        every release of an assembly are updated.
+
+        :param rows:
+            An iterable of ``(base_filename, update_dict)`` tuples, such as
+            those returned by `EnsemblDatabase.add_taxonomy_ids()`.
+
+        :returns:
+            The number of rows changed.
+        """
+        table = Assembly.__table__
+
+        # Group the updates by the set of fields they change.
+        groups = collections.defaultdict(list)
+        for base_filename, update_dict in rows:
+            fields = tuple(sorted(update_dict))
+            params = {f'new_{field}': value
+                      for field, value in update_dict.items()}
+            params['pk'] = base_filename
+            groups[fields].append(params)
+
+        def update_groups(session):
+            updated_count = 0
+
+            for fields, params in groups.items():
+                statement = update(table).where(
+                    table.c.base_filename == bindparam('pk')).values(
+                        {field: bindparam(f'new_{field}') for field in fields})
+                updated_count += session.execute(statement, params).rowcount
+
+            return updated_count
+
+        # The writer commits every group in one transaction, or none of them.
+        return self.write(update_groups)
+
+    def iter_assemblies(self, fields=None, filters=None, distinct=False,
+                        order_by=None, batch_size=None):
+        """Iterate over the assemblies of the local SQLite database.
+
+        Rows are fetched from the database in batches as they are consumed,
+        so memory use does not grow with the size of the catalog.
+
+        :param [fields]:
+            A list of column names to load. If given, named tuples with only
+            these columns are yielded instead of Assembly objects.
+
+        :param [filters]:
+            A dictionary of ``{column name: value}`` the assemblies must
+            match, see `assembly_criteria()`.
+
+        :param [distinct]:
+            If `True`, duplicate rows are removed. This is most useful along
+            with `fields`.
+
+        :param [order_by]:
+            A column name, or a list of column names, to sort by. Prefix a
+            name with '-' to sort in descending order.
+
+        :param [batch_size]:
+            The number of rows fetched at a time. Defaults to
+            `self.batch_size`.
+
+        :returns:
+            A generator of Assembly objects, or of named tuples if `fields`
+            is given.
+        """
+        if batch_size is None:
+            batch_size = self.batch_size
+
+        if fields is None:
+            statement = select(Assembly)
+        else:
+            statement = select(*[assembly_column(f) for f in fields])
+
+        if filters:
+            statement = statement.where(*assembly_criteria(filters))
+
+        if distinct:
+            statement = statement.distinct()
+
+        if order_by:
+            statement = statement.order_by(*assembly_ordering(order_by))
+
+        result = self.session.execute(
+            statement, execution_options={'yield_per': batch_size})
+
+        if fields is None:
+            result = result.scalars()
+
+        yield from result
+
+    def count_assemblies(self, filters=None):
+        """Count the assemblies of the local SQLite database.
+
+        :param [filters]:
+            A dictionary of ``{column name: value}`` the assemblies must
+            match, see `assembly_criteria()`.
+        """
+        statement = select(func.count()).select_from(Assembly)
+
+        if filters:
+            statement = statement.where(*assembly_criteria(filters))
+
+        return self.session.execute(statement).scalar()
 
     def query_local_assemblies(self):
         """Queries the local SQLite database, and returns a list of all
         assemblies therein.
         """
-        query = self.session.query(Assembly).all()
-        return query
+        return list(self.iter_assemblies())
 
     def query_local_assemblies_by(self, field, value):
         """Query the local SQLite database and return results filtered by the
@@ -131,29 +496,298 @@ class AssemblyStorage:
 
         :param value:
         """
-        query = self.session.query(Assembly).filter(
-            getattr(Assembly, field) == value).all()
-        return query
+        return list(self.iter_assemblies(filters={field: value}))
+
+    def search(self, query, limit=20):
+        """Search the names of the assemblies in the local SQLite database.
+
+        Words are matched as prefixes, and misspelled words are matched to
+        similar names. See `pynome.search.search_assemblies()`.
+
+        :param query:
+            The words to search for, such as 'candida glab'.
+
+        :param [limit]:
+            The maximum number of results.
+
+        :returns:
+            A list of SearchResult tuples, best matches first.
+        """
+        return search_assemblies(self.session, query, limit)
+
+    def export_catalog(self, path, file_format=None, batch_size=None):
+        """Export the Assemblies table to a Parquet, Arrow or TSV file.
+
+        Rows are read from the database and written to the file one chunk
+        at a time, see `pynome.export.write_catalog()`.
+
+        :param path:
+            The path of the file to write.
+
+        :param [file_format]:
+            Either 'parquet', 'arrow' or 'tsv'. By default, it is taken from
+            the suffix of `path`.
+
+        :param [batch_size]:
+            The number of rows per chunk. Defaults to `self.batch_size`.
+
+        :returns:
+            The number of assemblies exported.
+        """
+        if batch_size is None:
+            batch_size = self.batch_size
+
+        rows = self.iter_assemblies(
+            fields=ASSEMBLY_COLUMNS, order_by=['base_filename', 'version'],
+            batch_size=batch_size)
+
+        return write_catalog(rows, path, file_format, batch_size)
+
+    def import_catalog(self, path, file_format=None, batch_size=None):
+        """Load a file written by `export_catalog()` into the Assemblies
+        table.
+
+        Each chunk of the file is upserted in one transaction, so existing
+        assemblies are updated with the non-null values of the file.
+
+        :param path:
+            The path of the file to read.
+
+        :param [file_format]:
+            Either 'parquet', 'arrow' or 'tsv'. By default, it is taken from
+            the suffix of `path`.
+
+        :param [batch_size]:
+            The number of rows per chunk. Defaults to `self.batch_size`.
+
+        :returns:
+            The number of assemblies imported.
+        """
+        if batch_size is None:
+            batch_size = self.batch_size
+
+        imported_count = 0
+
+        for rows in read_catalog(path, file_format, batch_size):
+            imported_count += self.upsert_assemblies(rows, batch_size)
+
+        return imported_count
+
+    def diff_releases(self, source_name, from_version, to_version):
+        """Compare the assemblies of two releases of a source.
+
+        An assembly has changed if the size or the path, with the release
+        masked by `release_relative_path()`, of its fasta or gff3 file
+        differs.
+
+        :param source_name:
+            The name of the source database.
+
+        :param from_version:
+            The earlier release, such as 'release-38'.
+
+        :param to_version:
+            The later release, such as 'release-39'.
+
+        :returns:
+            A ReleaseDiff of the added, removed and changed assemblies.
+        """
+        def load(version):
+            rows = self.iter_assemblies(
+                fields=('base_filename',) + DIFF_FIELDS,
+                filters={'source_database': source_name, 'version': version})
+
+            return {
+                row.base_filename: (
+                    release_relative_path(row.fasta_remote_path, version),
+                    row.fasta_remote_size,
+                    release_relative_path(row.gff3_remote_path, version),
+                    row.gff3_remote_size)
+                for row in rows}
+
+        old, new = load(from_version), load(to_version)
+
+        return ReleaseDiff(
+            added=sorted(new.keys() - old.keys()),
+            removed=sorted(old.keys() - new.keys()),
+            changed=sorted(name for name in new.keys() & old.keys()
+                           if new[name] != old[name]))
+
+    def release_filters(self, source_name, since=None):
+        """Build the filters selecting the current release of a source.
+
+        :param source_name:
+            The name of the source database.
+
+        :param [since]:
+            An earlier release. If given, only the assemblies added or
+            changed since then are selected.
+
+        :returns:
+            A dictionary of filters for `iter_assemblies()`.
+        """
+        version = getattr(self.sources[source_name], 'release_version', None)
+        filters = {'source_database': source_name}
 
-    def crawl(self, assembly_database, urls=None):
+        if version is not None:
+            filters['version'] = version
+
+        if since is not None:
+            if version is None:
+                raise ValueError(f'{source_name} has no release version.')
+
+            diff = self.diff_releases(source_name, since, version)
+            filters['base_filename'] = diff.added + diff.changed
+
+        return filters
+
+    def snapshot_store(self, source_name):
+        """Return a SnapshotStore for the directory listings of a source.
+
+        :param source_name:
+            The name of the source database, as used by `self.sources`.
+        """
+        return SnapshotStore(self.catalog, source_name)
+
+    def crawl(self, assembly_database, urls=None, incremental=False,
+              resume=False):
         """Call the crawl function on the given assembly_database.
 
         This the assembly database should return something for this class
         to handle saving.
+
+        :param assembly_database:
+            The name of the source database to be crawled.
+
+        :param [urls]:
+            A list of urls to start the crawl from.
+
+        :param [incremental]:
+            If `True`, only directories that have changed since the last
+            crawl are listed.
+
+        :param [resume]:
+            If `True`, the last interrupted crawl of this source is resumed.
         """
-        self.sources[assembly_database].crawl(urls)
+        self.sources[assembly_database].crawl(
+            urls,
+            snapshots=self.snapshot_store(assembly_database),
+            incremental=incremental,
+            resume=resume)
+
+    def stream_crawl(self, assembly_database, urls=None, incremental=False,
+                     resume=False):
+        """Crawl the given assembly_database, and save the assemblies to the
+        SQLite database in batches as they are found.
+
+        See `crawl()` for a description of the parameters.
+
+        :returns:
+            The number of assemblies saved.
+        """
+        source = self.sources[assembly_database]
+
+        return self.save_assembly_stream(source.iter_crawl(
+            urls,
+            snapshots=self.snapshot_store(assembly_database),
+            incremental=incremental,
+            resume=resume))
+
+    def crawl_all(self, urls=None, workers=None):
+        """Crawl every AssemblyDatabase in sources concurrently.
+
+        Each source is crawled in its own worker thread. The assemblies of a
+        source are saved to the SQLite database as soon as its crawl
+        finishes, from the calling thread, so a slow source does not hold
+        back the others. A source whose crawl or save fails is logged and
+        skipped, without affecting the rest.
+
+        :param [urls]:
+            A dictionary of ``{source name: list of urls}`` to start the
+            crawl of each source from. Sources not given use their default
+            urls.
+
+        :param [workers]:
+            The maximum number of sources crawled at once. Defaults to the
+            number of sources.
+
+        :returns:
+            A list of CrawlResult tuples, one per source, in the order the
+            sources were added.
+        """
+        if urls is None:
+            urls = dict()
+
+        if workers is None:
+            workers = len(self.sources)
+
+        results = dict()
+
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=max(workers, 1)) as executor:
+
+            futures = {
+                executor.submit(self._crawl_source, source, urls.get(name)):
+                name for name, source in self.sources.items()}
+
+            for future in concurrent.futures.as_completed(futures):
+                name = futures[future]
+                assemblies, crawl_seconds, error = future.result()
+                save_seconds = 0.0
+
+                if error is None:
+                    start = time.perf_counter()
+                    try:
+                        self.save_assembly_stream(assemblies)
+                    except Exception as save_error:
+                        logging.exception(f'Unable to save {name}.')
+                        error = save_error
+                    save_seconds = time.perf_counter() - start
+
+                results[name] = CrawlResult(
+                    source=name,
+                    assemblies=len(assemblies) if error is None else 0,
+                    crawl_seconds=crawl_seconds,
+                    save_seconds=save_seconds,
+                    error=error)
+
+        results = [results[name] for name in self.sources]
+        logging.info('Crawl summary:\n' + format_crawl_summary(results))
+
+        return results
+
+    @staticmethod
+    def _crawl_source(source, urls=None):
+        """Crawl a single source, for use by `crawl_all()`.
+
+        This runs in a worker thread. The assemblies found are returned to
+        be saved by the calling thread.
 
-    def crawl_all(self):
-        """Call the crawl function on every AssemblyDatabase in sources.
+        :returns:
+            A tuple of the list of assemblies found, the time taken in
+            seconds and the exception raised by the crawl, if any.
         """
-        for source in self.sources:
-            source.crawl()
+        start = time.perf_counter()
+        args = () if urls is None else (urls,)
+
+        try:
+            assemblies = list(source.iter_crawl(*args))
+        except Exception as error:
+            logging.exception(
+                f'Crawl of {source.database_name} failed.')
+            return [], time.perf_counter() - start, error
+
+        return assemblies, time.perf_counter() - start, None
 
     def download(self, assemblies):
         """Download a specific set of assemblies from a given list.
 
         :param assemblies:
              A list of Pynome Assembly objects.
+
+        :returns:
+            A list of `pynome.downloader.DownloadResult` tuples, one for
+            each file.
         """
         # Create a dictionary to hold assemblies from different remote sources.
         download_dict = collections.defaultdict(list)
@@ -168,6 +802,8 @@ class AssemblyStorage:
             # Append it to the corresponding list within download_dict.
             download_dict[source_db].append(ga)
 
+        results = list()
+
         # Iterate through the dictionary entries.
         for src, assembly_list in download_dict.items():
 
@@ -175,28 +811,102 @@ class AssemblyStorage:
             assembly_db = self.sources[src]
 
             # Use the database download function to download the assembly.
-            assembly_db.download(assembly_list, self.base_genome_path)
+            results.extend(assembly_db.download(
+                assembly_list, self.base_genome_path, blobs=self.blobs,
+                catalog=self.catalog))
 
-    def download_all(self):
+        self.record_decompressed(results)
+
+        return results
+
+    def download_all(self, since=None):
         """Downloads all assemblies found within each source. The assemblies
         to be downloaded must be present in the local SQLite database.
 
         This call to the AssemblyDatabase child class should download all
         files needed to build complete assembly metadata sets.
+
+        :param [since]:
+            An earlier release. If given, only the assemblies added or
+            changed since then are downloaded.
+
+        :returns:
+            A list of `pynome.downloader.DownloadResult` tuples, one for
+            each file.
         """
+        results = list()
 
-        # For each source, find all assemblies that belong.
+        # For each source, find all assemblies of its current release. Only
+        # the columns the source needs to download them are loaded.
         for src_name, source in self.sources.items():
 
-            src_assemblies = self.query_local_assemblies_by(
-                'source_database', src_name)
+            src_assemblies = self.iter_assemblies(
+                fields=source.download_fields,
+                filters=self.release_filters(src_name, since))
 
-            source.download(src_assemblies, self.base_genome_path)
+            results.extend(source.download(
+                src_assemblies, self.base_genome_path, blobs=self.blobs,
+                catalog=self.catalog))
 
-    def download_all_sra(self):
+        self.record_decompressed(results)
+
+        return results
+
+    def record_decompressed(self, results):
+        """Record the decompress stage as done for each assembly whose files
+        were decompressed as they were downloaded, so that `prepare()` does
+        not decompress them again.
+
+        :param results:
+            A list of `pynome.downloader.DownloadResult` tuples.
+        """
+        stage = DECOMPRESS_STAGE
+        base_paths = set()
+
+        for result in results:
+            if result.status != 'done' or result.decompressed_path is None:
+                continue
+
+            for suffix in stage.outputs:
+                if result.decompressed_path.endswith(suffix):
+                    base_paths.add(result.decompressed_path[:-len(suffix)])
+
+        if not base_paths:
+            return
+
+        state = PipelineState(self.catalog)
+
+        for base_path in sorted(base_paths):
+            outputs = stage_outputs(stage, base_path)
+
+            # The other file of the assembly may not have been downloaded.
+            if len(outputs) < len(stage.outputs):
+                continue
+
+            # The inputs are missing if the compressed files were not kept.
+            inputs = file_fingerprint(
+                [base_path + suffix for suffix in stage.inputs])
+
+            state.record(os.path.basename(base_path), stage.name, 'done',
+                         None, inputs, outputs, datetime.datetime.now())
+
+    def checksum_mismatches(self):
+        """Return the downloads whose last check did not match the checksum
+        listed by their source.
+
+        :returns:
+            A list of `pynome.checksums.FileChecksum` objects.
         """
+        return self.session.query(FileChecksum).filter(
+            FileChecksum.status == 'mismatch').all()
+
+    def download_all_sra(self):
+        """Download the SRA metadata of every taxonomy id in the local SQLite
+        database.
         """
-        tax_ids = [gen.taxonomy_id for gen in self.query_local_assemblies()]
+        tax_ids = [row.taxonomy_id for row in self.iter_assemblies(
+            fields=['taxonomy_id'], distinct=True, order_by='taxonomy_id')
+            if row.taxonomy_id is not None]
 
         download_sra_json(self.base_sra_path, tax_ids)
 
@@ -213,28 +923,45 @@ class AssemblyStorage:
         """
         pass
 
-    def decompress(self, assembly):
-        """Decompress (GNU Unzip) a single set of assembly files.
+    def assembly_path(self, assembly, suffix=''):
+        """Return the local path of an assembly file.
 
         :param assembly:
             An assembly object stored within the local SQLite database.
-        """
 
-        fasta_gz = os.path.join(
+        :param [suffix]:
+            The suffix appended to the base filename, such as '.fa'.
+        """
+        return os.path.join(
             self.base_genome_path,
             assembly.base_filepath,
-            assembly.base_filename + '.fa.gz')
+            assembly.base_filename + suffix)
 
-        gff3_gz = os.path.join(
-            self.base_genome_path,
-            assembly.base_filepath,
-            assembly.base_filename + '.gff3.gz')
+    def decompress(self, assembly):
+        """Decompress (GNU Unzip) a single set of assembly files.
+
+        The compressed files are kept, so that they can be checked against
+        the remote files. Files decompressed as they were downloaded are not
+        decompressed again, see `record_decompressed()`.
+
+        :param assembly:
+            An assembly object stored within the local SQLite database.
+
+        :returns:
+            The `subprocess.CompletedProcess` of the first file that failed
+            to decompress, or of the last file.
+        """
+        for suffix in ('.fa', '.gff3'):
+            gz_file = self.assembly_path(assembly, suffix + '.gz')
 
-        cmd = ['gunzip', '-f', fasta_gz]
-        subprocess.run(cmd)
+            with open(self.assembly_path(assembly, suffix), 'wb') as f:
+                cmd = ['gunzip', '-c', gz_file]
+                completed = subprocess.run(cmd, stdout=f)
 
-        cmd = ['gunzip', '-f', gff3_gz]
-        subprocess.run(cmd)
+            if completed.returncode != 0:
+                break
+
+        return completed
 
     def hisat_index(self, assembly):
         """Generate hisat2 indecies for a given assembly.
@@ -246,6 +973,9 @@ class AssemblyStorage:
 
         :param assembly:
             An assembly object stored within the local SQLite database.
+
+        :returns:
+            The `subprocess.CompletedProcess` of the command.
         """
 
         # Construct the path to the input file.
@@ -268,13 +998,16 @@ class AssemblyStorage:
         cmd = ['hisat2-build', '--quiet', '-p', numb_proc,
                '-f', file_path, out_base]
 
-        subprocess.run(cmd)
+        return subprocess.run(cmd)
 
     def gtf(self, assembly):
         """Generates a `.gtf` file from a corresponding `.gff3` file.
 
         :param assembly:
             An assembly object stored within the local SQLite database.
+
+        :returns:
+            The `subprocess.CompletedProcess` of the command.
         """
         gff3_file = os.path.join(
             self.base_genome_path,
@@ -283,13 +1016,16 @@ class AssemblyStorage:
 
         cmd = ['gffread', '-T', gff3_file + '.gff3', '-o', gff3_file + '.gtf']
 
-        subprocess.run(cmd)
+        return subprocess.run(cmd)
 
     def splice_site(self, assembly):
         """Generates the splice sites of a given assembly from a `.gtf` file.
 
         :param assembly:
             An assembly object stored within the local SQLite database.
+
+        :returns:
+            The `subprocess.CompletedProcess` of the command.
         """
         gft_file = os.path.join(
             self.base_genome_path,
@@ -304,11 +1040,147 @@ class AssemblyStorage:
         with open(splice_output, 'w') as f:
             cmd = ['hisat2_extract_splice_sites.py', gft_file]
 
-            subprocess.run(cmd, stdout=f)
+            return subprocess.run(cmd, stdout=f)
+
+    def prepare(self, assembly, force=False, state=None):
+        """Prepares assembly files for downstream use.
+
+        Each stage of `pynome.pipeline.PREPARE_STAGES` is run in turn, and
+        its result recorded. A stage is skipped if its last run succeeded,
+        its input files are unchanged and its output files still exist. A
+        stage that fails does not stop the stages that follow, but those
+        that use its output will fail or be skipped in turn.
+
+        The outputs of each successful stage are kept by the blob store,
+        keyed by the digests of its inputs. A stage whose inputs are
+        identical to those of a stored run, such as that of the same genome
+        in another release, links those outputs instead of running.
+
+        :param assembly:
+            An assembly object stored within the local SQLite database.
 
-    def prepare(self, assembly):
-        """Prepares assembly files for downstream use."""
-        self.decompress(assembly)
-        self.hisat_index(assembly)
-        self.gtf(assembly)
-        self.splice_site(assembly)
+        :param [force]:
+            If `True`, every stage is run, whether or not it is current.
+
+        :param [state]:
+            A `pynome.pipeline.PipelineState`. One is created if it is not
+            given.
+
+        :returns:
+            `True` if every stage is complete.
+        """
+        if state is None:
+            state = PipelineState(self.catalog)
+
+        base_path = self.assembly_path(assembly)
+        prepared = True
+
+        for stage in PREPARE_STAGES:
+            inputs = file_fingerprint(
+                [base_path + suffix for suffix in stage.inputs])
+
+            if not force and state.is_current(
+                    assembly.base_filename, stage.name, inputs):
+                continue
+
+            started_at = datetime.datetime.now()
+
+            # A stage cannot be run without all of its inputs.
+            if inputs is None:
+                logging.error(
+                    f'Missing inputs of {stage.name} for '
+                    f'{assembly.base_filename}.')
+                state.record(assembly.base_filename, stage.name, 'failed',
+                             None, None, [], started_at)
+                prepared = False
+                continue
+
+            key = self.blobs.stage_key(stage.name, [
+                self.blobs.digest(base_path + suffix)
+                for suffix in stage.inputs])
+
+            if not force:
+                outputs = self.blobs.fetch_outputs(key, base_path)
+
+                if outputs:
+                    logging.info(
+                        f'Reused the {stage.name} outputs of {key} for '
+                        f'{assembly.base_filename}.')
+                    state.record(assembly.base_filename, stage.name, 'done',
+                                 0, inputs, outputs, started_at)
+                    continue
+
+            # Remove old outputs rather than writing through them, as they
+            # may be linked to stored files.
+            for output in stage_outputs(stage, base_path):
+                os.remove(output)
+
+            logging.info(f'Running {stage.name} on {assembly.base_filename}.')
+
+            # A command that cannot be started, such as one that is not
+            # installed, has no exit code.
+            try:
+                exit_code = getattr(self, stage.name)(assembly).returncode
+            except OSError as error:
+                logging.error(f'Unable to run {stage.name}: {error}')
+                exit_code = None
+
+            outputs = stage_outputs(stage, base_path)
+
+            if exit_code == 0 and outputs:
+                status = 'done'
+                self.blobs.store_outputs(key, base_path, outputs)
+            else:
+                status = 'failed'
+                prepared = False
+                logging.error(
+                    f'{stage.name} failed for {assembly.base_filename} with '
+                    f'exit code {exit_code}.')
+
+            state.record(assembly.base_filename, stage.name, status,
+                         exit_code, inputs, outputs, started_at)
+
+        return prepared
+
+    def prepare_all(self, filters=None, force=False, since=None):
+        """Prepare the files of every assembly in the local SQLite database.
+
+        An assembly catalogued in several releases shares its local files,
+        so it is prepared once.
+
+        :param [filters]:
+            A dictionary of ``{column name: value}`` limiting the assemblies
+            prepared, see `assembly_criteria()`.
+
+        :param [force]:
+            If `True`, every stage is run, whether or not it is current.
+
+        :param [since]:
+            An earlier release. If given, only the assemblies of each
+            source added or changed since then are prepared.
+
+        :returns:
+            A tuple of the number of assemblies prepared, and the number that
+            failed.
+        """
+        filters = filters or dict()
+
+        if since is None:
+            queries = [filters]
+        else:
+            queries = [dict(filters, **self.release_filters(name, since))
+                       for name in self.sources]
+
+        state = PipelineState(self.catalog)
+        prepared_count = failed_count = 0
+
+        for query_filters in queries:
+            for assembly in self.iter_assemblies(
+                    fields=PREPARE_FIELDS, filters=query_filters,
+                    distinct=True):
+                if self.prepare(assembly, force=force, state=state):
+                    prepared_count += 1
+                else:
+                    failed_count += 1
+
+        return prepared_count, failed_count
@@ -0,0 +1,298 @@
+"""This module contains the BlobStore class.
+
+.. module:: blobstore
+    :platform: Unix
+    :synopsis: A content-addressed store of downloaded and prepared files,
+    which are kept once and hard-linked into each assembly directory.
+
+.. moduleauthor:: Tyler Biggs <biggstd@gmail.com>
+"""
+
+# General Python imports.
+import os
+import shutil
+import hashlib
+import logging
+
+# SQLAlchemy imports.
+from sqlalchemy import Column, Integer, String
+
+# Inter-package imports.
+from pynome.assembly import Base
+
+
+# The name given to the outputs of a stage within the prepared store. The
+# suffix of each output, such as '.1.ht2', is appended to it.
+OUTPUT_NAME = 'output'
+
+
+class FileDigest(Base):
+    """Models the digest of a file placed by the blob store.
+
+    The `size` and `mtime_ns` columns hold the values of the file when its
+    digest was recorded. If the file has changed since, the digest is
+    computed again.
+    """
+
+    # Declare the SQLite table name to be used.
+    __tablename__ = 'FileDigests'
+
+    path = Column(String, primary_key=True)
+    digest = Column(String)
+    size = Column(Integer)
+    mtime_ns = Column(Integer)
+
+
+class HashingWriter:
+    """Wraps a file, and hashes the data written to it.
+
+    The `write` method can be used as the callback of
+    ``ftplib.FTP.retrbinary()``, so a file is hashed as it is downloaded.
+    """
+
+    def __init__(self, file, checksums=()):
+        """Initialization of the HashingWriter class.
+
+        :param file:
+            A file opened for binary writing, or `None` if the data is only
+            to be hashed.
+
+        :param [checksums]:
+            Other checksums the data is passed to, such as a
+            `pynome.checksums.BSDSum`. Each needs an `update` method.
+        """
+        self.file = file
+        self.hash = hashlib.sha256()
+        self.checksums = list(checksums)
+
+    def update(self, data):
+        """Add a block of data to the hash and checksums."""
+        self.hash.update(data)
+
+        for checksum in self.checksums:
+            checksum.update(data)
+
+    def write(self, data):
+        """Hash and write a block of data."""
+        self.update(data)
+
+        if self.file is None:
+            return len(data)
+
+        return self.file.write(data)
+
+    def hash_existing(self, path, size):
+        """Hash the first `size` bytes of a file, such as the part of a
+        download already written by an earlier attempt."""
+        with open(path, 'rb') as f:
+            while size > 0:
+                chunk = f.read(min(size, 2**20))
+                if not chunk:
+                    break
+                self.update(chunk)
+                size -= len(chunk)
+
+    def hexdigest(self):
+        """Return the digest of the data written so far."""
+        return self.hash.hexdigest()
+
+
+def hash_file(path, chunk_size=2**20):
+    """Return the sha256 digest of a file."""
+    file_hash = hashlib.sha256()
+
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            file_hash.update(chunk)
+
+    return file_hash.hexdigest()
+
+
+def link_or_copy(source, destination):
+    """Hard link `source` to `destination`, replacing any existing file.
+
+    The link is made under a temporary name and then renamed into place, so
+    an existing file is replaced rather than written through. Should a hard
+    link not be possible, such as across file systems, the file is copied.
+    """
+    temp_path = destination + '.link'
+
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+    try:
+        os.link(source, temp_path)
+    except OSError:
+        shutil.copyfile(source, temp_path)
+
+    os.replace(temp_path, destination)
+
+
+class BlobStore:
+    """Stores each distinct file once, named by its sha256 digest.
+
+    Downloaded files are moved into the store and hard-linked into place,
+    so identical files of different assemblies share one copy on disk.
+
+    The outputs of a preparation stage are also kept, in a directory named
+    by a key derived from the digests of the stage inputs. A stage run on
+    identical inputs links these outputs rather than building them again.
+    Outputs are given a digest derived from that key, rather than one
+    computed from their contents, so large outputs are never read to be
+    hashed.
+    """
+
+    def __init__(self, root, catalog):
+        """Initialization of the BlobStore class.
+
+        :param root:
+            The directory in which the store is kept. It should be on the
+            same file system as the assembly files, so that they can be
+            hard-linked.
+
+        :param catalog:
+            The `pynome.catalog.Catalog` the file digests are recorded in.
+        """
+        self.root = root
+        self.catalog = catalog
+        self.blob_path = os.path.join(root, 'objects')
+        self.prepared_path = os.path.join(root, 'prepared')
+
+    def path_of(self, digest):
+        """Return the path of the blob with the given digest."""
+        return os.path.join(self.blob_path, digest[:2], digest)
+
+    def digest(self, path):
+        """Return the digest of a file.
+
+        The recorded digest is used if the file is unchanged, otherwise
+        the file is hashed and the new digest recorded.
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        record = self.catalog.session.get(FileDigest, path)
+
+        if (record is not None and record.size == stat.st_size
+                and record.mtime_ns == stat.st_mtime_ns):
+            return record.digest
+
+        digest = hash_file(path)
+        self.record(path, digest)
+
+        return digest
+
+    def record(self, path, digest):
+        """Record the digest of a file, along with its size and mtime."""
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+
+        self.catalog.write(lambda session: session.merge(FileDigest(
+            path=path,
+            digest=digest,
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns)))
+
+    def store(self, source, destination, digest=None):
+        """Move a file into the store, and link it to `destination`.
+
+        If an identical file is already stored, `source` is removed and the
+        stored copy is linked instead.
+
+        :param source:
+            The path of the file, such as a completed download.
+
+        :param destination:
+            The path the file should be available at.
+
+        :param [digest]:
+            The sha256 digest of the file, if it is already known, such as
+            from a HashingWriter. Otherwise the file is hashed.
+
+        :returns:
+            The digest of the file.
+        """
+        if digest is None:
+            digest = hash_file(source)
+
+        blob = self.path_of(digest)
+
+        if os.path.exists(blob):
+            logging.info(f'{destination} is already stored as {digest}.')
+            os.remove(source)
+        else:
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            shutil.move(source, blob)
+
+        link_or_copy(blob, destination)
+        self.record(destination, digest)
+
+        return digest
+
+    @staticmethod
+    def stage_key(stage_name, input_digests):
+        """Derive the key of a stage run on inputs with the given digests."""
+        key = hashlib.sha256(stage_name.encode())
+
+        for digest in input_digests:
+            key.update(b'\0' + digest.encode())
+
+        return key.hexdigest()
+
+    def fetch_outputs(self, key, base_path):
+        """Link the stored outputs of a stage into place.
+
+        :param key:
+            The key of the stage, see `stage_key()`.
+
+        :param base_path:
+            The base path of an assembly, to which the suffix of each
+            output is appended.
+
+        :returns:
+            A list of the output paths linked, which is empty if no outputs
+            are stored under the key.
+        """
+        key_path = os.path.join(self.prepared_path, key)
+
+        if not os.path.isdir(key_path):
+            return list()
+
+        outputs = list()
+
+        for name in sorted(os.listdir(key_path)):
+            output = base_path + name[len(OUTPUT_NAME):]
+            link_or_copy(os.path.join(key_path, name), output)
+            self.record(output, self.stage_key(key, [name]))
+            outputs.append(output)
+
+        return outputs
+
+    def store_outputs(self, key, base_path, outputs):
+        """Keep the outputs of a stage under its key.
+
+        :param key:
+            The key of the stage, see `stage_key()`.
+
+        :param base_path:
+            The base path of the assembly the outputs were built for.
+
+        :param outputs:
+            A list of the output paths, each of which starts with
+            `base_path`.
+        """
+        key_path = os.path.join(self.prepared_path, key)
+        temp_path = f'{key_path}.{os.getpid()}.tmp'
+
+        os.makedirs(temp_path, exist_ok=True)
+
+        for output in outputs:
+            name = OUTPUT_NAME + output[len(base_path):]
+            link_or_copy(output, os.path.join(temp_path, name))
+            self.record(output, self.stage_key(key, [name]))
+
+        # The complete set of outputs is renamed into place at once. If
+        # another process stored the same outputs first, these are dropped.
+        try:
+            os.rename(temp_path, key_path)
+        except OSError:
+            shutil.rmtree(temp_path)
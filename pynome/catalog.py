@@ -0,0 +1,242 @@
+"""This module contains the Catalog and CatalogWriter classes.
+
+.. module:: catalog
+    :platform: Unix
+    :synopsis: Engine, session and writer management for the local SQLite
+    catalog, so that it can be used from many threads and processes.
+
+.. moduleauthor:: Tyler Biggs <biggstd@gmail.com>
+"""
+
+# General Python imports.
+import os
+import queue
+import logging
+import threading
+import concurrent.futures
+
+# SQLAlchemy imports.
+from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+# Inter-package imports.
+from pynome.migrations import configure_sqlite
+
+
+def is_memory_url(url):
+    """Return `True` if a SQLite url refers to an in-memory database."""
+    return make_url(url).database in (None, '', ':memory:')
+
+
+def create_catalog_engine(url, busy_timeout=30000):
+    """Create a SQLAlchemy engine for the catalog at `url`.
+
+    An in-memory database only exists within a single connection, so every
+    thread shares one connection to it.
+
+    :param url:
+        A SQLite database url.
+
+    :param [busy_timeout]:
+        The number of milliseconds a connection waits for a lock, see
+        `pynome.migrations.configure_sqlite()`.
+    """
+    if is_memory_url(url):
+        engine = create_engine(
+            url,
+            poolclass=StaticPool,
+            connect_args={'check_same_thread': False})
+    else:
+        engine = create_engine(url)
+
+    configure_sqlite(engine, busy_timeout)
+
+    return engine
+
+
+class CatalogWriter:
+    """Serializes every write to the catalog through a single thread.
+
+    SQLite allows only one writer at a time. Rather than having threads
+    compete for the database lock, writes are submitted as functions, which
+    are run one after another by a writer thread with its own session. Each
+    function is committed on success, and rolled back if it raises.
+    """
+
+    def __init__(self, session_factory):
+        """Initialization of the CatalogWriter class.
+
+        :param session_factory:
+            A callable returning a new session, used by the writer thread.
+        """
+        self.session_factory = session_factory
+
+        # Define private attributes of the class.
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, function, *args, **kwargs):
+        """Queue a write to the catalog.
+
+        :param function:
+            A callable, which is passed the session of the writer thread
+            followed by `args` and `kwargs`.
+
+        :returns:
+            A `concurrent.futures.Future` of the value returned by
+            `function`.
+        """
+        future = concurrent.futures.Future()
+
+        # A write submitted by another write runs immediately, as the
+        # writer thread cannot wait on itself.
+        if threading.current_thread() is self._thread:
+            self._run_one(self._session, future, function, args, kwargs)
+            return future
+
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='pynome-catalog-writer',
+                    daemon=True)
+                self._thread.start()
+
+            self._queue.put((future, function, args, kwargs))
+
+        return future
+
+    def write(self, function, *args, **kwargs):
+        """Run a write on the writer thread, and wait for it to complete.
+
+        See `submit()` for a description of the parameters.
+
+        :returns:
+            The value returned by `function`. Any exception it raised is
+            raised again here.
+        """
+        return self.submit(function, *args, **kwargs).result()
+
+    def close(self):
+        """Finish any queued writes, then stop the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+
+            if thread is not None:
+                self._queue.put(None)
+
+        if thread is not None:
+            thread.join()
+
+    def _run(self):
+        """The loop of the writer thread."""
+        self._session = self.session_factory()
+
+        while True:
+            item = self._queue.get()
+
+            if item is None:
+                break
+
+            future, function, args, kwargs = item
+            self._run_one(self._session, future, function, args, kwargs)
+
+        self._session.close()
+
+    @staticmethod
+    def _run_one(session, future, function, args, kwargs):
+        """Run and commit a single write, and resolve its future."""
+        if not future.set_running_or_notify_cancel():
+            return
+
+        try:
+            result = function(session, *args, **kwargs)
+            session.commit()
+        except BaseException as error:
+            session.rollback()
+            logging.debug(f'Catalog write failed: {error!r}')
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+
+class Catalog:
+    """Manages the connections to the local SQLite catalog.
+
+    Every thread reads through its own session, returned by the `session`
+    property, and all writes are run by a single CatalogWriter. A process
+    forked after the catalog was opened creates its own engine, session and
+    writer on first use, rather than sharing the connections of its parent.
+    """
+
+    def __init__(self, url, busy_timeout=30000):
+        """Initialization of the Catalog class.
+
+        :param url:
+            A SQLite database url.
+
+        :param [busy_timeout]:
+            The number of milliseconds a connection waits for a lock, see
+            `pynome.migrations.configure_sqlite()`.
+        """
+        self.url = url
+        self.busy_timeout = busy_timeout
+        self.engine = create_catalog_engine(url, busy_timeout)
+        self._connect()
+
+    def _connect(self):
+        """Create the sessions and writer of the current process."""
+        self._pid = os.getpid()
+        self.sessions = scoped_session(sessionmaker(bind=self.engine))
+        self.writer = CatalogWriter(sessionmaker(bind=self.engine))
+
+    def _check_fork(self):
+        """Reconnect if this is a process forked from the one that opened
+        the catalog."""
+        if os.getpid() == self._pid:
+            return
+
+        # The copy of an in-memory database belongs to this process, so its
+        # connection is kept. Otherwise the connections of the parent are
+        # dropped, without closing them, and a new engine is created.
+        if not is_memory_url(self.url):
+            self.engine.dispose(close=False)
+            self.engine = create_catalog_engine(self.url, self.busy_timeout)
+
+        self._connect()
+
+    @property
+    def session(self):
+        """The session of the calling thread. It should only be used to
+        read from the catalog, writes are made with `write()`."""
+        self._check_fork()
+        return self.sessions()
+
+    def write(self, function, *args, **kwargs):
+        """Run a write on the writer thread, and wait for it to complete.
+
+        Objects already loaded by the session of the calling thread are
+        expired, so they are reloaded with any changes that were written.
+
+        See `CatalogWriter.submit()` for a description of the parameters.
+        """
+        self._check_fork()
+        result = self.writer.write(function, *args, **kwargs)
+
+        if self.sessions.registry.has():
+            self.sessions().expire_all()
+
+        return result
+
+    def remove_session(self):
+        """Close the session of the calling thread. Worker threads should
+        call this when they are done with the catalog."""
+        self.sessions.remove()
+
+    def close(self):
+        """Stop the writer, and close every connection to the catalog."""
+        self.writer.close()
+        self.sessions.remove()
+        self.engine.dispose()
@@ -0,0 +1,196 @@
+"""This module contains the verification of downloads against the CHECKSUMS
+files of Ensembl.
+
+.. module:: checksums
+    :platform: Unix
+    :synopsis: Incremental BSD `sum` checksums, the parsing of CHECKSUMS
+    files, and a record of the verification of each downloaded file.
+
+.. moduleauthor:: Tyler Biggs <biggstd@gmail.com>
+"""
+
+# General Python imports.
+import shutil
+import datetime
+import subprocess
+
+# SQLAlchemy imports.
+from sqlalchemy import Column, DateTime, String
+
+# Inter-package imports.
+from pynome.assembly import Base
+
+
+# The name of the file listing the checksums of a directory.
+CHECKSUMS_FILENAME = 'CHECKSUMS'
+
+# The command computing the checksums of CHECKSUMS files. Both the GNU and
+# BSD versions of `sum` use the BSD algorithm by default.
+SUM_COMMAND = 'sum'
+
+# The 16 bit checksum rotated right by one bit, indexed by the checksum
+# before it is masked to 16 bits. Adding a byte to a checksum gives at most
+# 0xffff + 0xff, so masking is folded into the table lookup.
+_ROTATE = [((c & 0xffff) >> 1) | ((c & 1) << 15)
+           for c in range(0x10000 + 0x100)]
+
+
+class ChecksumError(Exception):
+    """Raised when a downloaded file does not match its listed checksum."""
+
+
+class FileChecksum(Base):
+    """Models the verification of a downloaded file.
+
+    The `expected` and `actual` columns hold checksums as given by
+    `BSDSum.value()`, and `status` is either 'verified' or 'mismatch'.
+    """
+
+    # Declare the SQLite table name to be used.
+    __tablename__ = 'FileChecksums'
+
+    remote_path = Column(String, primary_key=True)
+    local_path = Column(String)
+    expected = Column(String)
+    actual = Column(String)
+    status = Column(String, index=True)
+    checked_at = Column(DateTime)
+
+    def __repr__(self):
+        """The string representation of a FileChecksum object.
+        """
+        return f'FileChecksum({self.remote_path!r}, {self.status!r})'
+
+
+class BSDSum:
+    """Computes the BSD checksum of the `sum` command one block of data at
+    a time, so a file can be checked as it is downloaded.
+
+    The checksum is a 16 bit sum, which is rotated right by one bit before
+    each byte is added, along with the size of the data in 1024 byte
+    blocks.
+    """
+
+    def __init__(self):
+        """Initialization of the BSDSum class."""
+        self.checksum = 0
+        self.size = 0
+
+    def update(self, data):
+        """Add a block of data to the checksum."""
+        checksum = self.checksum
+        rotate = _ROTATE
+
+        for byte in data:
+            checksum = rotate[checksum] + byte
+
+        self.checksum = checksum & 0xffff
+        self.size += len(data)
+
+    def value(self):
+        """Return the checksum and the number of blocks, as listed in a
+        CHECKSUMS file, such as '18554 8192'."""
+        return f'{self.checksum} {-(-self.size // 1024)}'
+
+    def close(self):
+        """Does nothing, see `SumProcess.close()`."""
+
+
+class SumProcess:
+    """Computes the BSD checksum of the `sum` command by running it, and
+    writing each block of data to it as it arrives.
+
+    `BSDSum` adds each byte in the interpreter, which limits the speed of
+    every download running alongside it. Here the checksum is computed by
+    another process, and writing to it does not hold the GIL.
+    """
+
+    def __init__(self, command=SUM_COMMAND):
+        """Initialization of the SumProcess class.
+
+        :param [command]:
+            The path or name of the `sum` command.
+        """
+        self.process = subprocess.Popen(
+            [command], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL)
+        self._value = None
+
+    def update(self, data):
+        """Add a block of data to the checksum."""
+        self.process.stdin.write(data)
+
+    def value(self):
+        """Return the checksum and the number of blocks, in the form of
+        `BSDSum.value()`. No more data can be added afterwards."""
+        if self._value is None:
+            output, _ = self.process.communicate()
+
+            if self.process.returncode:
+                raise OSError(
+                    f'{self.process.args[0]} exited with status '
+                    f'{self.process.returncode}.')
+
+            checksum, blocks = output.split()[:2]
+            self._value = f'{int(checksum)} {int(blocks)}'
+
+        return self._value
+
+    def close(self):
+        """Stop the process, if its checksum was never read, such as when a
+        download fails."""
+        if self.process.poll() is None:
+            self.process.kill()
+            self.process.communicate()
+
+
+def bsd_sum():
+    """Return a `SumProcess` if the `sum` command is installed, otherwise a
+    `BSDSum`."""
+    if shutil.which(SUM_COMMAND) is not None:
+        return SumProcess()
+
+    return BSDSum()
+
+
+def parse_checksums(lines):
+    """Parse the lines of a CHECKSUMS file.
+
+    Each line gives the checksum, the number of blocks and the name of a
+    file, as output by `sum`::
+
+        18554  8192 Candida_glabrata.ASM254v2.dna.toplevel.fa.gz
+
+    :param lines:
+        An iterable of the lines of the file.
+
+    :returns:
+        A dictionary of ``{file name: checksum}``, where each checksum is in
+        the form returned by `BSDSum.value()`.
+    """
+    checksums = dict()
+
+    for line in lines:
+        split_line = line.split(None, 2)
+
+        if len(split_line) < 3 or not split_line[0].isdigit():
+            continue
+
+        checksum, blocks, name = split_line
+        checksums[name.strip()] = f'{int(checksum)} {int(blocks)}'
+
+    return checksums
+
+
+def record_checksum(session, remote_path, local_path, expected, actual):
+    """Save the verification of a downloaded file.
+
+    This is a write to the catalog, see `pynome.catalog.Catalog.write()`.
+    """
+    session.merge(FileChecksum(
+        remote_path=remote_path,
+        local_path=local_path,
+        expected=expected,
+        actual=actual,
+        status='verified' if actual == expected else 'mismatch',
+        checked_at=datetime.datetime.now()))
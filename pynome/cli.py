@@ -12,9 +12,15 @@ import click
 # Inter-package imports.
 from pynome.ensembldatabase import EnsemblDatabase
 from pynome.assemblystorage import AssemblyStorage
+from pynome.crawler import NameFilter
+from pynome.export import EXPORT_FORMATS
 from pynome.utils import read_json_config
 
 
+# The catalog columns shown by `pynome list`.
+LIST_FIELDS = ('base_filename', 'source_database', 'version', 'taxonomy_id')
+
+
 @click.group()
 @click.pass_context
 @click.option('--config', default='pynome_config.json', type=click.Path(exists=True))
@@ -49,6 +55,9 @@ def pynome(ctx, config):
         sqlite_path=ctx.obj['config']["storage_config"].get("sqlite_path"),
         base_path=ctx.obj['config']["storage_config"].get("base_path"),
         irods_base_path=ctx.obj['config']["storage_config"].get("irods_base_path"),
+        batch_size=ctx.obj['config']["storage_config"].get("batch_size", 1000),
+        busy_timeout=ctx.obj['config']["storage_config"].get(
+            "busy_timeout", 30000),
     )
 
     # Initialize the databases.
@@ -64,7 +73,21 @@ def pynome(ctx, config):
         release_version=ctx.obj['config']['ensembl_config']['release_version'],
         bad_filenames=ctx.obj['config']['ensembl_config']['bad_filenames'],
         # Optional values. See above for .get() usage.
-        crawl_urls=ctx.obj['config']['ensembl_config'].get('crawl_urls')
+        crawl_urls=ctx.obj['config']['ensembl_config'].get('crawl_urls'),
+        crawl_workers=ctx.obj['config']['ensembl_config'].get(
+            'crawl_workers', 1),
+        discovery_mode=ctx.obj['config']['ensembl_config'].get(
+            'discovery_mode', 'walk'),
+        crawl_filters=ctx.obj['config']['ensembl_config'].get(
+            'crawl_filters'),
+        download_workers=ctx.obj['config']['ensembl_config'].get(
+            'download_workers', 1),
+        verify_checksums=ctx.obj['config']['ensembl_config'].get(
+            'verify_checksums', True),
+        stream_decompress=ctx.obj['config']['ensembl_config'].get(
+            'stream_decompress', False),
+        keep_compressed=ctx.obj['config']['ensembl_config'].get(
+            'keep_compressed', True),
     )
 
     # Add the ensembl_database to the source list of assembly_storage.
@@ -78,20 +101,53 @@ def pynome(ctx, config):
 @click.pass_context
 def list_assemblies(ctx):
     """List assemblies."""
-    local_assemblies = [a for a in ctx.obj['as'].query_local_assemblies()]
     click.echo(
         click.style(
-            f'Displaying {len(local_assemblies)} assemblies.', fg='green'))
-    click.echo(local_assemblies)
+            f'Displaying {ctx.obj["as"].count_assemblies()} assemblies.',
+            fg='green'))
+
+    # Only the displayed columns are read, a batch of rows at a time.
+    for row in ctx.obj['as'].iter_assemblies(
+            fields=LIST_FIELDS, order_by=['source_database', 'base_filename']):
+        click.echo('\t'.join(str(value) for value in row))
 
 
 
 @pynome.command()
 @click.pass_context
-def download(ctx):
+@click.argument('query', nargs=-1, required=True)
+@click.option('--limit', default=20, show_default=True,
+              help='The maximum number of results.')
+def search(ctx, query, limit):
+    """Search assemblies by genus, species, strain, assembly id or taxonomy
+    name. Words may be prefixes, and small typos are tolerated."""
+    results = ctx.obj['as'].search(' '.join(query), limit=limit)
+
+    click.echo(click.style(f'Found {len(results)} assemblies.', fg='green'))
+
+    for result in results:
+        click.echo('\t'.join(str(value) for value in result[:-1]))
+
+
+@pynome.command()
+@click.pass_context
+@click.option('--since', metavar='RELEASE',
+              help='Only download assemblies added or changed since this '
+                   'release.')
+def download(ctx, since):
     """Download assembly files."""
     # Call the download_all() function of the AssemblyStorage class.
-    ctx.obj['as'].download_all()
+    results = ctx.obj['as'].download_all(since=since)
+    failed = [result for result in results if result.status == 'failed']
+    skipped = sum(result.status == 'skipped' for result in results)
+
+    click.echo(f'Downloaded {len(results) - len(failed) - skipped} files, '
+               f'skipped {skipped} complete files.')
+
+    for result in failed:
+        click.echo(click.style(
+            f'Failed to download {result.task.remote_path}: {result.error}',
+            fg='red'))
 
     # Download the SRA files.
     ctx.obj['as'].download_all_sra()
@@ -99,14 +155,69 @@ def download(ctx):
 
 @pynome.command()
 @click.pass_context
-def prepare(ctx):
-    """Prepare the downloaded files for further use."""
+@click.option('--force', is_flag=True,
+              help='Run every stage, even those already complete.')
+@click.option('--since', metavar='RELEASE',
+              help='Only prepare assemblies added or changed since this '
+                   'release.')
+def prepare(ctx, force, since):
+    """Prepare the downloaded files for further use. Stages already
+    completed with unchanged inputs are skipped."""
+
+    prepared, failed = ctx.obj['as'].prepare_all(force=force, since=since)
 
-    for a in ctx.obj['as'].query_local_assemblies():
-        ctx.obj['as'].decompress(a)
-        ctx.obj['as'].hisat_index(a)
-        ctx.obj['as'].gtf(a)
-        ctx.obj['as'].splice_site(a)
+    click.echo(f'Prepared {prepared} assemblies.')
+    if failed:
+        click.echo(click.style(
+            f'{failed} assemblies failed to prepare, see the log.',
+            fg='yellow'))
+
+
+@pynome.command()
+@click.pass_context
+@click.option('--from', 'from_version', required=True, metavar='RELEASE',
+              help='The earlier release, such as release-38.')
+@click.option('--to', 'to_version', required=True, metavar='RELEASE',
+              help='The later release, such as release-39.')
+@click.option('--source', default='ensembl', show_default=True,
+              help='The source database to compare.')
+def diff(ctx, from_version, to_version, source):
+    """List the assemblies added, removed and changed between two releases.
+    Both releases must have been discovered."""
+    release_diff = ctx.obj['as'].diff_releases(
+        source, from_version, to_version)
+
+    for label, color, names in (('Added', 'green', release_diff.added),
+                                ('Removed', 'red', release_diff.removed),
+                                ('Changed', 'yellow', release_diff.changed)):
+        click.echo(click.style(f'{label}: {len(names)}', fg=color))
+        for name in names:
+            click.echo(f'\t{name}')
+
+
+@pynome.command()
+@click.pass_context
+@click.argument('path', type=click.Path(dir_okay=False))
+@click.option('--format', 'file_format', type=click.Choice(EXPORT_FORMATS),
+              help='The file format. By default, it is taken from the file '
+                   'suffix.')
+def export(ctx, path, file_format):
+    """Export the catalog of assemblies to a Parquet, Arrow or TSV file.
+    The parquet and arrow formats require pyarrow."""
+    exported = ctx.obj['as'].export_catalog(path, file_format)
+    click.echo(f'Exported {exported} assemblies to {path}.')
+
+
+@pynome.command(name='import')
+@click.pass_context
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'file_format', type=click.Choice(EXPORT_FORMATS),
+              help='The file format. By default, it is taken from the file '
+                   'suffix.')
+def import_catalog(ctx, path, file_format):
+    """Load a catalog file written by `pynome export`."""
+    imported = ctx.obj['as'].import_catalog(path, file_format)
+    click.echo(f'Imported {imported} assemblies from {path}.')
 
 
 @pynome.command()
@@ -118,11 +229,22 @@ def push_irods():
 
 @pynome.command()
 @click.pass_context
-def discover(ctx):
+@click.option('--incremental', is_flag=True,
+              help='Only list directories changed since the last crawl.')
+@click.option('--resume', is_flag=True,
+              help='Continue the last interrupted crawl.')
+@click.option('--only', multiple=True,
+              help='Only crawl species matching this glob, e.g. '
+                   "'saccharomyces_*'. May be given more than once.")
+def discover(ctx, incremental, resume, only):
     """Discover new genomes from a given source. If 'crawl_urls' are given
     in the configuration file, these will be used in place of any automatically
     generated urls."""
 
+    # Override the species filter of the configuration file.
+    if only:
+        ctx.obj['ed'].species_filter = NameFilter(include=only)
+
     # Tell the user the crawl is starting, and what urls are to be examined.
     click.echo('Crawl of the Ensembl FTP server starting...')
 
@@ -138,26 +260,37 @@ def discover(ctx):
     ctx.obj['ed'].download_metadata()
 
     # Crawl ensembl with either the given url list, or the autogenerated
-    # complete list generated based on the config file.
+    # complete list generated based on the config file. Assemblies are
+    # saved in batches as they are found.
     click.echo('Begining the main crawl...')
-    ctx.obj['ed'].crawl(ctx.obj['config']['ensembl_config']['crawl_urls'] \
-        or None)
-
-    # Save those assemblies found.
-    ctx.obj['as'].save_assemblies()
-
-    # Get a list of all asemblies found by the crawl.
-    assemblies = ctx.obj['as'].query_local_assemblies()
-    click.echo(f'Crawl completed. Found {len(assemblies)} assemblies.')
+    ctx.obj['as'].stream_crawl(
+        ctx.obj['ed'].database_name,
+        ctx.obj['config']['ensembl_config'].get('crawl_urls') or None,
+        incremental=incremental,
+        resume=resume)
+
+    # Count the assemblies found by the crawl, without loading them.
+    assembly_count = ctx.obj['as'].count_assemblies()
+    click.echo(f'Crawl completed. Found {assembly_count} assemblies.')
+
+    # Report those assemblies missing either their fasta or gff3 file.
+    incomplete = ctx.obj['ed'].incomplete_assemblies
+    if incomplete:
+        click.echo(click.style(
+            f'{len(incomplete)} assemblies are incomplete:', fg='yellow'))
+        for base_filename, missing in incomplete:
+            click.echo(f'\t{base_filename} (no {", ".join(missing)})')
 
     # Search for matching taxonomy IDs within the species.txt metadata file,
     # and update the assemblies with that information.
     click.echo('Mapping taxonomy id numbers to discovered assemblies.')
-    tax_id_update = ctx.obj['ed'].add_taxonomy_ids(assemblies)
-
-    # Save (update) each of these assembly ids.
-    for pk, update_dict in tax_id_update:
-        ctx.obj['as'].update_assembly(pk, update_dict)
+    # Only the two columns needed are streamed from the catalog, and all of
+    # the updates are written in a single transaction.
+    names = ctx.obj['as'].iter_assemblies(
+        fields=['base_filename', 'taxonomy_name'], distinct=True)
+    updated_count = ctx.obj['as'].bulk_update_assemblies(
+        ctx.obj['ed'].add_taxonomy_ids(names))
+    click.echo(f'Updated the taxonomy ids of {updated_count} assemblies.')
 
     # Report back to the user.
     click.echo('Discovery complete.')
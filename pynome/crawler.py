@@ -0,0 +1,666 @@
+"""This module contains the FTPCrawler class.
+
+.. module:: crawler
+    :platform: Unix
+    :synopsis: A concurrent FTP crawl engine. Directories are placed on a
+    work queue and listed by a bounded pool of logged in connections.
+
+.. moduleauthor:: Tyler Biggs <biggstd@gmail.com>
+"""
+
+# General Python imports.
+import re
+import ftplib
+import fnmatch
+import datetime
+import itertools
+import logging
+import queue
+import threading
+import time
+import collections
+
+
+# A single typed entry of a directory listing. The `type` is one of 'dir',
+# 'file' or 'link', `size` is an integer number of bytes and `modify` is the
+# modification time as a 'YYYYMMDDHHMMSS' string, as given by MLSD.
+FTPEntry = collections.namedtuple('FTPEntry', 'name type size modify')
+
+# The facts requested from servers that support MLSD.
+MLSD_FACTS = ['type', 'size', 'modify']
+
+# Hosts which have refused an MLSD command. These are listed with LIST.
+_LIST_ONLY_HOSTS = set()
+
+# Errors which indicate a dropped or broken connection, rather than a
+# problem with the directory or file requested.
+CONNECTION_ERRORS = (EOFError, OSError, ftplib.error_temp,
+                     ftplib.error_reply, ftplib.error_proto)
+
+
+def connect_ftp(ftp_url):
+    """Create a new, logged in, FTP connection.
+
+    :param ftp_url:
+        The URL of the FTP server to be connected to.
+    """
+    ftp = ftplib.FTP()
+    ftp.connect(ftp_url)
+    ftp.login()
+    return ftp
+
+
+def close_ftp(ftp):
+    """Close an FTP connection, if there is one.
+
+    The server is asked to end the session, and the connection is closed
+    regardless if it cannot be, for instance because it has dropped.
+    """
+    if ftp is None:
+        return
+
+    try:
+        ftp.quit()
+    except Exception:
+        ftp.close()
+
+
+def list_ftp_dir(ftp, directory):
+    """Retrieve the listing of a directory as a list of FTPEntry tuples.
+
+    MLSD is used when the server supports it, otherwise the output of
+    ``ftp.dir()`` is parsed instead. Once a server refuses MLSD, it is not
+    tried again for that host.
+
+    :param ftp:
+        A connected and logged in instance of ftplib.FTP().
+
+    :param directory:
+        The directory to be listed.
+
+    :returns:
+        A list of FTPEntry tuples, one for each entry in the directory.
+    """
+    host = getattr(ftp, 'host', None)
+
+    if host not in _LIST_ONLY_HOSTS:
+        try:
+            return [
+                entry for entry in (
+                    parse_mlsd_facts(name, facts)
+                    for name, facts in ftp.mlsd(directory, MLSD_FACTS))
+                if entry is not None]
+
+        except ftplib.error_perm as error:
+            # Only a refused command means MLSD is not supported. Other
+            # permanent errors, such as a missing directory, are raised.
+            if str(error)[:3] not in ('500', '501', '502', '504'):
+                raise
+            logging.info(f'MLSD is not supported by {host}, using LIST.')
+            _LIST_ONLY_HOSTS.add(host)
+
+    lines = list()
+    ftp.dir(directory, lines.append)
+
+    return [entry for entry in map(parse_list_line, lines)
+            if entry is not None]
+
+
+def parse_mlsd_facts(name, facts):
+    """Convert a single result of ``ftp.mlsd()`` into an FTPEntry.
+
+    :param name:
+        The name of the entry.
+
+    :param facts:
+        The dictionary of facts returned by the server.
+
+    :returns:
+        An FTPEntry, or `None` for the current and parent directories.
+    """
+    entry_type = facts.get('type', 'file').lower()
+
+    if entry_type in ('cdir', 'pdir'):
+        return None
+
+    if entry_type.startswith('os.unix=slink'):
+        entry_type = 'link'
+
+    size = facts.get('size')
+    modify = facts.get('modify')
+
+    return FTPEntry(
+        name=name,
+        type=entry_type,
+        size=int(size) if size is not None else None,
+        # Discard any fractional seconds.
+        modify=modify[:14] if modify is not None else None)
+
+
+def parse_list_line(line, today=None):
+    """Parse a single line of ``ftp.dir()`` (``ls -l`` style) output.
+
+    An example line, and its index locations, are shown below::
+
+        ``"drwxr-sr-x  2 ftp   ftp    4096 Jan 13  2015 filename"
+           [0]        [1][2]   [3]    [4]  [5] [6] [7]  [8]``
+
+    :param line:
+        A line retrieved from an ``ftp.dir()`` call.
+
+    :param [today]:
+        The date used to infer the year of recently modified entries,
+        which ``ls -l`` shows with a time instead of a year.
+
+    :returns:
+        An FTPEntry, or `None` if the line is not an entry.
+    """
+    split_line = line.split(None, 8)
+
+    # Lines such as 'total 24' do not describe an entry.
+    if len(split_line) < 9:
+        return None
+
+    permissions, size, month, day, time_or_year, name = (
+        split_line[0], split_line[4], split_line[5], split_line[6],
+        split_line[7], split_line[8])
+
+    if permissions[0] == 'd':
+        entry_type = 'dir'
+    elif permissions[0] == 'l':
+        entry_type = 'link'
+        name = name.split(' -> ', 1)[0]
+    else:
+        entry_type = 'file'
+
+    try:
+        if ':' in time_or_year:
+            today = today or datetime.date.today()
+            modified = datetime.datetime.strptime(
+                f'{today.year} {month} {day} {time_or_year}', '%Y %b %d %H:%M')
+            # A date in the future belongs to the previous year.
+            if modified.date() > today + datetime.timedelta(days=1):
+                modified = modified.replace(year=today.year - 1)
+        else:
+            modified = datetime.datetime.strptime(
+                f'{time_or_year} {month} {day}', '%Y %b %d')
+        modify = modified.strftime('%Y%m%d%H%M%S')
+    except ValueError:
+        modify = None
+
+    return FTPEntry(
+        name=name,
+        type=entry_type,
+        size=int(size) if size.isdigit() else None,
+        modify=modify)
+
+
+class NameFilter:
+    """Include and exclude rules for directory names.
+
+    Rules are shell-style globs, such as ``'saccharomyces_*'``, or regular
+    expressions when prefixed with ``'re:'``. A name is accepted if it
+    matches none of the exclude rules, and either there are no include
+    rules or it matches at least one of them. Leading underscores, as used
+    by some Ensembl species names, are ignored when matching.
+    """
+
+    def __init__(self, include=None, exclude=None):
+        """Initialization of the NameFilter class.
+
+        :param [include]:
+            A list of rules, one of which a name must match.
+
+        :param [exclude]:
+            A list of rules, none of which a name may match.
+        """
+        self.include = [self._compile(rule) for rule in include or []]
+        self.exclude = [self._compile(rule) for rule in exclude or []]
+
+    @staticmethod
+    def _compile(rule):
+        """Compile a single glob or 're:' prefixed rule."""
+        if rule.startswith('re:'):
+            return re.compile(rule[3:])
+        return re.compile(fnmatch.translate(rule))
+
+    def __call__(self, name):
+        """Check if a name passes the filter.
+
+        :param name:
+            A directory name.
+
+        :returns:
+            `True` if the name is accepted.
+        """
+        names = (name, name.lstrip('_'))
+
+        if any(r.match(n) for r in self.exclude for n in names):
+            return False
+
+        if self.include:
+            return any(r.match(n) for r in self.include for n in names)
+
+        return True
+
+
+class FTPCrawler:
+    """Crawls FTP directory trees with a pool of worker connections.
+
+    Each worker holds its own ``ftplib.FTP`` connection, which is logged in
+    once and reused for every directory it lists. Workers pull directories
+    from a shared priority queue and push any sub-directories they find back
+    onto it, so listings are fetched ahead of the consumer.
+
+    Listings are consumed in the same depth-first order used by
+    `pynome.utils.crawl_ftp_dir`, so the files (and therefore any parsed
+    results) are produced in exactly the order a serial crawl would give.
+
+    If a `pynome.crawlstate.SnapshotStore` is given, the listing of every
+    directory visited is saved to it once the directory has been consumed.
+    In incremental mode, a directory whose size and modification time within
+    its parent listing match the stored snapshot is not listed again, its
+    stored entries are used instead. The same is true of any directory
+    already completed by a resumed crawl run.
+
+    A worker whose control connection drops reconnects and retries the
+    directory, up to `retries` times, before the error is raised.
+
+    Workers stop fetching ahead once `max_pending` listings are waiting to
+    be consumed, unless the consumer is waiting on a listing itself, so the
+    memory used by a crawl does not grow with the size of the tree.
+    """
+
+    # Errors which indicate a dropped or broken connection.
+    connection_errors = CONNECTION_ERRORS
+
+    def __init__(self, ftp_url, ignored_dirs, workers=1, snapshots=None,
+                 incremental=False, retries=3, max_pending=1000,
+                 max_depth=None, skip_missing=False, dir_filter=None):
+        """Initialization of the FTPCrawler class.
+
+        :param ftp_url:
+            The URL of the FTP server to be connected to.
+
+        :param ignored_dirs:
+            Names of directories the crawler should never enter.
+
+        :param [workers]:
+            The number of concurrent connections to the FTP server.
+
+        :param [snapshots]:
+            A SnapshotStore used to save, and reuse, directory listings.
+
+        :param [incremental]:
+            If `True`, unchanged directories are read from `snapshots`
+            rather than listed.
+
+        :param [retries]:
+            The number of times a worker reconnects to retry a directory.
+
+        :param [max_pending]:
+            The number of listings fetched ahead of the consumer.
+
+        :param [max_depth]:
+            The deepest level of sub-directories to be entered. The
+            directories a crawl starts from are at a depth of zero. By
+            default there is no limit.
+
+        :param [skip_missing]:
+            If `True`, a directory the server reports as unavailable (a 550
+            reply) is treated as empty, rather than raising an error.
+
+        :param [dir_filter]:
+            A function called with the path of each sub-directory before it
+            is entered. Sub-directories for which it returns `False` are
+            never listed.
+        """
+        self.ftp_url = ftp_url
+        self.ignored_dirs = ignored_dirs
+        self.workers = max(1, int(workers))
+        self.snapshots = snapshots
+        self.incremental = incremental
+        self.retries = retries
+        self.max_pending = max_pending
+        self.max_depth = max_depth
+        self.skip_missing = skip_missing
+        self.dir_filter = dir_filter
+
+        # Counts of directories listed remotely, and read from snapshots.
+        self.listed_count = 0
+        self.reused_count = 0
+
+        # Define private attributes of the class.
+        self._queue = queue.PriorityQueue()
+        self._condition = threading.Condition()
+        self._listings = dict()
+        self._threads = list()
+        self._alive = 0
+        self._stopping = False
+        self._consumer_waiting = False
+        self._errors = list()
+        self._sequence = itertools.count()
+        self._signatures = dict()
+        self._completed = set()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        """Start the worker threads, each of which opens a connection."""
+        with self._condition:
+            self._alive = self.workers
+
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self._worker, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """Signal every worker to close its connection and exit."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+
+        for _ in self._threads:
+            # The empty key sorts ahead of any directory key.
+            self._queue.put(((), next(self._sequence), None))
+
+        for thread in self._threads:
+            thread.join()
+
+        self._threads = list()
+        self._stopping = False
+
+    def _submit(self, key, directory):
+        """Place a directory on the work queue.
+
+        :param key:
+            A tuple giving the position of the directory in a depth-first
+            walk. Lower keys are listed first.
+
+        :param directory:
+            The directory to be listed.
+        """
+        self._queue.put((key, next(self._sequence), directory))
+
+    def _worker(self):
+        """Serve directories from the work queue until told to stop."""
+        try:
+            ftp = connect_ftp(self.ftp_url)
+        except Exception as error:
+            logging.warning(f'Unable to connect to {self.ftp_url}: {error}')
+            with self._condition:
+                self._alive -= 1
+                self._errors.append(error)
+                self._condition.notify_all()
+            return
+
+        while True:
+
+            # Wait for the consumer to catch up before fetching further.
+            with self._condition:
+                while (len(self._listings) >= self.max_pending
+                       and not self._consumer_waiting
+                       and not self._stopping):
+                    self._condition.wait()
+
+            key, _, directory = self._queue.get()
+
+            # A directory of `None` is the signal to shut down.
+            if directory is None:
+                break
+
+            logging.debug(f'Top dir: {directory}')
+
+            # Any error is saved in place of the listing, and raised by
+            # iter_crawl() when it reaches the directory, so a worker never
+            # dies leaving the consumer waiting on a listing.
+            ftp, entries, error = self._list_dir(ftp, directory)
+
+            try:
+                if error is not None:
+                    raise error
+                self._submit_children(key, directory, entries)
+            except ftplib.error_perm as error:
+                if self.skip_missing and str(error).startswith('550'):
+                    logging.info(f'Skipping missing directory {directory}.')
+                    result = list()
+                else:
+                    result = error
+            except Exception as error:
+                logging.debug(f'Listing {directory} failed: {error!r}')
+                result = error
+            else:
+                result = entries
+
+            with self._condition:
+                self._listings[key] = result
+                self._condition.notify_all()
+
+        close_ftp(ftp)
+
+    def _list_dir(self, ftp, directory):
+        """List a directory, reconnecting if the connection has dropped.
+
+        :param ftp:
+            The worker's current connection.
+
+        :param directory:
+            The directory to be listed.
+
+        :returns:
+            A tuple of the connection of the worker, which may be a new one
+            or `None`, the list of FTPEntry tuples and the exception which
+            stopped the listing, if any. The connection is returned even if
+            the listing fails, so a worker never holds more than one.
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                # A failed reconnection is retried on the next attempt.
+                if ftp is None:
+                    ftp = connect_ftp(self.ftp_url)
+
+                return ftp, list_ftp_dir(ftp, directory), None
+            except self.connection_errors as error:
+                if ftp is not None:
+                    ftp.close()
+                    ftp = None
+
+                if attempt == self.retries:
+                    return ftp, None, error
+
+                logging.warning(
+                    f'Connection lost while listing {directory}: {error}. '
+                    'Reconnecting.')
+                time.sleep(2 ** attempt)
+            except Exception as error:
+                return ftp, None, error
+
+    def _submit_children(self, key, directory, entries):
+        """Queue every sub-directory found within a directory listing, except
+        for those that will be read from a snapshot."""
+        for index, entry in enumerate(entries):
+            target_dir = self._child_dir(directory, entry, len(key))
+            if target_dir is not None and not self._reuse(target_dir, entry):
+                self._submit(key + (index,), target_dir)
+
+    def _reuse(self, directory, entry):
+        """Check if the stored snapshot of a directory can be used.
+
+        :param directory:
+            The path of the directory.
+
+        :param entry:
+            The FTPEntry of the directory within its parent listing, or
+            `None` for the directories a crawl is started from. Unless they
+            were completed by a resumed run, these are always listed.
+        """
+        if directory in self._completed:
+            return True
+
+        if entry is None or entry.modify is None:
+            return False
+
+        return self._signatures.get(directory) == (entry.size, entry.modify)
+
+    def _listing(self, key, directory, entry):
+        """Retrieve the entries of a directory, from a snapshot if possible.
+
+        :param key:
+            The key the directory was (or would be) submitted with.
+
+        :param directory:
+            The path of the directory.
+
+        :param entry:
+            The FTPEntry of the directory within its parent listing.
+
+        :returns:
+            A list of FTPEntry tuples.
+        """
+        if self._reuse(directory, entry):
+            entries = self.snapshots.get(directory)
+
+            # The workers never saw this listing, so its children have not
+            # been queued yet.
+            self._submit_children(key, directory, entries)
+            self.reused_count += 1
+            return entries
+
+        entries = self._wait_for(key)
+        self.listed_count += 1
+
+        return entries
+
+    def _child_dir(self, directory, entry, depth):
+        """Return the path of a sub-directory to be crawled, or `None`.
+
+        :param directory:
+            The directory the entry was listed from.
+
+        :param entry:
+            An FTPEntry retrieved from that directory.
+
+        :param depth:
+            The depth of the sub-directory below the crawl's top directory.
+        """
+        # Only directories that are not to be ignored are crawled.
+        if entry.type != 'dir' or entry.name in self.ignored_dirs:
+            return None
+
+        if self.max_depth is not None and depth > self.max_depth:
+            return None
+
+        target_dir = ''.join((directory, entry.name, '/'))
+
+        if self.dir_filter is not None and not self.dir_filter(target_dir):
+            return None
+
+        return target_dir
+
+    def _wait_for(self, key):
+        """Block until the listing for the given key has been retrieved.
+
+        :returns:
+            The list of FTPEntry tuples retrieved for that directory.
+        """
+        with self._condition:
+            while key not in self._listings:
+                if self._alive == 0:
+                    raise self._errors[-1]
+
+                # Allow the workers past the max_pending limit. The listing
+                # waited on has the lowest key in the queue, so it is next.
+                self._consumer_waiting = True
+                self._condition.notify_all()
+                self._condition.wait()
+
+            self._consumer_waiting = False
+            result = self._listings.pop(key)
+            self._condition.notify_all()
+
+        if isinstance(result, Exception):
+            raise result
+
+        return result
+
+    def iter_crawl(self, top_dirs):
+        """Crawl each of the given directories and yield every file found.
+
+        The workers must be started (see `start()`) before this is called.
+
+        :param top_dirs:
+            A list of directories from which a crawl should begin.
+
+        :returns:
+            A generator of ``(directory, entry)`` tuples, one for each
+            non-directory entry, in depth-first order.
+        """
+        # The stored signatures are only needed to decide which directories
+        # can be reused.
+        if self.snapshots is not None:
+            self._completed = self.snapshots.completed()
+            if self.incremental:
+                self._signatures = self.snapshots.signatures()
+
+        top_keys = [(index,) for index in range(len(top_dirs))]
+
+        for key, top_dir in zip(top_keys, top_dirs):
+            self._submit(key, top_dir)
+
+        for key, top_dir in zip(top_keys, top_dirs):
+
+            # The stack holds the directory, its key, its entry within the
+            # parent listing, its listing and an iterator over the remaining
+            # entries of that listing.
+            listing = self._listing(key, top_dir, None)
+            stack = [(top_dir, key, None, listing, enumerate(listing))]
+
+            while stack:
+                directory, dir_key, dir_entry, listing, entries = stack[-1]
+
+                for index, entry in entries:
+                    target_dir = self._child_dir(
+                        directory, entry, len(dir_key))
+
+                    # Descend into the sub-directory before continuing
+                    # with the rest of this listing.
+                    if target_dir is not None:
+                        child_key = dir_key + (index,)
+                        child_listing = self._listing(
+                            child_key, target_dir, entry)
+                        stack.append((
+                            target_dir, child_key, entry, child_listing,
+                            enumerate(child_listing)))
+                        break
+
+                    # Skip any ignored directories.
+                    if entry.type == 'dir':
+                        continue
+
+                    yield directory, entry
+
+                # The listing has been exhausted, so the directory is
+                # complete.
+                else:
+                    stack.pop()
+                    if self.snapshots is not None:
+                        self.snapshots.put(directory, dir_entry, listing)
+
+    def crawl(self, top_dirs, parsing_function):
+        """Crawl the given directories and parse every file found.
+
+        :param top_dirs:
+            A list of directories from which a crawl should begin.
+
+        :param parsing_function:
+            The function to parse each non-directory result. It is called
+            with the FTPEntry and its parent directory.
+        """
+        for directory, entry in self.iter_crawl(top_dirs):
+            parsing_function(entry, directory)
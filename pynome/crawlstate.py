@@ -0,0 +1,258 @@
+"""This module contains the persisted state of FTP crawls.
+
+.. module:: crawlstate
+    :platform: Unix
+    :synopsis: SQLAlchemy models and helpers that store a snapshot of every
+    directory visited by a crawl, and a journal of each crawl run, within
+    the local SQLite catalog.
+
+.. moduleauthor:: Tyler Biggs <biggstd@gmail.com>
+"""
+
+# General Python imports.
+import datetime
+import logging
+
+# SQLAlchemy imports.
+from sqlalchemy import Column, DateTime, Integer, JSON, String
+
+# Inter-package imports.
+from pynome.assembly import Base
+from pynome.assembly import assembly_row
+from pynome.assembly import assembly_upsert_statement
+from pynome.crawler import FTPEntry
+
+
+class CrawlRun(Base):
+    """Models a single crawl of a source database.
+
+    A run without a `finished_at` time was interrupted, and can be resumed.
+    """
+
+    # Declare the SQLite table name to be used.
+    __tablename__ = 'CrawlRuns'
+
+    id = Column(Integer, primary_key=True)
+    source_database = Column(String)
+    top_dirs = Column(JSON)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+
+class DirectorySnapshot(Base):
+    """Models the listing of a single remote directory.
+
+    The `size` and `modify` columns hold the values shown for this directory
+    within the listing of its parent. A later crawl that sees the same values
+    in the parent listing can reuse `entries` instead of listing the
+    directory again. The `run_id` is that of the crawl which last completed
+    the directory.
+    """
+
+    # Declare the SQLite table name to be used.
+    __tablename__ = 'DirectorySnapshots'
+
+    path = Column(String, primary_key=True)
+    source_database = Column(String)
+    size = Column(Integer)
+    modify = Column(String)
+    entries = Column(JSON)
+    listed_at = Column(DateTime)
+    run_id = Column(Integer)
+
+    def __repr__(self):
+        """The string representation of a DirectorySnapshot object.
+        """
+        return (f'DirectorySnapshot({self.path!r}, '
+                f'{len(self.entries or [])} entries)')
+
+
+class SnapshotStore:
+    """Reads and writes the directory snapshots of one source database.
+
+    An instance is handed to `pynome.crawler.FTPCrawler`, which calls it
+    from the thread consuming the crawl. Snapshots are read through the
+    catalog session of that thread, and written by the catalog writer.
+
+    The store also acts as the journal of a crawl run. Each directory is
+    recorded once all of its entries have been parsed, together with any
+    results parsed so far, and these are committed every
+    `checkpoint_interval` directories. A resumed run reads the directories it
+    already completed from the catalog, and only lists the remainder.
+    """
+
+    def __init__(self, catalog, source_database, checkpoint_interval=100):
+        """Initialization of the SnapshotStore class.
+
+        :param catalog:
+            The `pynome.catalog.Catalog` of an AssemblyStorage instance.
+
+        :param source_database:
+            The name of the source database the snapshots belong to.
+
+        :param [checkpoint_interval]:
+            The number of directories recorded between each commit.
+        """
+        self.catalog = catalog
+        self.source_database = source_database
+        self.checkpoint_interval = checkpoint_interval
+        self.run_id = None
+
+        # Define private attributes of the class.
+        self._snapshots = list()
+        self._results = list()
+
+    @property
+    def session(self):
+        """The catalog session of the calling thread."""
+        return self.catalog.session
+
+    def begin(self, top_dirs, resume=False):
+        """Start a new crawl run, or resume the last interrupted one.
+
+        :param top_dirs:
+            The directories the crawl starts from.
+
+        :param [resume]:
+            If `True`, the most recent unfinished run of this source is
+            continued, if there is one.
+
+        :returns:
+            The directories the run starts from. A resumed run keeps the
+            directories it was started with.
+        """
+        if resume:
+            run = self.session.query(CrawlRun).filter(
+                CrawlRun.source_database == self.source_database,
+                CrawlRun.finished_at.is_(None)).order_by(
+                    CrawlRun.id.desc()).first()
+
+            if run is not None:
+                logging.info(f'Resuming crawl run {run.id}.')
+                self.run_id = run.id
+                return run.top_dirs
+
+            logging.warning('No interrupted crawl to resume, starting anew.')
+
+        def add_run(session):
+            run = CrawlRun(
+                source_database=self.source_database,
+                top_dirs=list(top_dirs),
+                started_at=datetime.datetime.now())
+            session.add(run)
+            session.flush()
+            return run.id
+
+        self.run_id = self.catalog.write(add_run)
+
+        return top_dirs
+
+    def finish(self):
+        """Commit any outstanding records and mark the run as finished."""
+        self.commit(finished_at=datetime.datetime.now())
+
+    def completed(self):
+        """Return the directories already completed by the current run.
+
+        :returns:
+            A set of directory paths.
+        """
+        if self.run_id is None:
+            return set()
+
+        query = self.session.query(DirectorySnapshot.path).filter(
+            DirectorySnapshot.source_database == self.source_database,
+            DirectorySnapshot.run_id == self.run_id)
+
+        return {path for path, in query}
+
+    def add_results(self, results):
+        """Queue parsed results to be saved at the next checkpoint.
+
+        :param results:
+            A list of Assembly or AssemblyRecord objects to be upserted into
+            the catalog.
+        """
+        self._results.extend(results)
+
+    def signatures(self):
+        """Return the stored size and modification time of every directory.
+
+        :returns:
+            A dictionary of ``{path: (size, modify)}``.
+        """
+        query = self.session.query(
+            DirectorySnapshot.path,
+            DirectorySnapshot.size,
+            DirectorySnapshot.modify).filter(
+                DirectorySnapshot.source_database == self.source_database)
+
+        return {path: (size, modify) for path, size, modify in query}
+
+    def get(self, path):
+        """Return the stored listing of a directory.
+
+        :param path:
+            The path of the directory.
+
+        :returns:
+            A list of FTPEntry tuples, or `None` if no snapshot is stored.
+        """
+        snapshot = self.session.get(DirectorySnapshot, path)
+
+        if snapshot is None:
+            return None
+
+        return [FTPEntry(*entry) for entry in snapshot.entries]
+
+    def put(self, path, entry, entries):
+        """Store the listing of a completed directory.
+
+        :param path:
+            The path of the directory.
+
+        :param entry:
+            The FTPEntry of this directory within its parent listing, or
+            `None` for directories a crawl was started from.
+
+        :param entries:
+            The list of FTPEntry tuples retrieved for the directory.
+        """
+        self._snapshots.append(dict(
+            path=path,
+            source_database=self.source_database,
+            size=entry.size if entry is not None else None,
+            modify=entry.modify if entry is not None else None,
+            entries=[list(e) for e in entries],
+            listed_at=datetime.datetime.now(),
+            run_id=self.run_id))
+
+        if len(self._snapshots) >= self.checkpoint_interval:
+            self.commit()
+
+    def commit(self, finished_at=None):
+        """Save any queued snapshots and results to the database, in one
+        transaction.
+
+        :param [finished_at]:
+            If given, the current run is also marked as finished at this
+            time.
+        """
+        snapshots, self._snapshots = self._snapshots, list()
+        results, self._results = self._results, list()
+        run_id = self.run_id
+
+        def save(session):
+            for snapshot in snapshots:
+                session.merge(DirectorySnapshot(**snapshot))
+
+            if results:
+                session.execute(
+                    assembly_upsert_statement(),
+                    [assembly_row(result) for result in results])
+
+            if finished_at is not None and run_id is not None:
+                session.query(CrawlRun).filter_by(id=run_id).update(
+                    {'finished_at': finished_at})
+
+        self.catalog.write(save)
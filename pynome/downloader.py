@@ -0,0 +1,606 @@
+"""This module contains the FTPDownloader class.
+
+.. module:: downloader
+    :platform: Unix
+    :synopsis: A concurrent FTP download engine. Files are fetched by a
+    bounded pool of logged in connections, with progress reporting and
+    per-file error handling.
+
+.. moduleauthor:: Tyler Biggs <biggstd@gmail.com>
+"""
+
+# General Python imports.
+import os
+import time
+import zlib
+import posixpath
+import queue
+import ftplib
+import logging
+import threading
+import contextlib
+import collections
+
+# Externam package imports.
+from tqdm import tqdm
+
+# Inter-package imports.
+from pynome.blobstore import HashingWriter
+from pynome.checksums import ChecksumError, CHECKSUMS_FILENAME, bsd_sum
+from pynome.checksums import parse_checksums, record_checksum
+from pynome.crawler import CONNECTION_ERRORS, close_ftp, connect_ftp
+
+
+# A single file to be downloaded. The `size` is the size of the remote file
+# in bytes, if known. It is used to report progress, and to tell whether a
+# local or partial file is complete.
+DownloadTask = collections.namedtuple(
+    'DownloadTask', 'remote_path local_path size')
+
+# The outcome of a DownloadTask. The `status` is one of 'done', 'skipped'
+# (the local file was already complete) or 'failed'. The `size` is the
+# number of bytes received, and `error` is the exception which stopped the
+# download, if any. The `decompressed_path` is that of the file decompressed
+# as it was downloaded, or `None` if it was not.
+DownloadResult = collections.namedtuple(
+    'DownloadResult', 'task status size seconds error decompressed_path')
+
+# The replies of a server which does not support the REST command.
+REST_REFUSED_CODES = ('500', '501', '502', '504')
+
+# The zlib window size argument which reads a gzip header and trailer.
+GZIP_WBITS = zlib.MAX_WBITS | 16
+
+
+class StreamDecompressor:
+    """Decompresses gzip data one block at a time, and writes it out.
+
+    The `update` method has the same form as that of a checksum, so a
+    StreamDecompressor can be passed to a HashingWriter, and decompresses
+    a file as it is downloaded. A file of several concatenated gzip
+    members, such as one written by bgzip, is decompressed in full.
+    """
+
+    def __init__(self, output):
+        """Initialization of the StreamDecompressor class.
+
+        :param output:
+            An object with a `write` method, such as a file opened for
+            binary writing, the decompressed data is written to.
+        """
+        self.output = output
+
+        # Define private attributes of the class.
+        self._decompressor = zlib.decompressobj(GZIP_WBITS)
+        self._in_member = False
+
+    def update(self, data):
+        """Decompress a block of compressed data."""
+        while data:
+            self._in_member = True
+            self.output.write(self._decompressor.decompress(data))
+
+            if not self._decompressor.eof:
+                return
+
+            # Any data after the end of a member starts the next one.
+            data = self._decompressor.unused_data
+            self._decompressor = zlib.decompressobj(GZIP_WBITS)
+            self._in_member = False
+
+    def finish(self):
+        """Check that the compressed data ended with a complete member.
+
+        :raises zlib.error:
+            If the data stopped part way through a member.
+        """
+        if self._in_member:
+            raise zlib.error('The compressed data is truncated.')
+
+
+class FTPDownloader:
+    """Downloads files with a pool of worker connections.
+
+    Each worker holds its own ``ftplib.FTP`` connection, which is logged in
+    when it takes its first file and reused for every file after. Workers
+    pull files from a shared queue until it is empty.
+
+    A worker whose connection drops reconnects and retries the file, up to
+    `retries` times. Any other error, or a connection error once the
+    retries are used up, fails only that file: it is reported in the
+    results, and the worker moves on to the next file.
+
+    Files are written to a temporary '.part' path and renamed into place
+    once complete, so a failed download never leaves a truncated file at
+    its local path. A file whose local size matches its remote size is
+    skipped, and an existing '.part' file shorter than the remote file is
+    resumed from its end with the REST command, whether it was left by a
+    dropped connection or by an earlier, interrupted run.
+
+    When checksums are verified, the CHECKSUMS file of each directory is
+    read once, on the first download from it. The BSD `sum` checksum of
+    each file listed is computed as its data arrives, by a `sum` process
+    where one can be run (see `pynome.checksums.bsd_sum()`), and a file
+    which does not match is downloaded again, up to `retries` times. Every check is
+    recorded in the catalog, see `pynome.checksums.FileChecksum`, and a
+    file that never matches is failed rather than moved into place.
+
+    In decompressing mode, each '.gz' file is decompressed as its data
+    arrives, and written without the '.gz' suffix, so it is never read
+    back to be decompressed. The compressed file is also written, unless
+    `keep_compressed` is `False`. Without the compressed file there is
+    nothing to resume from, so a dropped download starts over.
+    """
+
+    # Errors which indicate a dropped or broken connection.
+    connection_errors = CONNECTION_ERRORS
+
+    def __init__(self, ftp_url, workers=1, retries=3, blobs=None,
+                 progress=True, verify_checksums=True, catalog=None,
+                 decompress=False, keep_compressed=True):
+        """Initialization of the FTPDownloader class.
+
+        :param ftp_url:
+            The URL of the FTP server to be connected to.
+
+        :param [workers]:
+            The number of concurrent connections to the FTP server.
+
+        :param [retries]:
+            The number of times a worker reconnects to retry a file.
+
+        :param [blobs]:
+            A `pynome.blobstore.BlobStore`. If given, each file is hashed as
+            it is downloaded, and stored once by its digest.
+
+        :param [progress]:
+            If `True`, progress bars of the total bytes downloaded, and of
+            the file each worker is downloading, are shown.
+
+        :param [verify_checksums]:
+            If `True`, files are checked against the CHECKSUMS file of
+            their directory.
+
+        :param [catalog]:
+            The `pynome.catalog.Catalog` checksum verifications are recorded
+            in. If not given, they are only logged.
+
+        :param [decompress]:
+            If `True`, '.gz' files are decompressed as they are downloaded.
+
+        :param [keep_compressed]:
+            If `False`, the compressed copy of a decompressed file is not
+            written.
+        """
+        self.ftp_url = ftp_url
+        self.workers = max(1, int(workers))
+        self.retries = retries
+        self.blobs = blobs
+        self.progress = progress
+        self.verify_checksums = verify_checksums
+        self.catalog = catalog
+        self.decompress = decompress
+        self.keep_compressed = keep_compressed
+
+        # Define private attributes of the class.
+        self._lock = threading.Lock()
+        self._results = list()
+        self._rest_refused = False
+        self._checksums = dict()
+
+    def download(self, tasks):
+        """Download every file of `tasks`.
+
+        :param tasks:
+            An iterable of DownloadTask tuples.
+
+        :returns:
+            A list of DownloadResult tuples, one for each task, in the order
+            the downloads finished or were skipped.
+        """
+        tasks = list(tasks)
+        task_queue = queue.Queue()
+
+        for task in tasks:
+            task_queue.put(task)
+
+        self._results = list()
+        start = time.perf_counter()
+
+        total_bar = tqdm(
+            total=sum(task.size or 0 for task in tasks), unit='B',
+            unit_scale=True, desc='Downloading Assemblies...',
+            disable=not self.progress)
+
+        threads = [
+            threading.Thread(
+                target=self._worker, args=(task_queue, total_bar, position),
+                daemon=True)
+            for position in range(1, min(self.workers, len(tasks)) + 1)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        total_bar.close()
+
+        statuses = collections.Counter(
+            result.status for result in self._results)
+        failed = [result for result in self._results if result.error]
+        logging.info(
+            f'Downloaded {statuses["done"]} of {len(tasks)} files '
+            f'({sum(result.size or 0 for result in self._results)} bytes) '
+            f'in {time.perf_counter() - start:.1f}s, skipped '
+            f'{statuses["skipped"]} complete files.')
+
+        for result in failed:
+            logging.warning(
+                f'Failed to download {result.task.remote_path}: '
+                f'{result.error}')
+
+        return self._results
+
+    def _worker(self, task_queue, total_bar, position):
+        """Download files from the queue until it is empty.
+
+        :param task_queue:
+            A queue of DownloadTask tuples.
+
+        :param total_bar:
+            The progress bar of the total bytes downloaded.
+
+        :param position:
+            The line of this worker's progress bar.
+        """
+        ftp = None
+        file_bar = tqdm(
+            unit='B', unit_scale=True, position=position, leave=False,
+            disable=not self.progress)
+
+        while True:
+            try:
+                task = task_queue.get_nowait()
+            except queue.Empty:
+                break
+
+            file_bar.reset(total=task.size)
+            file_bar.set_description(os.path.basename(task.local_path))
+            start = time.perf_counter()
+
+            def progress(byte_count):
+                file_bar.update(byte_count)
+                total_bar.update(byte_count)
+
+            decompressed_path = self.decompressed_path(task)
+
+            # A complete file is skipped without connecting.
+            if self.is_complete(task):
+                progress(task.size)
+                result = DownloadResult(
+                    task, 'skipped', 0, 0.0, None, decompressed_path)
+
+            else:
+                ftp, size, error = self._fetch(
+                    ftp, task, progress, file_bar, total_bar)
+                result = DownloadResult(
+                    task, 'failed' if error else 'done', size,
+                    time.perf_counter() - start, error, decompressed_path)
+
+            with self._lock:
+                self._results.append(result)
+
+        file_bar.close()
+        close_ftp(ftp)
+
+    def _fetch(self, ftp, task, progress, file_bar, total_bar):
+        """Download a single file, reconnecting to retry it if the
+        connection drops, and downloading it again if its checksum does not
+        match or it cannot be decompressed.
+
+        :param ftp:
+            The connection of the worker, or `None` if it has none yet.
+
+        :returns:
+            A tuple of the connection of the worker, which may be a new one
+            or `None`, the number of bytes downloaded and the exception
+            which stopped the download, if any.
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                if ftp is None:
+                    ftp = connect_ftp(self.ftp_url)
+
+                return ftp, self.download_file(ftp, task, progress), None
+
+            except ((ChecksumError, zlib.error)
+                    + self.connection_errors) as error:
+                if not isinstance(error, (ChecksumError, zlib.error)):
+                    close_ftp(ftp)
+                    ftp = None
+
+                if attempt == self.retries:
+                    return ftp, None, error
+
+                logging.info(
+                    f'Retrying {task.remote_path} after error: {error}')
+
+                # The retry counts the bytes it resumes from again.
+                total_bar.update(-file_bar.n)
+                file_bar.reset(total=task.size)
+
+            except Exception as error:
+                return ftp, None, error
+
+    def decompressed_path(self, task):
+        """Return the path a task is decompressed to, or `None` if it is not
+        decompressed as it is downloaded."""
+        if self.decompress and task.local_path.endswith('.gz'):
+            return task.local_path[:-len('.gz')]
+
+        return None
+
+    def is_complete(self, task):
+        """Check whether the local file of a task matches its remote size.
+
+        A decompressed file must also exist. It stands in for the
+        compressed file, if that is not kept. A task without a remote size
+        is never complete.
+        """
+        if task.size is None:
+            return False
+
+        decompressed_path = self.decompressed_path(task)
+
+        if decompressed_path is not None:
+            if not os.path.exists(decompressed_path):
+                return False
+
+            if not self.keep_compressed:
+                return True
+
+        try:
+            return os.path.getsize(task.local_path) == task.size
+        except OSError:
+            return False
+
+    def resume_offset(self, task, temp_path):
+        """Return the offset a download can be resumed from.
+
+        :param task:
+            A DownloadTask.
+
+        :param temp_path:
+            The temporary path of the download.
+
+        :returns:
+            The size of the existing temporary file, or zero if there is
+            none, or it cannot be resumed. Without a remote size, there is
+            no telling whether the file was changed since the temporary file
+            was written, so it is not resumed.
+        """
+        if task.size is None or self._rest_refused:
+            return 0
+
+        try:
+            offset = os.path.getsize(temp_path)
+        except OSError:
+            return 0
+
+        return offset if offset <= task.size else 0
+
+    def expected_checksum(self, ftp, task):
+        """Return the checksum of a file listed by the CHECKSUMS file of its
+        directory.
+
+        The CHECKSUMS file of each directory is only downloaded once.
+
+        :param ftp:
+            A connected and logged in instance of ftplib.FTP().
+
+        :param task:
+            A DownloadTask.
+
+        :returns:
+            A checksum in the form of `pynome.checksums.BSDSum.value()`, or
+            `None` if the file is not listed, or its directory has no
+            CHECKSUMS file.
+        """
+        directory, name = posixpath.split(task.remote_path)
+
+        with self._lock:
+            checksums = self._checksums.get(directory)
+
+        if checksums is None:
+            lines = list()
+
+            try:
+                ftp.retrlines(
+                    f'RETR {posixpath.join(directory, CHECKSUMS_FILENAME)}',
+                    lines.append)
+            except ftplib.error_perm as error:
+                logging.info(
+                    f'No {CHECKSUMS_FILENAME} in {directory}: {error}')
+                lines = list()
+
+            checksums = parse_checksums(lines)
+
+            with self._lock:
+                self._checksums[directory] = checksums
+
+        return checksums.get(name)
+
+    @staticmethod
+    def discard(paths):
+        """Remove the temporary files of a failed download."""
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def place(self, temp_path, path, digest):
+        """Move a completed temporary file to its path, through the blob
+        store if there is one.
+
+        :param digest:
+            The sha256 digest of the file.
+        """
+        if self.blobs is None:
+            os.replace(temp_path, path)
+        else:
+            self.blobs.store(temp_path, path, digest)
+
+    def check_file(self, task, expected, actual, temp_paths):
+        """Record the checksum of a download, and discard it if it does not
+        match.
+
+        :param temp_paths:
+            The temporary files of the download.
+
+        :raises ChecksumError:
+            If `actual` is not `expected`.
+        """
+        if self.catalog is not None:
+            self.catalog.write(
+                record_checksum, task.remote_path, task.local_path,
+                expected, actual)
+
+        if actual != expected:
+            self.discard(temp_paths)
+            raise ChecksumError(
+                f'{task.remote_path} has checksum {actual}, expected '
+                f'{expected}.')
+
+    def download_file(self, ftp, task, progress=None):
+        """Download a single file over a connected FTP session.
+
+        The file is written to a temporary path, and only moved to its local
+        path once it is complete. A partial file left at the temporary path
+        is resumed rather than downloaded again, see `resume_offset()`. The
+        checksum of the file is verified before it is moved, see
+        `check_file()`. In decompressing mode, the decompressed file is
+        written alongside, see `decompressed_path()`.
+
+        :param ftp:
+            A connected and logged in instance of ftplib.FTP().
+
+        :param task:
+            A DownloadTask.
+
+        :param [progress]:
+            A callable passed the number of bytes of each block of data as
+            it arrives, and the size of any partial file resumed.
+
+        :returns:
+            The number of bytes downloaded.
+
+        :raises ChecksumError:
+            If the file does not match its listed checksum.
+
+        :raises zlib.error:
+            If the file cannot be decompressed.
+        """
+        if progress is None:
+            progress = lambda byte_count: None
+
+        temp_path = task.local_path + '.part'
+        decompressed_path = self.decompressed_path(task)
+        keep_compressed = decompressed_path is None or self.keep_compressed
+        temp_paths = [temp_path] if keep_compressed else list()
+
+        offset = 0
+        if keep_compressed:
+            offset = self.resume_offset(task, temp_path)
+
+        size = 0
+        refused = False
+
+        expected = None
+        if self.verify_checksums:
+            expected = self.expected_checksum(ftp, task)
+        actual = None
+
+        with contextlib.ExitStack() as stack:
+
+            # The checksum is stopped if the download fails.
+            checksums = list()
+            if expected is not None:
+                checksum = bsd_sum()
+                stack.callback(checksum.close)
+                checksums.append(checksum)
+
+            # The compressed data is only hashed, and not written, if the
+            # compressed file is not kept.
+            f = None
+            if keep_compressed:
+                f = stack.enter_context(
+                    open(temp_path, 'ab' if offset else 'wb'))
+
+            if decompressed_path is not None:
+                temp_paths.append(decompressed_path + '.part')
+                output = HashingWriter(stack.enter_context(
+                    open(decompressed_path + '.part', 'wb')))
+                decompressor = StreamDecompressor(output)
+                checksums.append(decompressor)
+
+            writer = HashingWriter(f, checksums=checksums)
+
+            def callback(data):
+                nonlocal size
+                writer.write(data)
+                size += len(data)
+                progress(len(data))
+
+            try:
+                # The resumed part of the file is also decompressed again.
+                if offset:
+                    logging.info(
+                        f'Resuming {task.remote_path} from {offset}.')
+                    writer.hash_existing(temp_path, offset)
+                    progress(offset)
+
+                # A complete temporary file only needs to be moved into
+                # place.
+                if not offset or offset < task.size:
+                    try:
+                        ftp.retrbinary(
+                            cmd=f'RETR {task.remote_path}',
+                            callback=callback, rest=offset or None)
+
+                    except ftplib.error_perm as error:
+                        if (not offset or str(error)[:3]
+                                not in REST_REFUSED_CODES):
+                            raise
+
+                        logging.info(
+                            f'{self.ftp_url} refused REST, downloading '
+                            f'{task.remote_path} from the start.')
+                        self._rest_refused = True
+                        refused = True
+
+                if decompressed_path is not None and not refused:
+                    decompressor.finish()
+
+                if expected is not None and not refused:
+                    actual = checksum.value()
+
+            except zlib.error:
+                stack.close()
+                self.discard(temp_paths)
+                raise
+
+        if refused:
+            progress(-offset)
+            return self.download_file(ftp, task, progress)
+
+        if expected is not None:
+            self.check_file(task, expected, actual, temp_paths)
+
+        if decompressed_path is not None:
+            self.place(decompressed_path + '.part', decompressed_path,
+                       output.hexdigest())
+
+        if keep_compressed:
+            self.place(temp_path, task.local_path, writer.hexdigest())
+
+        return size
@@ -20,9 +20,11 @@ import pandas
 from tqdm import tqdm
 
 # Inter-package imports.
-from pynome.assembly import Assembly
-from pynome.assemblydatabase import AssemblyDatabase
-from pynome.utils import crawl_ftp_dir
+from pynome.assembly import AssemblyRecord
+from pynome.assemblydatabase import AssemblyDatabase, AssemblyCoalescer
+from pynome.crawler import FTPCrawler, NameFilter
+from pynome.downloader import DownloadTask, FTPDownloader
+from pynome.ensemblparser import EnsemblFilenameParser
 
 
 # pylint: disable=too-many-instance-attributes
@@ -33,8 +35,17 @@ class EnsemblDatabase(AssemblyDatabase):
     genome assembly files from the Ensembl database.
     """
 
+    # The catalog columns needed by `download()`.
+    download_fields = (
+        'base_filename', 'base_filepath',
+        'fasta_remote_path', 'fasta_remote_size',
+        'gff3_remote_path', 'gff3_remote_size')
+
     def __init__(self, ignored_dirs, data_types, ftp_url, kingdoms,
-                 release_version, bad_filenames, crawl_urls=None, **kwargs):
+                 release_version, bad_filenames, crawl_urls=None,
+                 crawl_workers=1, discovery_mode='walk', crawl_filters=None,
+                 download_workers=1, verify_checksums=True,
+                 stream_decompress=False, keep_compressed=True, **kwargs):
         """The initialization function for EnsemblDatabase.
 
         Calls the constructor of AssemblyDatabase, and creates
@@ -66,6 +77,38 @@ class EnsemblDatabase(AssemblyDatabase):
             An optinal list of urls. If given these will be used as starting
             points for calls to crawl().
 
+        :param [crawl_workers]:
+            The number of concurrent FTP connections used by crawl().
+
+        :param [discovery_mode]:
+            Either 'walk', to crawl every directory below `top_dirs`, or
+            'manifest', to only list the directory of each species given by
+            the species.txt metadata file. See `manifest_dirs`.
+
+        :param [crawl_filters]:
+            A dictionary of rules deciding which directories are crawled,
+            see `enter_directory`. For example::
+
+                {"collections": {"include": [], "exclude": ["*_bacteria*"]},
+                 "species": {"include": ["saccharomyces_*"], "exclude": []},
+                 "max_depth": 3}
+
+        :param [download_workers]:
+            The number of concurrent FTP connections used by download().
+
+        :param [verify_checksums]:
+            If `True`, downloads are checked against the CHECKSUMS file of
+            their directory.
+
+        :param [stream_decompress]:
+            If `True`, the fasta and gff3 files are decompressed as they are
+            downloaded, rather than by the decompress stage of
+            `AssemblyStorage.prepare()`.
+
+        :param [keep_compressed]:
+            If `False`, the '.gz' files are not kept when they are
+            decompressed as they are downloaded.
+
         :param [**kwargs]:
             Remaining arguments are passed to AssemblyDatabase.
         """
@@ -82,8 +125,23 @@ class EnsemblDatabase(AssemblyDatabase):
         self.kingdoms = kingdoms
         self.release_version = release_version
         self.bad_filenames = bad_filenames
+        self.parser = EnsemblFilenameParser(bad_filenames)
         self.crawl_urls = crawl_urls
+        self.crawl_workers = crawl_workers
+        self.discovery_mode = discovery_mode
+        self.download_workers = download_workers
+        self.verify_checksums = verify_checksums
+        self.stream_decompress = stream_decompress
+        self.keep_compressed = keep_compressed
         self.assemblies = list()
+        self.incomplete_assemblies = list()
+
+        # Build the directory filters from the crawl_filters dictionary.
+        crawl_filters = crawl_filters or dict()
+        self.collection_filter = NameFilter(
+            **crawl_filters.get('collections', dict()))
+        self.species_filter = NameFilter(**crawl_filters.get('species', dict()))
+        self.max_crawl_depth = crawl_filters.get('max_depth')
 
         # Define private attributes of the class.
         self.metadata_df = None
@@ -109,233 +167,293 @@ class EnsemblDatabase(AssemblyDatabase):
         # Create the list to be output.
         uri_list = list()
 
-        # Generate the ordered pairs of datatypes and kingdoms.
-        datatype_kingdom_pairs = itertools.product(
-            self.data_types, self.kingdoms)
+        # Generate the ordered pairs of kingdoms and datatypes. Every
+        # datatype of a kingdom is crawled before the next kingdom, so the
+        # two files of an assembly are found close together, and the
+        # assemblies waiting on their partner never span several kingdoms.
+        kingdom_datatype_pairs = itertools.product(
+            self.kingdoms, self.data_types)
 
         # For each pair, generate the corresponding URI.
-        for datatype, kingdom in datatype_kingdom_pairs:
+        for kingdom, datatype in kingdom_datatype_pairs:
             uri = '/'.join(('pub', kingdom, self.release_version, datatype, ''))
             uri_list.append(uri)
 
         # Return the list of uris.
         return uri_list
 
-    def ensembl_file_parser(self, line, top_dir):
-        """Examines a line and add creates a GenomeAssembly if appropriate.
-
-        This function parses one 'line' at a time retrieved from an
-        ``ftp.dir()`` command. This line has already been confirmed to
-        not be a directory.
+    def enter_directory(self, path):
+        """Decide whether a directory should be crawled.
 
-        :param line:
-            An input line, described in detail below.
+        The path is examined below the ``pub/<kingdom>/<release>/<datatype>/``
+        directory. The first level below that holds either collections
+        (names ending in '_collection'), which are checked against
+        `self.collection_filter`, or species, which are checked against
+        `self.species_filter`. The species within a collection are the
+        second level. Directories deeper than `self.max_crawl_depth` levels
+        are not crawled.
 
-        :param top_dir:
-            The parent directory.
+        :param path:
+            The path of a directory, such as
+            ``'pub/fungi/release-38/fasta/fungi_ascomycota1_collection/'``.
 
-        :param bad_dirs:
-            A list of words / strings. Files found with these terms in
-            them will be rejected by the parser.
+        :returns:
+            `True` if the directory should be crawled.
         """
+        components = path.strip('/').split('/')
 
-        # Parse the line.
-        parsed_line = self.parse_ensembl_dir_line(line)
+        # Directories above the datatype level are always crawled.
+        if len(components) < 4 or components[0] != 'pub':
+            return True
 
-        # If the parse_ensembl_dir_line returns None, do not examine
-        # the listing.
-        if parsed_line is None:
-            return
+        below_datatype = components[4:]
 
-        # If the filename contains a 'bad word', we should exit the function.
-        if any(bw in parsed_line['file_name'] for bw in self.bad_filenames):
-            # This means that one of the undesired files has been located.
-            return
+        if (self.max_crawl_depth is not None
+                and len(below_datatype) > self.max_crawl_depth):
+            return False
 
-        # Examine the parsed output to determine if a GenomeAssembly object
-        # should be created. Create a dictinoary of kwargs and filter off
-        # any values of 'None', then use this dictinoaryto create a
-        # new Assembly instance.
-        if parsed_line['file_name'].endswith('.dna.toplevel.fa.gz'):
-            # Then this file is a fasta file.
-
-            # Remove the trailing filename from the file_name.
-            # Create the corresponding argument dictionary.
-            new_assembly_kwargs = {
-                'source_database': self.database_name,
-                'species': parsed_line['species'],
-                'genus': parsed_line['genus'],
-                'intraspecific_name': parsed_line['intraspecific_name'],
-                'assembly_id': parsed_line['assebly_name'].replace(
-                    '.dna.toplevel.fa.gz', ''),
-                'version': self.release_version,
-                'fasta_remote_path': ''.join((
-                    top_dir, parsed_line['file_name'])),
-                'fasta_remote_size': parsed_line['file_size']}
-
-            # Create the new Assembly object.
-            new_genome_assembly = Assembly(**new_assembly_kwargs)
-
-            # Append it to the assemblies list, which is defined in the
-            # AssemblyDatabase parent class.
-            self.assemblies.append(new_genome_assembly)
-
-            # Exit the if loop.
-            return
+        if not below_datatype:
+            return True
 
-        elif parsed_line['file_name'].endswith('.gff3.gz'):
-            # Then this file is a gff3 file.
-            # Split by periods to remove the version and file extension.
-            assembly_id = parsed_line['assebly_name'].rsplit('.', 3)
-
-            new_assembly_kwargs = {
-                'source_database': self.database_name,
-                'species': parsed_line['species'],
-                'genus': parsed_line['genus'],
-                'intraspecific_name': parsed_line['intraspecific_name'],
-                'assembly_id': assembly_id[0],
-                'version': self.release_version,
-                'gff3_remote_path': ''.join((
-                    top_dir, parsed_line['file_name'])),
-                'gff3_remote_size': parsed_line['file_size']}
-
-            # Create the new Assembly object.
-            new_genome_assembly = Assembly(**new_assembly_kwargs)
-
-            # Append it to the assemblies list, which is defined in the
-            # AssemblyDatabase parent class.
-            self.assemblies.append(new_genome_assembly)
-
-            # Exit the if loop.
-            return
+        first = below_datatype[0]
+
+        if first.endswith('_collection'):
+            if not self.collection_filter(first):
+                return False
+            if len(below_datatype) > 1:
+                return self.species_filter(below_datatype[1])
+            return True
 
-    def parse_ensembl_dir_line(self, in_line):
-        """Parse an individual line item from an ftp.dir() call.
+        return self.species_filter(first)
 
-        This function splits a line retrieved from the ensembl ftp server
-        from a call to ftp.dir().
+    def manifest_dirs(self):
+        """Build the directories holding the files of each species listed in
+        the species.txt metadata file.
 
-        :param in_line:
-            A filename (string). This function assumes these strings are from
-            the Ensembl database, and parses them appropriately.
+        Fasta files are found at
+        ``pub/<kingdom>/<release>/fasta/[<collection>/]<species>/dna/``, and
+        gff3 files at ``pub/<kingdom>/<release>/gff3/[<collection>/]<species>/``.
+        The kingdom is given by the `division` column, and the collection, if
+        any, by the `core_db` column.
 
         :returns:
-            A dictionary of keywords that can be used in the construction of a
-            GenomeAssembly object.
+            A dictionary of ``{directory: species}``, in which `species` is
+            the prefix expected of the filenames within that directory.
+        """
+        if self.metadata_df is None:
+            self.download_metadata()
 
+        # Map division names, such as 'EnsemblFungi', to kingdoms.
+        divisions = {'Ensembl' + k.capitalize(): k for k in self.kingdoms}
 
-        An example line, and its index locations, are shown below::
+        manifest = dict()
 
-            ``"drwxr-sr-x  2 ftp   ftp    4096 Jan 13  2015 filename"
-               [0]        [1][2]   [3]    [4]  [5] [6] [7]  [8] or [-1]``
+        for species, division, core_db in self.metadata_df[
+                ['species', 'division', 'core_db']].itertuples(index=False):
 
-        Parses a filename to retrieve the species, assembly, version and other
-        information needed to greate a new instance of GenomeAssembly.
+            kingdom = divisions.get(division)
 
-        The filenames themselves are assumed to be either gff3 or fasta files.
-        Examples of these files, extracted from README files, are shown below.
+            # Skip any species outside of the kingdoms of interest.
+            if kingdom is None:
+                continue
 
-        gff3 files::
+            # Species within a collection share the collection's core
+            # database, e.g. 'fungi_ascomycota1_collection_core_38_91_1'.
+            collection = None
+            if '_collection_core_' in core_db:
+                collection = core_db.split('_core_', 1)[0]
 
-            ``<species>.<assembly>.<_version>.gff3.gz``
+            for datatype in self.data_types:
+                path = ['pub', kingdom, self.release_version, datatype,
+                        collection, species]
 
-        fasta files::
+                if datatype == 'fasta':
+                    path.append('dna')
 
-            ``<species>.<assembly>.<sequence type>.<id type>.<id>.fa.gz``
-        """
+                uri = '/'.join(p for p in path if p is not None) + '/'
 
-        # Split the input string by whitespace.
-        dir_list = in_line.split()
+                if self.enter_directory(uri):
+                    manifest[uri] = species
 
-        # Pull needed information out of this list. It is always the last item.
-        file_name = dir_list[-1]
-        file_size = dir_list[4]
+        return manifest
 
-        # If the filename contains a 'bad word', we should exit the function.
-        if any(bw in file_name for bw in self.bad_filenames):
-            # This means that one of the undesired files has been located.
-            return
+    def ensembl_file_parser(self, entry, top_dir):
+        """Examines an entry and creates an AssemblyRecord if appropriate.
 
-        logging.debug(f'parsing the line: {in_line}')
+        This function parses one FTPEntry at a time retrieved from a
+        directory listing. This entry has already been confirmed to
+        not be a directory.
 
-        # Split the file_name by the first two '.'.
-        # This will give a string that contains the genus and species
-        # informaiton, and a string that contains the assembly name.
-        try:
-            name_list = file_name.split('.', 2)
-            genus_species, assembly_name = name_list[0], name_list[1]
-        except:
-            logging.warning(f'Unable to parse {file_name}')
-            return
+        :param entry:
+            An FTPEntry, or a line retrieved from an ``ftp.dir()`` call.
 
-        # Begin the parsing of the genus_species string. These strings can be
-        # further split by intraspecific names and identifiers.
-        try:
+        :param top_dir:
+            The parent directory.
 
-            # Split the genus and species by underscores.
-            gen_species_list = genus_species.split('_')
+        :returns:
+            A new AssemblyRecord, or `None` if the entry is not a fasta or
+            gff3 file of interest.
+        """
+        record = self.parser.parse(entry, top_dir)
 
-            # Some entries have leading underscores -- this caueses 'None' to
-            # appear in the list. 'None' entries must be removed.
-            gen_species_list = list(filter(None, gen_species_list))
+        if record is None:
+            return None
 
-            genus = gen_species_list[0]
-            species = gen_species_list[1]
+        return self.record_to_assembly(record)
 
+    def record_to_assembly(self, record):
+        """Create an AssemblyRecord from a parsed EnsemblFile record.
 
-            # If the length of gen_species_list is greater than 2, an
-            # intraspecific name is present.
-            if len(gen_species_list) > 2:
+        Crawls produce lightweight records, the Assembly models are only
+        built when the records are saved to the catalog.
 
-                # intraspecific name is present, and should be the third
-                # element in the list to the end of the list.
-                intraspecific_name = '_'.join(gen_species_list[2:])
+        :param record:
+            A `pynome.ensemblparser.EnsemblFile`.
 
-            # Otherwise there is no intraspecific name.
-            else:
+        :returns:
+            A new AssemblyRecord, with either the fasta or gff3 remote path
+            and size filled in.
+        """
+        # Create a dictionary of kwargs, then use it to create a new
+        # AssemblyRecord instance.
+        new_assembly_kwargs = {
+            'source_database': self.database_name,
+            'species': record.species,
+            'genus': record.genus,
+            'intraspecific_name': record.intraspecific_name,
+            'assembly_id': record.assembly_id,
+            'version': self.release_version,
+            f'{record.kind}_remote_path': record.remote_path,
+            f'{record.kind}_remote_size': record.size}
+
+        return AssemblyRecord(**new_assembly_kwargs)
+
+    def iter_crawl(self, uri_list=None, snapshots=None, incremental=False,
+                   resume=False):
+        """Crawl the Ensembl FTP server, and yield each assembly as it is
+        found.
+
+        Directories are listed concurrently by `self.crawl_workers`
+        connections, but files are parsed in the same order as a serial
+        crawl, so the assemblies yielded do not depend on the number of
+        workers.
+
+        The fasta and gff3 files of each genome are combined by an
+        AssemblyCoalescer, so every assembly is yielded once, as soon as
+        both of its files have been found. Only assemblies waiting on their
+        second file are held in memory. As `self.top_dirs` are ordered
+        kingdom by kingdom, these are at most the assemblies of the first
+        datatype crawled in one kingdom. Those that never find their second
+        file are yielded at the end of the crawl, and listed in
+        `self.incomplete_assemblies`.
+
+        :param [uri_list]:
+            A list of directories to start the crawl from. Defaults to
+            `self.top_dirs`.
+
+        :param [snapshots]:
+            A `pynome.crawlstate.SnapshotStore`. It journals the crawl: the
+            listing of every directory is saved to it once the assemblies
+            parsed from that directory have been yielded.
+
+        :param [incremental]:
+            If `True`, directories unchanged since the snapshots were taken
+            are not listed again.
+
+        :param [resume]:
+            If `True`, the last interrupted crawl journaled by `snapshots`
+            is continued, rather than a new one started.
 
-                # Set intraspecific_name to None.
-                intraspecific_name = None
+        :returns:
+            A generator of AssemblyRecord objects.
+        """
+        coalescer = AssemblyCoalescer(self.data_types)
 
-                # Get the genus and species from the gen_species_list.
-                # Since there is no intraspecific name, split the list once.
-                # genus, species = genus_species.split('_', 1)
+        for new_assembly in coalescer.coalesce(self._iter_files(
+                uri_list, snapshots, incremental, resume)):
+            yield new_assembly
 
-        except Exception as error:
-            print('Unable to parse ensembl ftp filename.', error)
+        self.incomplete_assemblies = coalescer.incomplete
 
-        # Return the dictionary of values parsed from the directory listing.
-        return {
-            'genus': genus,
-            'assebly_name': assembly_name,
-            'species': species,
-            'intraspecific_name': intraspecific_name,
-            'file_name': file_name,
-            'file_size': file_size,
-        }
+        if coalescer.incomplete:
+            logging.warning(
+                f'{len(coalescer.incomplete)} assemblies are incomplete.')
 
-    def crawl(self, uri_list=None):
+    def _iter_files(self, uri_list, snapshots, incremental, resume):
+        """Crawl the Ensembl FTP server, and yield an Assembly for each file
+        found. See `iter_crawl` for a description of the parameters.
         """
-        """
-        # If no uri_list is provided, set it to the class property.
-        if uri_list is None:
-            uri_list = self.top_dirs
+        # In manifest mode, only the directory of each species is listed,
+        # and only files belonging to that species are accepted.
+        manifest = None
+        crawler_kwargs = dict()
 
-        # Connect to the FTP server and login with anonymous credentials.
-        self.ftp.connect(self.ftp_url)
-        self.ftp.login()
+        # If no uri_list is provided, set it to the class property, or the
+        # directories of the manifest.
+        if uri_list is None:
+            if self.discovery_mode == 'manifest':
+                manifest = self.manifest_dirs()
+                uri_list = list(manifest)
+                crawler_kwargs = {'max_depth': 0, 'skip_missing': True}
+            else:
+                uri_list = self.top_dirs
+
+        if snapshots is not None:
+            uri_list = snapshots.begin(uri_list, resume=resume)
+
+        # Start the pool of connections, each logs in with anonymous
+        # credentials, and crawl every uri. The directory filters are applied
+        # before a directory is listed.
+        with FTPCrawler(self.ftp_url, self.ignored_dirs, self.crawl_workers,
+                        snapshots=snapshots,
+                        incremental=incremental,
+                        dir_filter=self.enter_directory,
+                        **crawler_kwargs) as crawler:
+
+            try:
+                for top_dir, entry in tqdm(
+                        crawler.iter_crawl(uri_list),
+                        desc='Crawling. This make take some time.',
+                        unit=' files'):
+
+                    if manifest is not None and not entry.name.lower(
+                            ).startswith(manifest[top_dir].lower() + '.'):
+                        continue
+
+                    new_assembly = self.ensembl_file_parser(entry, top_dir)
+
+                    if new_assembly is not None:
+                        yield new_assembly
+
+            # Save the progress made so far, so the crawl can be resumed.
+            except BaseException:
+                if snapshots is not None:
+                    snapshots.commit()
+                raise
+
+        if snapshots is not None:
+            snapshots.finish()
+
+        logging.info(
+            f'Crawl listed {crawler.listed_count} directories and reused '
+            f'{crawler.reused_count} snapshots.')
+
+    def crawl(self, uri_list=None, snapshots=None, incremental=False,
+              resume=False):
+        """Crawl the Ensembl FTP server and add every assembly found to
+        `self.assemblies`.
+
+        See `iter_crawl` for a description of the parameters. The assemblies
+        found are also journaled by `snapshots`, if it is given.
+        """
+        for new_assembly in self.iter_crawl(
+                uri_list, snapshots=snapshots, incremental=incremental,
+                resume=resume):
 
-        # Start a crawl at each uri.
-        for uri in tqdm(uri_list, desc='Crawling. This make take some time.'):
-            crawl_ftp_dir(
-                ftp=self.ftp,
-                top_dir=uri,
-                parsing_function=self.ensembl_file_parser,
-                ignored_dirs=self.ignored_dirs,
-            )
+            self.assemblies.append(new_assembly)
 
-        # Close the FTP connection.
-        self.ftp.quit()
+            if snapshots is not None:
+                snapshots.add_results([new_assembly])
 
     def download_metadata(self, base_path=None):
         """
@@ -366,10 +484,11 @@ class EnsemblDatabase(AssemblyDatabase):
 
         # size_estimate = self.ftp.size(self.metadata_uri)
 
-        self.ftp.retrbinary(
-            cmd='RETR {}'.format(self.metadata_uri),
-            callback=open(target_file, 'wb').write
-        )
+        with open(target_file, 'wb') as f:
+            self.ftp.retrbinary(
+                cmd='RETR {}'.format(self.metadata_uri),
+                callback=f.write
+            )
 
         # Close the FTP connection.
         self.ftp.quit()
@@ -382,8 +501,37 @@ class EnsemblDatabase(AssemblyDatabase):
             sep="\t",
             index_col=False)
 
-    def download(self, assemblies, base_path=None):
-        """
+    def download(self, assemblies, base_path=None, blobs=None, catalog=None):
+        """Download the fasta and gff3 files of the given assemblies.
+
+        Files are fetched concurrently by `self.download_workers`
+        connections, see `pynome.downloader.FTPDownloader`. A file which
+        fails to download does not stop the others. Files already matching
+        their stored remote size are skipped, and partial files are resumed.
+        Each file is checked against the CHECKSUMS file of its directory as
+        it is downloaded, unless `self.verify_checksums` is `False`. If
+        `self.stream_decompress` is `True`, each file is also decompressed
+        as it is downloaded.
+
+        :param assemblies:
+            An iterable of assemblies, which need the columns named by
+            `download_fields`.
+
+        :param [base_path]:
+            The directory the files are saved under. Defaults to a
+            'genomes' folder within the current directory.
+
+        :param [blobs]:
+            A `pynome.blobstore.BlobStore`. If given, each file is hashed as
+            it is downloaded, and stored once by its digest.
+
+        :param [catalog]:
+            A `pynome.catalog.Catalog` the checksum of each file is recorded
+            in.
+
+        :returns:
+            A list of `pynome.downloader.DownloadResult` tuples, one for
+            each file.
         """
         # TODO: Consider how this function is called from AssemblyStorage.
         # If a base_path is not given, create a folder called 'genomes',
@@ -391,18 +539,15 @@ class EnsemblDatabase(AssemblyDatabase):
         if base_path is None:
             base_path = os.path.join(os.getcwd(), 'genomes')
 
-        # Connect to the FTP server and login with anonymous credentials.
-        self.ftp.connect(self.ftp_url)
-        self.ftp.login()
+        tasks = list()
 
-        for gen in tqdm(assemblies, desc='Downloading Assemblies...'):
+        for gen in assemblies:
 
             # Create the base_path for this genome assembly.
             curr_base_path = os.path.join(base_path, gen.base_filepath)
 
             # Create the intermediary folders if they do not exist.
-            if not os.path.exists(curr_base_path):
-                os.makedirs(curr_base_path)
+            os.makedirs(curr_base_path, exist_ok=True)
 
             # Create the local filenames.
             new_gff3 = os.path.join(
@@ -413,17 +558,22 @@ class EnsemblDatabase(AssemblyDatabase):
                 curr_base_path,
                 gen.base_filename + '.fa.gz')
 
-            # Download the desired files.
-            self.ftp.retrbinary(
-                cmd=f'RETR {gen.fasta_remote_path}',
-                callback=open(new_fasta, 'wb').write)
+            # Queue the desired files. An incomplete assembly may be
+            # missing one of them.
+            for remote_path, local_path, size in (
+                    (gen.fasta_remote_path, new_fasta, gen.fasta_remote_size),
+                    (gen.gff3_remote_path, new_gff3, gen.gff3_remote_size)):
 
-            self.ftp.retrbinary(
-                cmd=f'RETR {gen.gff3_remote_path}',
-                callback=open(new_gff3, 'wb').write)
+                if remote_path is not None:
+                    tasks.append(DownloadTask(remote_path, local_path, size))
 
-        # Close the FTP connection.
-        self.ftp.quit()
+        downloader = FTPDownloader(
+            self.ftp_url, workers=self.download_workers, blobs=blobs,
+            verify_checksums=self.verify_checksums, catalog=catalog,
+            decompress=self.stream_decompress,
+            keep_compressed=self.keep_compressed)
+
+        return downloader.download(tasks)
 
     def find_taxonomy_id(self, tax_name):
         """Searches the self.metadata_df attribute for a matching taxonomy ID.
@@ -453,12 +603,16 @@ class EnsemblDatabase(AssemblyDatabase):
         of tuples containing the base_filename and an update dictionary.
 
         :param [assemblies=None]:
-            If no list of assembly objects is given, the contents of
-            self.assemblies is used instead.
+            An iterable of assemblies, or of rows with `base_filename` and
+            `taxonomy_name` fields, such as those yielded by
+            `AssemblyStorage.iter_assemblies()`. If none are given, the
+            contents of self.assemblies is used instead.
 
         :returns:
             A list of tuples, containing the assemblies base filename and an
-            update dictionary containing the newly found taxnomy_ID.
+            update dictionary containing the newly found taxnomy_ID. This
+            can be passed directly to
+            `AssemblyStorage.bulk_update_assemblies()`.
         """
         # Output list holder.
         tax_update_list = list()
@@ -0,0 +1,152 @@
+"""This module contains the EnsemblFilenameParser class.
+
+.. module:: ensemblparser
+    :platform: Unix
+    :synopsis: A compiled, single-pass parser for the directory listings and
+    filenames of the Ensembl FTP server.
+
+.. moduleauthor:: Tyler Biggs <biggstd@gmail.com>
+"""
+
+# General Python imports.
+import re
+import logging
+import collections
+
+
+# A file parsed from an Ensembl listing. The `kind` is either 'fasta' or
+# 'gff3', and `remote_path` is the full path of the file on the server.
+EnsemblFile = collections.namedtuple(
+    'EnsemblFile',
+    'kind genus species intraspecific_name assembly_id remote_path size')
+
+# A line of ``ftp.dir()`` output, see `pynome.crawler.parse_list_line`.
+LIST_LINE_RE = re.compile(
+    r'^(?P<type>\S)\S*\s+\d+\s+\S+\s+\S+\s+(?P<size>\d+)\s+'
+    r'\S+\s+\d+\s+[\d:]+\s+(?P<name>.+?)(?: -> .*)?$')
+
+# The Ensembl filename grammar. Examples of these files, extracted from
+# README files, are shown below.
+#
+# gff3 files::
+#
+#     <species>.<assembly>.<_version>.gff3.gz
+#
+# fasta files::
+#
+#     <species>.<assembly>.<sequence type>.<id type>.<id>.fa.gz
+#
+# Only the toplevel dna fasta files are of interest. The assembly is the
+# second '.' delimited field of the name.
+FILENAME_RE = re.compile(
+    r'^(?P<genus_species>[^.]+)\.(?P<assembly>[^.]+)\.(?:.*\.)?'
+    r'(?P<kind>dna\.toplevel\.fa|gff3)\.gz$')
+
+# Names of files which should match FILENAME_RE.
+CANDIDATE_RE = re.compile(r'\.(?:fa|gff3)\.gz$')
+
+
+class EnsemblFilenameParser:
+    """Parses Ensembl directory listings into EnsemblFile records.
+
+    Each name is examined by a single precompiled regular expression, and
+    rejected by a single combined matcher for the `bad_filenames`. Names that
+    look like fasta or gff3 files but do not follow the Ensembl grammar are
+    logged once, no matter how often they are seen.
+    """
+
+    def __init__(self, bad_filenames):
+        """Initialization of the EnsemblFilenameParser class.
+
+        :param bad_filenames:
+            A list of words / strings. Files found with these terms in
+            them will be rejected by the parser.
+        """
+        self.bad_filenames = bad_filenames
+
+        # Combine every bad filename into one matcher. A pattern that can
+        # never match is used when there are none.
+        if bad_filenames:
+            self._bad_re = re.compile(
+                '|'.join(re.escape(bw) for bw in bad_filenames))
+        else:
+            self._bad_re = re.compile(r'(?!)')
+
+        # Define private attributes of the class.
+        self._malformed = set()
+
+    def parse(self, entry, top_dir):
+        """Parse a single file entry.
+
+        :param entry:
+            An FTPEntry, or a line retrieved from an ``ftp.dir()`` call.
+
+        :param top_dir:
+            The parent directory of the file.
+
+        :returns:
+            An EnsemblFile, or `None` if the file is not a fasta or gff3
+            file of interest.
+        """
+        if isinstance(entry, str):
+            match = LIST_LINE_RE.match(entry)
+
+            # Directories and unrecognized lines are not files.
+            if match is None or match.group('type') == 'd':
+                return None
+
+            name, size = match.group('name'), int(match.group('size'))
+
+        else:
+            name, size = entry.name, entry.size
+
+        if self._bad_re.search(name):
+            return None
+
+        match = FILENAME_RE.match(name)
+
+        if match is None:
+            if CANDIDATE_RE.search(name):
+                self._report(name, top_dir)
+            return None
+
+        # Some entries have leading underscores, empty strings must be
+        # removed from the split genus and species.
+        names = [n for n in match.group('genus_species').split('_') if n]
+
+        if len(names) < 2:
+            self._report(name, top_dir)
+            return None
+
+        return EnsemblFile(
+            kind='fasta' if match.group('kind') == 'dna.toplevel.fa'
+            else 'gff3',
+            genus=names[0],
+            species=names[1],
+            intraspecific_name='_'.join(names[2:]) or None,
+            assembly_id=match.group('assembly'),
+            remote_path=top_dir + name,
+            size=size)
+
+    def parse_many(self, lines, top_dir):
+        """Parse every file within a directory listing.
+
+        :param lines:
+            An iterable of FTPEntry tuples, or lines retrieved from an
+            ``ftp.dir()`` call.
+
+        :param top_dir:
+            The directory the lines were listed from.
+
+        :returns:
+            A list of EnsemblFile records, one for each file of interest.
+        """
+        parse = self.parse
+        return [record for record in (parse(line, top_dir) for line in lines)
+                if record is not None]
+
+    def _report(self, name, top_dir):
+        """Log a malformed filename, once."""
+        if name not in self._malformed:
+            self._malformed.add(name)
+            logging.warning(f'Unable to parse {top_dir}{name}')
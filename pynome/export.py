@@ -0,0 +1,217 @@
+"""This module contains the export and import of the local catalog.
+
+.. module:: export
+    :platform: Unix
+    :synopsis: Chunked export of the Assemblies table to Parquet, Arrow IPC
+    or TSV files, and the matching bulk import.
+
+.. moduleauthor:: Tyler Biggs <biggstd@gmail.com>
+"""
+
+# General Python imports.
+import os
+import csv
+
+# SQLAlchemy imports.
+from sqlalchemy import Integer
+
+# Inter-package imports.
+from pynome.assembly import Assembly, ASSEMBLY_COLUMNS
+from pynome.utils import iter_batches
+
+
+# The formats a catalog can be exported to.
+EXPORT_FORMATS = ('parquet', 'arrow', 'tsv')
+
+# The format implied by each file suffix.
+FORMAT_SUFFIXES = {
+    '.parquet': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+    '.ipc': 'arrow',
+    '.tsv': 'tsv',
+}
+
+# The columns of the Assemblies table holding integers. All others hold
+# strings.
+INTEGER_COLUMNS = frozenset(
+    column.name for column in Assembly.__table__.columns
+    if isinstance(column.type, Integer))
+
+
+def import_pyarrow():
+    """Import pyarrow, which is an optional dependency of Pynome.
+
+    :returns:
+        The pyarrow module, with its `parquet` submodule loaded.
+    """
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError(
+            'The parquet and arrow formats require pyarrow. Install it with '
+            '`pip install pyarrow`.') from None
+
+    return pyarrow
+
+
+def arrow_schema(pyarrow):
+    """Return the Arrow schema of the Assemblies table."""
+    return pyarrow.schema([
+        pyarrow.field(
+            column,
+            pyarrow.int64() if column in INTEGER_COLUMNS
+            else pyarrow.string())
+        for column in ASSEMBLY_COLUMNS])
+
+
+def guess_format(path, file_format=None):
+    """Return the format of a catalog file.
+
+    :param path:
+        The path of the file.
+
+    :param [file_format]:
+        The format, if known. Otherwise it is taken from the file suffix.
+    """
+    if file_format is None:
+        suffix = os.path.splitext(path)[1].lower()
+        file_format = FORMAT_SUFFIXES.get(suffix)
+
+        if file_format is None:
+            raise ValueError(f'Unable to tell the format of {path}.')
+
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f'Unknown catalog format {file_format!r}.')
+
+    return file_format
+
+
+def write_catalog(rows, path, file_format=None, batch_size=1000):
+    """Write the rows of the Assemblies table to a file, one chunk at a
+    time.
+
+    The file is written under a temporary name, and renamed once it is
+    complete.
+
+    :param rows:
+        An iterable of tuples of the values of `ASSEMBLY_COLUMNS`.
+
+    :param path:
+        The path of the file to write.
+
+    :param [file_format]:
+        One of `EXPORT_FORMATS`. By default, it is taken from the suffix of
+        `path`.
+
+    :param [batch_size]:
+        The number of rows per chunk. Each chunk is a row group of a
+        Parquet file, or a record batch of an Arrow file.
+
+    :returns:
+        The number of rows written.
+    """
+    file_format = guess_format(path, file_format)
+    temp_path = path + '.part'
+    row_count = 0
+
+    if file_format == 'tsv':
+        with open(temp_path, 'w', newline='') as f:
+            writer = csv.writer(f, delimiter='\t')
+            writer.writerow(ASSEMBLY_COLUMNS)
+
+            for batch in iter_batches(rows, batch_size):
+                writer.writerows(
+                    ['' if value is None else value for value in row]
+                    for row in batch)
+                row_count += len(batch)
+
+    else:
+        pyarrow = import_pyarrow()
+        schema = arrow_schema(pyarrow)
+
+        if file_format == 'parquet':
+            writer = pyarrow.parquet.ParquetWriter(temp_path, schema)
+        else:
+            writer = pyarrow.ipc.new_file(temp_path, schema)
+
+        with writer:
+            for batch in iter_batches(rows, batch_size):
+                record_batch = pyarrow.RecordBatch.from_arrays(
+                    [pyarrow.array(values, type=field.type)
+                     for values, field in zip(zip(*batch), schema)],
+                    schema=schema)
+
+                if file_format == 'parquet':
+                    writer.write_table(
+                        pyarrow.Table.from_batches([record_batch]))
+                else:
+                    writer.write_batch(record_batch)
+
+                row_count += len(batch)
+
+    os.replace(temp_path, path)
+
+    return row_count
+
+
+def read_catalog(path, file_format=None, batch_size=1000):
+    """Read a file written by `write_catalog()`, one chunk at a time.
+
+    Columns that are not part of the Assemblies table are ignored, and
+    missing columns are `None`.
+
+    :param path:
+        The path of the file to read.
+
+    :param [file_format]:
+        One of `EXPORT_FORMATS`. By default, it is taken from the suffix of
+        `path`.
+
+    :param [batch_size]:
+        The maximum number of rows per chunk.
+
+    :returns:
+        A generator of lists of ``{column: value}`` dictionaries.
+    """
+    file_format = guess_format(path, file_format)
+
+    if file_format == 'tsv':
+        with open(path, newline='') as f:
+            reader = csv.DictReader(f, delimiter='\t')
+
+            for batch in iter_batches(reader, batch_size):
+                yield [{column: convert_tsv_value(column, value)
+                        for column, value in row.items()}
+                       for row in batch]
+
+    elif file_format == 'parquet':
+        pyarrow = import_pyarrow()
+        parquet_file = pyarrow.parquet.ParquetFile(path)
+
+        for record_batch in parquet_file.iter_batches(batch_size=batch_size):
+            yield record_batch.to_pylist()
+
+    else:
+        pyarrow = import_pyarrow()
+
+        with pyarrow.memory_map(path) as source:
+            reader = pyarrow.ipc.open_file(source)
+
+            for i in range(reader.num_record_batches):
+                record_batch = reader.get_batch(i)
+
+                for offset in range(0, record_batch.num_rows, batch_size):
+                    yield record_batch.slice(offset, batch_size).to_pylist()
+
+
+def convert_tsv_value(column, value):
+    """Convert a value read from a TSV file to the type of its column."""
+    if value == '' or value is None:
+        return None
+
+    if column in INTEGER_COLUMNS:
+        return int(value)
+
+    return value
@@ -0,0 +1,121 @@
+"""This module contains the schema migrations of the local SQLite catalog.
+
+.. module:: migrations
+    :platform: Unix
+    :synopsis: Connection settings and versioned, in-place upgrades of
+    existing catalog files.
+
+.. moduleauthor:: Tyler Biggs <biggstd@gmail.com>
+"""
+
+# General Python imports.
+import logging
+
+# SQLAlchemy imports.
+from sqlalchemy import event, inspect, text
+
+# Inter-package imports.
+from pynome.assembly import Assembly
+from pynome.search import create_search_index
+
+
+def configure_sqlite(engine, busy_timeout=30000):
+    """Set the pragmas of every connection made by a SQLite engine.
+
+    The catalog is journaled with WAL, so readers such as ``pynome list``
+    are not blocked by a running ``pynome discover``. With WAL, the
+    `NORMAL` synchronous level is safe against corruption, and only syncs
+    at checkpoints.
+
+    :param engine:
+        A SQLAlchemy engine of a SQLite database.
+
+    :param [busy_timeout]:
+        The number of milliseconds a connection waits for a lock held by
+        another connection before failing.
+    """
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute(f'PRAGMA busy_timeout={int(busy_timeout)}')
+        cursor.close()
+
+
+def add_assembly_indexes(connection):
+    """Add the secondary indexes of the Assemblies table."""
+    for index in Assembly.__table__.indexes:
+        index.create(connection, checkfirst=True)
+
+
+def add_version_to_assembly_key(connection):
+    """Make the release `version` part of the Assemblies primary key.
+
+    SQLite cannot change the primary key of a table, so the table is
+    rebuilt and its rows copied. Rows without a version are given an empty
+    string.
+    """
+    table = Assembly.__table__
+    primary_key = inspect(connection).get_pk_constraint(table.name)
+
+    if 'version' in primary_key['constrained_columns']:
+        return
+
+    # The indexes keep their names when their table is renamed, so they are
+    # dropped first, to be created again along with the new table.
+    for index in table.indexes:
+        connection.execute(text(f'DROP INDEX IF EXISTS "{index.name}"'))
+
+    connection.execute(text(
+        f'ALTER TABLE "{table.name}" RENAME TO "{table.name}_old"'))
+    table.create(connection)
+
+    columns = ', '.join(f'"{column.name}"' for column in table.columns)
+    selected = ', '.join(
+        f'COALESCE("{column.name}", \'\')' if column.name == 'version'
+        else f'"{column.name}"' for column in table.columns)
+
+    connection.execute(text(
+        f'INSERT INTO "{table.name}" ({columns}) '
+        f'SELECT {selected} FROM "{table.name}_old"'))
+    connection.execute(text(f'DROP TABLE "{table.name}_old"'))
+
+
+# The migrations of the catalog schema, in the order they are applied. The
+# `user_version` of a catalog file is the number of migrations it has had.
+# New tables are created by `Base.metadata.create_all()`, so migrations are
+# only needed to change tables that already exist. Each migration must be
+# safe to run on a newly created catalog.
+MIGRATIONS = [
+    add_assembly_indexes,
+    add_version_to_assembly_key,
+    create_search_index,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def schema_version(connection):
+    """Return the `user_version` of a SQLite database."""
+    return connection.execute(text('PRAGMA user_version')).scalar()
+
+
+def migrate(engine):
+    """Apply any migrations a catalog has not had yet.
+
+    :param engine:
+        A SQLAlchemy engine of the catalog.
+
+    :returns:
+        The number of migrations applied.
+    """
+    with engine.begin() as connection:
+        version = schema_version(connection)
+
+        for number in range(version, SCHEMA_VERSION):
+            logging.info(f'Migrating the catalog to version {number + 1}.')
+            MIGRATIONS[number](connection)
+            connection.execute(text(f'PRAGMA user_version = {number + 1}'))
+
+    return max(SCHEMA_VERSION - version, 0)
@@ -0,0 +1,199 @@
+"""This module contains the state of the assembly preparation pipeline.
+
+.. module:: pipeline
+    :platform: Unix
+    :synopsis: The stages run by `AssemblyStorage.prepare()`, and a record
+    of each stage run on every assembly, so that completed stages with
+    unchanged inputs are not run again.
+
+.. moduleauthor:: Tyler Biggs <biggstd@gmail.com>
+"""
+
+# General Python imports.
+import os
+import glob
+import datetime
+import collections
+
+# SQLAlchemy imports.
+from sqlalchemy import Column, DateTime, Integer, JSON, String
+
+# Inter-package imports.
+from pynome.assembly import Base
+
+
+# A stage of the preparation pipeline. The `name` is that of the
+# AssemblyStorage method which runs it. The `inputs` are the suffixes of the
+# files it reads, and the `outputs` are glob patterns of the suffixes of the
+# files it writes. Each suffix is appended to the base path of an assembly.
+Stage = collections.namedtuple('Stage', 'name inputs outputs')
+
+# The stages of `AssemblyStorage.prepare()`, in the order they are run.
+PREPARE_STAGES = (
+    Stage('decompress', ('.fa.gz', '.gff3.gz'), ('.fa', '.gff3')),
+    Stage('hisat_index', ('.fa',), ('.*.ht2', '.*.ht2l')),
+    Stage('gtf', ('.gff3',), ('.gtf',)),
+    Stage('splice_site', ('.gtf',), ('.Splice_sites',)),
+)
+
+# The stage made unnecessary by decompressing files as they are downloaded,
+# see `pynome.downloader.FTPDownloader`.
+DECOMPRESS_STAGE = PREPARE_STAGES[0]
+
+
+class StageRun(Base):
+    """Models the last run of one pipeline stage on one assembly.
+
+    The `inputs` column holds the fingerprint of the input files at the time
+    the stage was run, see `file_fingerprint()`. The `outputs` column lists
+    the files the stage wrote.
+    """
+
+    # Declare the SQLite table name to be used.
+    __tablename__ = 'StageRuns'
+
+    base_filename = Column(String, primary_key=True)
+    stage = Column(String, primary_key=True)
+    status = Column(String)
+    exit_code = Column(Integer)
+    inputs = Column(JSON)
+    outputs = Column(JSON)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+
+    def __repr__(self):
+        """The string representation of a StageRun object.
+        """
+        return (f'StageRun({self.base_filename!r}, {self.stage!r}, '
+                f'{self.status!r})')
+
+
+def file_fingerprint(paths):
+    """Fingerprint a set of files by their size and modification time.
+
+    :param paths:
+        A list of file paths.
+
+    :returns:
+        A dictionary of ``{file name: [size, mtime in nanoseconds]}``, or
+        `None` if any of the files does not exist.
+    """
+    fingerprint = dict()
+
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        fingerprint[os.path.basename(path)] = [stat.st_size, stat.st_mtime_ns]
+
+    return fingerprint
+
+
+def stage_outputs(stage, base_path):
+    """Return the output files of a stage that exist.
+
+    :param stage:
+        A Stage tuple.
+
+    :param base_path:
+        The base path of an assembly, to which the output suffixes are
+        appended.
+    """
+    outputs = list()
+
+    for pattern in stage.outputs:
+        outputs.extend(sorted(glob.glob(glob.escape(base_path) + pattern)))
+
+    return outputs
+
+
+class PipelineState:
+    """Reads and records the StageRuns of a catalog.
+
+    Every StageRun is read once, when the instance is created, so checking
+    whether a stage needs to run does not query the database.
+    """
+
+    def __init__(self, catalog):
+        """Initialization of the PipelineState class.
+
+        :param catalog:
+            The `pynome.catalog.Catalog` of an AssemblyStorage instance.
+        """
+        self.catalog = catalog
+
+        # Define private attributes of the class.
+        query = catalog.session.query(
+            StageRun.base_filename, StageRun.stage, StageRun.status,
+            StageRun.inputs, StageRun.outputs)
+
+        self._runs = {
+            (base_filename, stage): (status, inputs, outputs)
+            for base_filename, stage, status, inputs, outputs in query}
+
+    def is_current(self, base_filename, stage, inputs):
+        """Check whether a stage can be skipped.
+
+        :param base_filename:
+            The base filename of an assembly.
+
+        :param stage:
+            The name of the stage.
+
+        :param inputs:
+            The current fingerprint of the stage input files.
+
+        :returns:
+            `True` if the last run of the stage succeeded with the same
+            inputs, and all of the files it wrote still exist. A stage done
+            without inputs, such as decompressing files whose compressed
+            copy was not kept, is current while its inputs remain missing.
+        """
+        run = self._runs.get((base_filename, stage))
+
+        if run is None:
+            return False
+
+        status, run_inputs, outputs = run
+
+        return (status == 'done' and run_inputs == inputs and bool(outputs)
+                and all(os.path.exists(path) for path in outputs))
+
+    def record(self, base_filename, stage, status, exit_code, inputs,
+               outputs, started_at):
+        """Save the result of running a stage.
+
+        :param base_filename:
+            The base filename of an assembly.
+
+        :param stage:
+            The name of the stage.
+
+        :param status:
+            Either 'done' or 'failed'.
+
+        :param exit_code:
+            The exit code of the stage command, or `None` if it was not
+            run.
+
+        :param inputs:
+            The fingerprint of the input files the stage was run with.
+
+        :param outputs:
+            A list of the files written by the stage.
+
+        :param started_at:
+            The time the stage was started.
+        """
+        self._runs[(base_filename, stage)] = (status, inputs, outputs)
+
+        self.catalog.write(lambda session: session.merge(StageRun(
+            base_filename=base_filename,
+            stage=stage,
+            status=status,
+            exit_code=exit_code,
+            inputs=inputs,
+            outputs=outputs,
+            started_at=started_at,
+            finished_at=datetime.datetime.now())))
@@ -0,0 +1,174 @@
+"""This module contains the full-text search of the local catalog.
+
+.. module:: search
+    :platform: Unix
+    :synopsis: An SQLite FTS5 index of the names of every assembly, kept in
+    sync with the Assemblies table by triggers, and a ranked search with
+    prefix and typo-tolerant matching.
+
+.. moduleauthor:: Tyler Biggs <biggstd@gmail.com>
+"""
+
+# General Python imports.
+import re
+import difflib
+import collections
+
+# SQLAlchemy imports.
+from sqlalchemy import text
+
+# Inter-package imports.
+from pynome.assembly import Assembly
+
+
+# The name of the FTS5 table, and of the fts5vocab table listing its terms.
+SEARCH_TABLE = 'AssemblySearch'
+TERMS_TABLE = 'AssemblySearchTerms'
+
+# The columns of the Assemblies table which are indexed.
+SEARCH_COLUMNS = ('genus', 'species', 'intraspecific_name', 'assembly_id',
+                  'taxonomy_name')
+
+# A result of `search_assemblies()`. Lower ranks are better matches.
+SearchResult = collections.namedtuple(
+    'SearchResult',
+    'base_filename version source_database taxonomy_name assembly_id rank')
+
+# The words of a query. The index tokenizer also splits on underscores.
+WORD_RE = re.compile(r'[^\W_]+')
+
+
+def create_search_index(connection):
+    """Create the FTS5 index of the Assemblies table, along with the
+    triggers that keep it in sync, and fill it with the existing rows.
+
+    The index is an external content table, so it stores only the index and
+    reads the indexed values from the Assemblies table by rowid.
+    """
+    table = Assembly.__table__.name
+    columns = ', '.join(SEARCH_COLUMNS)
+    new_values = ', '.join(f'new.{column}' for column in SEARCH_COLUMNS)
+    old_values = ', '.join(f'old.{column}' for column in SEARCH_COLUMNS)
+
+    statements = [
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS "{SEARCH_TABLE}" USING fts5('
+        f'{columns}, content=\'{table}\', content_rowid=\'rowid\', '
+        f'prefix=\'2 3 4\', tokenize=\'unicode61 remove_diacritics 2\')',
+
+        f'CREATE VIRTUAL TABLE IF NOT EXISTS "{TERMS_TABLE}" '
+        f'USING fts5vocab("{SEARCH_TABLE}", \'row\')',
+
+        f'CREATE TRIGGER IF NOT EXISTS "{SEARCH_TABLE}_insert" '
+        f'AFTER INSERT ON "{table}" BEGIN '
+        f'INSERT INTO "{SEARCH_TABLE}" (rowid, {columns}) '
+        f'VALUES (new.rowid, {new_values}); END',
+
+        f'CREATE TRIGGER IF NOT EXISTS "{SEARCH_TABLE}_delete" '
+        f'AFTER DELETE ON "{table}" BEGIN '
+        f'INSERT INTO "{SEARCH_TABLE}" ("{SEARCH_TABLE}", rowid, {columns}) '
+        f'VALUES (\'delete\', old.rowid, {old_values}); END',
+
+        f'CREATE TRIGGER IF NOT EXISTS "{SEARCH_TABLE}_update" '
+        f'AFTER UPDATE OF {columns} ON "{table}" BEGIN '
+        f'INSERT INTO "{SEARCH_TABLE}" ("{SEARCH_TABLE}", rowid, {columns}) '
+        f'VALUES (\'delete\', old.rowid, {old_values}); '
+        f'INSERT INTO "{SEARCH_TABLE}" (rowid, {columns}) '
+        f'VALUES (new.rowid, {new_values}); END',
+    ]
+
+    for statement in statements:
+        connection.execute(text(statement))
+
+    rebuild_search_index(connection)
+
+
+def rebuild_search_index(connection):
+    """Rebuild the FTS5 index from the current rows of the Assemblies
+    table."""
+    connection.execute(text(
+        f'INSERT INTO "{SEARCH_TABLE}" ("{SEARCH_TABLE}") VALUES (\'rebuild\')'))
+
+
+def next_string(prefix):
+    """Return the smallest string greater than every string starting with
+    `prefix`."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def quote_term(term):
+    """Quote a term for use within an FTS5 query."""
+    return '"' + term.replace('"', '""') + '"'
+
+
+def match_terms(session, word, max_matches=3, cutoff=0.75):
+    """Build the FTS5 query of a single word.
+
+    A word that is the prefix of an indexed term is matched as a prefix.
+    Otherwise, it is assumed to be misspelled, and is matched to the most
+    similar indexed terms sharing its first letter.
+
+    :returns:
+        An FTS5 query string, or `None` if no term is similar enough.
+    """
+    terms = f'"{TERMS_TABLE}"'
+
+    has_prefix = session.execute(text(
+        f'SELECT 1 FROM {terms} WHERE term >= :low AND term < :high LIMIT 1'),
+        {'low': word, 'high': next_string(word)}).first()
+
+    if has_prefix is not None:
+        return quote_term(word) + '*'
+
+    candidates = [term for term, in session.execute(text(
+        f'SELECT term FROM {terms} WHERE term >= :low AND term < :high'),
+        {'low': word[0], 'high': next_string(word[0])})]
+
+    matches = difflib.get_close_matches(
+        word, candidates, n=max_matches, cutoff=cutoff)
+
+    if not matches:
+        return None
+
+    return '(' + ' OR '.join(quote_term(match) for match in matches) + ')'
+
+
+def search_assemblies(session, query, limit=20):
+    """Search the names of the catalogued assemblies.
+
+    Every word of the query must match a word of the genus, species,
+    intraspecific name, assembly id or taxonomy name of an assembly.
+    Results are ranked by the FTS5 bm25 function.
+
+    :param session:
+        A catalog session.
+
+    :param query:
+        The words to search for, such as 'candida glab'.
+
+    :param [limit]:
+        The maximum number of results.
+
+    :returns:
+        A list of SearchResult tuples, best matches first.
+    """
+    words = WORD_RE.findall(query.lower())
+
+    if not words:
+        return list()
+
+    match_queries = [match_terms(session, word) for word in words]
+
+    if None in match_queries:
+        return list()
+
+    table = Assembly.__table__.name
+    rows = session.execute(text(
+        f'SELECT a.base_filename, a.version, a.source_database, '
+        f'a.taxonomy_name, a.assembly_id, bm25("{SEARCH_TABLE}") AS rank '
+        f'FROM "{SEARCH_TABLE}" JOIN "{table}" AS a '
+        f'ON a.rowid = "{SEARCH_TABLE}".rowid '
+        f'WHERE "{SEARCH_TABLE}" MATCH :match '
+        f'ORDER BY rank LIMIT :limit'),
+        {'match': ' AND '.join(match_queries), 'limit': limit})
+
+    return [SearchResult(*row) for row in rows]
@@ -12,8 +12,12 @@
 import os
 import json
 import logging
+import itertools
 from sqlalchemy import create_engine
 
+# Inter-package imports.
+from pynome.crawler import list_ftp_dir
+
 
 def read_json_config(config_file='pynome_config.json'):
     """Reads a json config file for required variables.
@@ -27,61 +31,92 @@ def read_json_config(config_file='pynome_config.json'):
     return config_dict
 
 
-def crawl_ftp_dir(ftp, top_dir, parsing_function, ignored_dirs):
-    """Recursively crawl a target directory. Takes as an input a
-    target directory and a parsing function. The ftplib.FTP.dir()
-    function is used to retrieve a directory listing, line by line,
-    in string format. These are appended to a newly generated list.
-    Each item in this list is subject to the parsing function.
+def iter_batches(iterable, batch_size):
+    """Split an iterable into lists of at most `batch_size` items.
+
+    Items are only drawn from the iterable as each batch is built, so this
+    can be used on a stream without exhausting it first.
+    """
+    iterator = iter(iterable)
+
+    while True:
+        batch = list(itertools.islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
 
-    :param database:
+def iter_ftp_dir(ftp, top_dir, ignored_dirs):
+    """Iteratively crawl a target directory, and yield every file found.
+
+    Directories are walked depth-first with an explicit stack rather than
+    by recursion, so the depth of a tree is not limited by Python's
+    recursion limit. The listing of each directory is retrieved as a list
+    of typed FTPEntry tuples, using MLSD where the server supports it.
+
+    :param ftp:
         An instance of ftplib.FTP()
 
     :param top_dir:
         The directory from which contents will be retrieved.
 
-    :param parsing_function:
-        The function to parse each non-directory result.
+    :param ignored_dirs:
+        Names of directories that should never be entered.
 
+    :returns:
+        A generator of ``(directory, entry)`` tuples, one for each
+        non-directory entry.
     """
     logging.debug(f'Top dir: {top_dir}')
 
-    # Create an empty list to hold the callback
-    retrieved_dir_list = []
+    # The stack holds each directory being examined, and an iterator over
+    # the entries of its listing that have not yet been examined.
+    stack = [(top_dir, iter(list_ftp_dir(ftp, top_dir)))]
+
+    while stack:
+        directory, entries = stack[-1]
 
-    # The last argument passed to ftplib.dir acts as a callback if it
-    # is a function. In this case the given function is a call to
-    # append() the retrieved directory list.
-    ftp.dir(top_dir, retrieved_dir_list.append)
+        for entry in entries:
 
-    # For each line / directory listing retrieved.
-    for line in retrieved_dir_list:
+            # Check if this entry is a directory.
+            if entry.type == 'dir':
 
-        # Split the line by whitespace.
-        split_line = line.split()
+                # If so, ensure it is not one of the dirs to be ignored.
+                if entry.name in ignored_dirs:
+                    continue
 
-        # Check if this entry is a directory.
-        if split_line[0][0] == 'd':
+                # Otherwise this is a valid directory to crawl, examine it
+                # before the rest of the current listing.
+                target_dir = ''.join((directory, entry.name, '/'))
+                logging.debug(f'Top dir: {target_dir}')
+                stack.append(
+                    (target_dir, iter(list_ftp_dir(ftp, target_dir))))
+                break
 
-            # If so, ensure it is not one of the dirs to be ignored.
-            if split_line[-1] in ignored_dirs:
+            # Otherwise the entry is not a directory, and must be parsed.
+            yield directory, entry
 
-                # If this is the case, simply ignore this entry and
-                # continue on this loop listing.
-                continue
+        # Every entry of this directory has been examined.
+        else:
+            stack.pop()
 
-            # Otherwise this is a valid directory to start a new crawl in.
-            else:
 
-                # Construct the new top directory to start a crawl.
-                target_dir = ''.join((top_dir, line.split()[-1], '/'))
-                # Start a new crawl at this directory.
-                crawl_ftp_dir(ftp, target_dir, parsing_function, ignored_dirs)
+def crawl_ftp_dir(ftp, top_dir, parsing_function, ignored_dirs):
+    """Crawl a target directory. Takes as an input a target directory and a
+    parsing function. Each non-directory entry found by `iter_ftp_dir` is
+    subject to the parsing function.
 
-        # Check to make sure the filename is not on the 'bad list'
-        # elif any(bw in split_line[-1] for bw in bad_words):
-        #     continue
+    :param ftp:
+        An instance of ftplib.FTP()
 
-        # Otherwise the line is not a directory, and must be parsed.
-        else:
-            parsing_function(line, top_dir)
+    :param top_dir:
+        The directory from which contents will be retrieved.
+
+    :param parsing_function:
+        The function to parse each non-directory result.
+
+    :param ignored_dirs:
+        Names of directories that should never be entered.
+    """
+    for directory, entry in iter_ftp_dir(ftp, top_dir, ignored_dirs):
+        parsing_function(entry, directory)
@@ -18,11 +18,15 @@ setup(
     packages=find_packages(),
     install_requires=[
         'Click',
-        'SQLAlchemy'
+        'SQLAlchemy>=1.4',
         'tqdm',
         'pandas',
         'xmltodict',
     ],
+    extras_require={
+        # Required by `pynome export` for the parquet and arrow formats.
+        'export': ['pyarrow'],
+    },
     entry_points={
         # Console scripts are those that can be run directly from the terminal.
         # String entries here will be the cli invocation for their corresponding
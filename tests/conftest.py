@@ -10,6 +10,9 @@ options for scope include 'module', 'session', and 'function'.
 
 # General Python imports.
 import os
+import copy
+import ftplib
+import datetime
 
 # Import testing package of choice.
 import pytest
@@ -47,7 +50,237 @@ def test_ed(test_config):
         release_version=test_config['ensembl_config']['release_version'],
         bad_filenames=test_config['ensembl_config']['bad_filenames'],
         # Optional values.
-        crawl_urls=test_config['ensembl_config'].get('crawl_urls')
+        crawl_urls=test_config['ensembl_config'].get('crawl_urls'),
+        crawl_workers=test_config['ensembl_config'].get('crawl_workers', 1),
+        discovery_mode=test_config['ensembl_config'].get(
+            'discovery_mode', 'walk'),
+        crawl_filters=test_config['ensembl_config'].get('crawl_filters'),
     )
 
     return ed
+
+
+# A small Ensembl-like directory tree served by FakeFTP. Keys are
+# directories, values are the lines that ``ftp.dir()`` would return.
+FAKE_TREE = {
+    'pub/fungi/release-38/fasta/': [
+        'drwxr-sr-x  2 ftp ftp 4096 Jan 13  2018 fungi_ascomycota1_collection',
+        'drwxr-sr-x  2 ftp ftp 4096 Jan 13  2018 saccharomyces_cerevisiae',
+        '-rw-r--r--  1 ftp ftp  120 Jan 13  2018 README',
+    ],
+    'pub/fungi/release-38/fasta/fungi_ascomycota1_collection/': [
+        'drwxr-sr-x  2 ftp ftp 4096 Jan 13  2018 _candida_glabrata',
+        'drwxr-sr-x  2 ftp ftp 4096 Jan 13  2018 acremonium_chrysogenum_atcc_11550',
+    ],
+    'pub/fungi/release-38/fasta/fungi_ascomycota1_collection/_candida_glabrata/': [
+        'drwxr-sr-x  2 ftp ftp 4096 Jan 13  2018 cdna',
+        'drwxr-sr-x  2 ftp ftp 4096 Jan 13  2018 dna',
+    ],
+    'pub/fungi/release-38/fasta/fungi_ascomycota1_collection/_candida_glabrata/dna/': [
+        '-rw-r--r--  1 ftp ftp   95 Jan 13  2018 CHECKSUMS',
+        '-rw-r--r--  1 ftp ftp 3650 Jan 13  2018 _candida_glabrata.ASM254v2.dna.toplevel.fa.gz',
+        '-rw-r--r--  1 ftp ftp 1250 Jan 13  2018 _candida_glabrata.ASM254v2.dna.chromosome.A.fa.gz',
+    ],
+    'pub/fungi/release-38/fasta/fungi_ascomycota1_collection/acremonium_chrysogenum_atcc_11550/': [
+        'drwxr-sr-x  2 ftp ftp 4096 Jan 13  2018 dna',
+    ],
+    'pub/fungi/release-38/fasta/fungi_ascomycota1_collection/acremonium_chrysogenum_atcc_11550/dna/': [
+        '-rw-r--r--  1 ftp ftp 8123 Jan 13  2018 Acremonium_chrysogenum_atcc_11550.ASM76942v1.dna.toplevel.fa.gz',
+    ],
+    'pub/fungi/release-38/fasta/saccharomyces_cerevisiae/': [
+        'drwxr-sr-x  2 ftp ftp 4096 Jan 13  2018 dna',
+    ],
+    'pub/fungi/release-38/fasta/saccharomyces_cerevisiae/dna/': [
+        '-rw-r--r--  1 ftp ftp 3800 Jan 13  2018 Saccharomyces_cerevisiae.R64-1-1.dna.toplevel.fa.gz',
+    ],
+    'pub/fungi/release-38/gff3/': [
+        'drwxr-sr-x  2 ftp ftp 4096 Jan 13  2018 fungi_ascomycota1_collection',
+        'drwxr-sr-x  2 ftp ftp 4096 Jan 13  2018 saccharomyces_cerevisiae',
+    ],
+    'pub/fungi/release-38/gff3/fungi_ascomycota1_collection/': [
+        'drwxr-sr-x  2 ftp ftp 4096 Jan 13  2018 _candida_glabrata',
+    ],
+    'pub/fungi/release-38/gff3/fungi_ascomycota1_collection/_candida_glabrata/': [
+        '-rw-r--r--  1 ftp ftp   95 Jan 13  2018 CHECKSUMS',
+        '-rw-r--r--  1 ftp ftp 1500 Jan 13  2018 _candida_glabrata.ASM254v2.38.gff3.gz',
+        '-rw-r--r--  1 ftp ftp 1400 Jan 13  2018 _candida_glabrata.ASM254v2.38.abinitio.gff3.gz',
+    ],
+    'pub/fungi/release-38/gff3/saccharomyces_cerevisiae/': [
+        '-rw-r--r--  1 ftp ftp 2100 Jan 13  2018 Saccharomyces_cerevisiae.R64-1-1.38.gff3.gz',
+    ],
+}
+
+
+class FakeFTP:
+    """A stand-in for ``ftplib.FTP`` that serves `FAKE_TREE`, with support
+    for both MLSD and LIST."""
+
+    host = 'ftp.fake'
+
+    # The tree served by default, and a list shared by every instance of
+    # a class recording the directories listed (see `fake_ftp`).
+    default_tree = FAKE_TREE
+    shared_log = None
+
+    def __init__(self, tree=None):
+        self.tree = self.default_tree if tree is None else tree
+        self.listed = list()
+
+    def _log(self, path):
+        self.listed.append(path)
+        if self.shared_log is not None:
+            self.shared_log.append(path)
+
+    def connect(self, host):
+        pass
+
+    def login(self):
+        pass
+
+    def quit(self):
+        pass
+
+    def close(self):
+        pass
+
+    def _lines(self, path):
+        self._log(path)
+        if path not in self.tree:
+            raise ftplib.error_perm('550 Failed to change directory.')
+        return self.tree[path]
+
+    def dir(self, path, callback):
+        for line in self._lines(path):
+            callback(line)
+
+    def mlsd(self, path, facts=()):
+        lines = self._lines(path)
+        return self._mlsd(lines)
+
+    def _mlsd(self, lines):
+        yield '.', {'type': 'cdir'}
+        for line in lines:
+            split_line = line.split()
+            modify = datetime.datetime.strptime(
+                ' '.join(split_line[5:8]), '%b %d %Y')
+            yield split_line[-1], {
+                'type': 'dir' if split_line[0][0] == 'd' else 'file',
+                'size': split_line[4],
+                'modify': modify.strftime('%Y%m%d%H%M%S')}
+
+
+class ListOnlyFTP(FakeFTP):
+    """A FakeFTP for a server that does not understand MLSD."""
+
+    host = 'ftp.listonly'
+
+    def mlsd(self, path, facts=()):
+        raise ftplib.error_perm('500 Unknown command.')
+
+
+@pytest.fixture
+def fake_ftp(monkeypatch):
+    """Patch the FTP connections made by Pynome to use a FakeFTP class,
+    whose `shared_log` records every directory listed by any connection."""
+
+    class SharedFakeFTP(FakeFTP):
+        default_tree = copy.deepcopy(FAKE_TREE)
+        shared_log = list()
+
+    monkeypatch.setattr(ftplib, 'FTP', SharedFakeFTP)
+    return SharedFakeFTP
+
+
+class DownloadFTP:
+    """A stand-in for ``ftplib.FTP`` that serves files for download.
+
+    Every file is served as its own path, except those listed in
+    `missing`, and the connection of the first download of each file
+    listed in `flaky` is dropped. Files listed in `corrupt` are served with
+    their last byte changed, that many times. CHECKSUMS files are served
+    from `checksums`, and files with other contents from `files`. Every
+    connection is recorded in `connections`, and every download in
+    `requests`.
+
+    The state is shared by every connection, so each test uses a class of
+    its own, see `download_ftp`.
+    """
+
+    host = 'ftp.fake'
+
+    missing = frozenset()
+    flaky = frozenset()
+    connections = ()
+    requests = ()
+    corrupt = dict()
+    checksums = dict()
+    files = dict()
+
+    def __init__(self):
+        self.closed = False
+        self.connections.append(self)
+
+    def connect(self, host):
+        pass
+
+    def login(self):
+        pass
+
+    def quit(self):
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+    def retrbinary(self, cmd, callback, blocksize=8192, rest=None):
+        path = cmd.split(' ', 1)[1]
+        self.requests.append((path, rest))
+
+        if path in self.missing:
+            raise ftplib.error_perm('550 Failed to open file.')
+
+        data = self.files.get(path, path.encode())[rest or 0:]
+
+        if self.corrupt.get(path):
+            self.corrupt[path] -= 1
+            data = data[:-1] + b'!'
+
+        if path in self.flaky:
+            self.flaky.discard(path)
+            callback(data[:4])
+            raise EOFError('connection dropped')
+
+        callback(data)
+
+    def retrlines(self, cmd, callback):
+        path = cmd.split(' ', 1)[1]
+
+        if path not in self.checksums:
+            raise ftplib.error_perm('550 Failed to open file.')
+
+        for line in self.checksums[path]:
+            callback(line)
+
+
+@pytest.fixture
+def download_ftp(monkeypatch):
+    """Patch the FTP connections made by Pynome to use a DownloadFTP class,
+    whose state is new for each test."""
+
+    class SharedDownloadFTP(DownloadFTP):
+        missing = set()
+        flaky = set()
+        connections = list()
+        requests = list()
+        corrupt = dict()
+        checksums = dict()
+        files = dict()
+
+    monkeypatch.setattr(ftplib, 'FTP', SharedDownloadFTP)
+    return SharedDownloadFTP
+
+
+@pytest.fixture
+def fake_top_dirs():
+    """The directories to start a crawl of the FakeFTP tree from."""
+    return ['pub/fungi/release-38/gff3/', 'pub/fungi/release-38/fasta/']
@@ -3,6 +3,7 @@
 """
 
 from pynome.assembly import Assembly
+from pynome.assembly import AssemblyRecord
 
 
 def test_assembly():
@@ -34,3 +35,25 @@ def test_assembly():
         intraspecific_name='intra_Name',
         version='release-38',
     )
+
+
+def test_assembly_record():
+    """Tests for the AssemblyRecord class."""
+
+    record = AssemblyRecord(
+        species='testerius',
+        genus='genius',
+        assembly_id='gtID',
+        intraspecific_name='intra_Name',
+        fasta_remote_path='pub/genius_testerius.gtID.dna.toplevel.fa.gz',
+    )
+
+    assert record.base_filename == 'genius_testerius_intra_Name-gtID'
+    assert record.gff3_remote_path is None
+    assert not hasattr(record, '__dict__')
+
+    # The Assembly built from a record has the same column values.
+    assembly = record.to_assembly()
+    assert isinstance(assembly, Assembly)
+    for column, value in record.as_dict().items():
+        assert getattr(assembly, column) == value
@@ -2,9 +2,15 @@
 
 """
 # import logging
+import os
+import gzip
 
 from pynome.assemblystorage import AssemblyStorage
 from pynome.assembly import Assembly
+from pynome.assembly import AssemblyRecord
+from pynome.assemblydatabase import AssemblyDatabase
+from pynome.ensembldatabase import EnsemblDatabase
+from pynome.pipeline import StageRun
 from pynome.sra import download_sra_json
 
 
@@ -73,3 +79,265 @@ def test_AssemblyStorage(test_config, test_ed):
 
     for a in found_genomes:
         test_assembly_storage.prepare(a)
+
+
+def test_stream_crawl(test_config, fake_ftp, fake_top_dirs, tmp_path):
+    """Assemblies found by a crawl are saved in batches as they arrive."""
+    storage = AssemblyStorage(sqlite_path=str(tmp_path), batch_size=2)
+    ed = EnsemblDatabase(**test_config['ensembl_config'])
+    storage.add_source(ed)
+
+    # Record the number of rows committed each time an assembly is yielded,
+    # as seen from a second connection to the catalog.
+    reader = AssemblyStorage(sqlite_path=str(tmp_path))
+    saved_counts = list()
+
+    def counting_crawl(*args, **kwargs):
+        for assembly in EnsemblDatabase.iter_crawl(ed, *args, **kwargs):
+            saved_counts.append(len(reader.query_local_assemblies()))
+            reader.session.commit()
+            yield assembly
+
+    ed.iter_crawl = counting_crawl
+
+    # The fasta and gff3 files of each genome are saved as one assembly.
+    assert storage.stream_crawl('ensembl', fake_top_dirs) == 3
+    assert saved_counts == [0, 0, 2]
+    assert len(storage.query_local_assemblies()) == 3
+    assert ed.assemblies == []
+    assert ed.incomplete_assemblies == [
+        ('Acremonium_chrysogenum_atcc_11550-ASM76942v1', ['gff3'])]
+
+
+class BrokenDatabase(AssemblyDatabase):
+    """A source whose crawl always fails."""
+
+    database_name = 'broken'
+
+    def crawl(self):
+        raise ConnectionError('server unavailable')
+
+
+def test_crawl_all(test_config, fake_ftp, fake_top_dirs):
+    """Every source is crawled, and one failing does not stop the others."""
+    storage = AssemblyStorage()
+    storage.add_source(BrokenDatabase('broken', 'ftp.example.org', ''))
+    storage.add_source(EnsemblDatabase(**test_config['ensembl_config']))
+
+    results = storage.crawl_all(urls={'ensembl': fake_top_dirs}, workers=2)
+
+    assert [r.source for r in results] == ['broken', 'ensembl']
+    assert isinstance(results[0].error, ConnectionError)
+    assert results[1].error is None
+    assert results[1].assemblies == 3
+    assert len(storage.query_local_assemblies()) == 3
+
+
+def test_sqlite_urls(tmp_path, monkeypatch):
+    """SQLite urls and `:memory:` are used as given, rather than as the
+    directory of a database file."""
+    monkeypatch.chdir(tmp_path)
+
+    for sqlite_path in ('sqlite:///:memory:', ':memory:'):
+        storage = AssemblyStorage(sqlite_path=sqlite_path)
+        assert storage.count_assemblies() == 0
+
+    storage = AssemblyStorage(sqlite_path='sqlite:///genomes.db')
+    storage.close()
+
+    assert sorted(os.listdir(tmp_path)) == ['genomes.db']
+
+
+def test_upsert_assemblies():
+    """Rows of one assembly with different files are combined, and existing
+    values are not replaced by nulls."""
+    storage = AssemblyStorage(batch_size=2)
+    names = dict(species='glabrata', genus='Candida', assembly_id='ASM254v2')
+
+    storage.save_assembly(Assembly(taxonomy_id='5478', **names))
+
+    written = storage.upsert_assemblies([
+        AssemblyRecord(fasta_remote_path='fasta.fa.gz', **names),
+        AssemblyRecord(gff3_remote_path='genes.gff3.gz', **names),
+        AssemblyRecord(species='albicans', genus='Candida',
+                       assembly_id='GCA_000182965v3'),
+    ])
+
+    assert written == 3
+    assembly, = storage.query_local_assemblies_by('species', 'glabrata')
+    assert assembly.fasta_remote_path == 'fasta.fa.gz'
+    assert assembly.gff3_remote_path == 'genes.gff3.gz'
+    assert assembly.taxonomy_id == '5478'
+    assert len(storage.query_local_assemblies()) == 2
+
+
+def test_save_assembly_without_version():
+    """Saving an assembly without a version again updates its row."""
+    storage = AssemblyStorage()
+    names = dict(species='glabrata', genus='Candida', assembly_id='ASM254v2')
+
+    storage.save_assembly(Assembly(taxonomy_id='5478', **names))
+    storage.save_assembly(Assembly(taxonomy_id='5479', **names))
+    storage.save_assembly(AssemblyRecord(fasta_remote_path='fasta.fa.gz',
+                                         **names))
+
+    assembly, = storage.query_local_assemblies()
+    assert assembly.version == ''
+    assert assembly.taxonomy_id == '5479'
+    assert assembly.fasta_remote_path == 'fasta.fa.gz'
+
+
+def test_bulk_update_assemblies():
+    """Updates are applied together, and the changed rows are counted."""
+    storage = AssemblyStorage()
+    storage.upsert_assemblies([
+        AssemblyRecord(species='glabrata', genus='Candida',
+                       assembly_id='ASM254v2'),
+        AssemblyRecord(species='albicans', genus='Candida',
+                       assembly_id='GCA_000182965v3'),
+    ])
+
+    updated = storage.bulk_update_assemblies([
+        ('Candida_glabrata-ASM254v2', {'taxonomy_id': '5478'}),
+        ('Candida_albicans-GCA_000182965v3',
+         {'taxonomy_id': '5476', 'version': 'release-38'}),
+        ('Candida_missing-ASM1v1', {'taxonomy_id': '1'}),
+    ])
+
+    assert updated == 2
+    assert {a.taxonomy_id for a in storage.query_local_assemblies()} == {
+        '5478', '5476'}
+
+
+def test_iter_assemblies():
+    """Catalog queries can be filtered, projected, made distinct and
+    sorted."""
+    storage = AssemblyStorage(batch_size=2)
+    storage.upsert_assemblies([
+        AssemblyRecord(species='glabrata', genus='Candida',
+                       assembly_id='ASM254v2', taxonomy_id='5478'),
+        AssemblyRecord(species='albicans', genus='Candida',
+                       assembly_id='GCA_000182965v3', taxonomy_id='5476'),
+        AssemblyRecord(species='albicans', genus='Candida',
+                       assembly_id='ASM18296v3', taxonomy_id='5476'),
+        AssemblyRecord(species='cerevisiae', genus='Saccharomyces',
+                       assembly_id='R64-1-1'),
+    ])
+
+    rows = list(storage.iter_assemblies(
+        fields=['taxonomy_id'], filters={'genus': 'Candida'},
+        distinct=True, order_by='-taxonomy_id'))
+    assert [row.taxonomy_id for row in rows] == ['5478', '5476']
+
+    names = [a.base_filename for a in storage.iter_assemblies(
+        filters={'species': ['albicans', 'cerevisiae'], 'taxonomy_id': None})]
+    assert names == ['Saccharomyces_cerevisiae-R64-1-1']
+
+    assert storage.count_assemblies({'species': 'albicans'}) == 2
+
+
+def test_download_stores_blobs(test_config, tmp_path, download_ftp):
+    """Downloaded files are hashed as they arrive and stored once."""
+    storage = AssemblyStorage(base_path=str(tmp_path))
+    ed = EnsemblDatabase(**test_config['ensembl_config'])
+    storage.add_source(ed)
+
+    names = dict(genus='Candida', species='glabrata',
+                 source_database='ensembl', version=ed.release_version,
+                 fasta_remote_path='pub/fasta.fa.gz',
+                 gff3_remote_path='pub/genes.gff3.gz')
+    storage.upsert_assemblies([
+        AssemblyRecord(assembly_id='ASM254v1', **names),
+        AssemblyRecord(assembly_id='ASM254v2', **names)])
+
+    results = storage.download_all()
+
+    assert len(results) == 4
+    assert all(result.error is None for result in results)
+
+    fasta_files = sorted(tmp_path.glob('Genome/*/*/*.fa.gz'))
+    assert len(fasta_files) == 2
+    assert fasta_files[0].read_bytes() == b'pub/fasta.fa.gz'
+    assert fasta_files[0].stat().st_ino == fasta_files[1].stat().st_ino
+    assert len(list(tmp_path.glob('Blobs/objects/*/*'))) == 2
+    assert not list(tmp_path.glob('Genome/*/*/*.part'))
+
+
+def test_stream_decompress(test_config, tmp_path, download_ftp,
+                           monkeypatch):
+    """Files decompressed as they are downloaded are not decompressed again
+    by prepare()."""
+    storage = AssemblyStorage(base_path=str(tmp_path))
+    ed = EnsemblDatabase(**dict(test_config['ensembl_config'],
+                                stream_decompress=True,
+                                keep_compressed=False))
+    storage.add_source(ed)
+    storage.upsert_assemblies([AssemblyRecord(
+        genus='Candida', species='glabrata', assembly_id='ASM254v2',
+        source_database='ensembl', version=ed.release_version,
+        fasta_remote_path='pub/genome.fa.gz',
+        gff3_remote_path='pub/genes.gff3.gz')])
+
+    for path in ('pub/genome.fa.gz', 'pub/genes.gff3.gz'):
+        download_ftp.files[path] = gzip.compress(path.encode(), mtime=0)
+
+    storage.download_all()
+
+    assembly, = storage.query_local_assemblies()
+    assert open(storage.assembly_path(assembly, '.fa'), 'rb').read() == (
+        b'pub/genome.fa.gz')
+    assert not list(tmp_path.glob('Genome/*/*/*.gz'))
+
+    def decompress(assembly):
+        raise AssertionError('decompressed again')
+
+    monkeypatch.setattr(storage, 'decompress', decompress)
+    storage.prepare(assembly)
+
+    run = storage.session.get(StageRun, (assembly.base_filename, 'decompress'))
+    assert (run.status, run.exit_code) == ('done', None)
+
+
+def test_diff_releases(test_config):
+    """Releases are catalogued side by side, and can be compared."""
+    storage = AssemblyStorage()
+    ed = EnsemblDatabase(**dict(test_config['ensembl_config'],
+                                release_version='release-39'))
+    storage.add_source(ed)
+
+    def record(species, version, size=100):
+        # Ensembl puts the release number in the name of gff3 files.
+        number = version.rpartition('-')[2]
+        return AssemblyRecord(
+            species=species, genus='Candida', assembly_id='ASM1v1',
+            version=version, source_database='ensembl',
+            fasta_remote_path=(
+                f'pub/fungi/{version}/fasta/candida_{species}/dna/'
+                f'Candida_{species}.ASM1v1.dna.toplevel.fa.gz'),
+            fasta_remote_size=size,
+            gff3_remote_path=(
+                f'pub/fungi/{version}/gff3/candida_{species}/'
+                f'Candida_{species}.ASM1v1.{number}.gff3.gz'),
+            gff3_remote_size=50)
+
+    storage.upsert_assemblies([
+        record('glabrata', 'release-38'), record('glabrata', 'release-39'),
+        record('albicans', 'release-38'),
+        record('auris', 'release-38'), record('auris', 'release-39', 200),
+        record('dubliniensis', 'release-39'),
+    ])
+
+    # Both releases of an assembly are kept.
+    assert storage.count_assemblies({'species': 'glabrata'}) == 2
+
+    assert storage.diff_releases('ensembl', 'release-38', 'release-39') == (
+        ['Candida_dubliniensis-ASM1v1'],
+        ['Candida_albicans-ASM1v1'],
+        ['Candida_auris-ASM1v1'])
+
+    # Only the delta of the current release is selected.
+    names = [row.base_filename for row in storage.iter_assemblies(
+        fields=['base_filename'],
+        filters=storage.release_filters('ensembl', since='release-38'),
+        order_by='base_filename')]
+    assert names == ['Candida_auris-ASM1v1', 'Candida_dubliniensis-ASM1v1']
@@ -0,0 +1,60 @@
+"""Tests for the catalog.py module of Pynome.
+
+"""
+
+import os
+import concurrent.futures
+
+import pytest
+
+from pynome.assembly import AssemblyRecord
+from pynome.assemblystorage import AssemblyStorage
+
+
+def make_records(count):
+    """Build `count` assemblies of one genus."""
+    return [AssemblyRecord(species=f'species{i}', genus='Candida',
+                           assembly_id=f'ASM{i}v1') for i in range(count)]
+
+
+def test_parallel_reads_and_writes(tmp_path):
+    """Many threads can read and update the catalog at once."""
+    storage = AssemblyStorage(sqlite_path=str(tmp_path), batch_size=5)
+    storage.upsert_assemblies(make_records(40))
+
+    def work(i):
+        # Read a row with the session of this thread, then update it.
+        row, = storage.iter_assemblies(
+            fields=['base_filename'], filters={'species': f'species{i}'})
+        storage.bulk_update_assemblies(
+            [(row.base_filename, {'taxonomy_id': str(i)})])
+        storage.catalog.remove_session()
+        return row.base_filename
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        names = list(executor.map(work, range(40)))
+
+    assert len(set(names)) == 40
+    assert sorted(int(a.taxonomy_id) for a in storage.iter_assemblies()) == (
+        list(range(40)))
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='requires os.fork')
+def test_forked_process_reconnects(tmp_path):
+    """A forked process opens its own connections to the catalog."""
+    storage = AssemblyStorage(sqlite_path=str(tmp_path))
+    storage.upsert_assemblies(make_records(2))
+    assert storage.count_assemblies() == 2
+
+    pid = os.fork()
+
+    if pid == 0:
+        try:
+            storage.upsert_assemblies(make_records(3))
+            os._exit(0 if storage.count_assemblies() == 3 else 1)
+        except BaseException:
+            os._exit(2)
+
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+    assert storage.count_assemblies() == 3
@@ -0,0 +1,52 @@
+"""Tests for the checksums.py module of Pynome.
+
+"""
+
+import os
+import shutil
+
+import pytest
+
+from pynome.checksums import BSDSum, SumProcess, parse_checksums
+
+
+def test_bsd_sum():
+    """Checksums match those of the `sum` command, however the data is
+    split, and are parsed from CHECKSUMS files in the same form."""
+    bsd_sum = BSDSum()
+    bsd_sum.update(b'hello ')
+    bsd_sum.update(b'world\n')
+    assert bsd_sum.value() == '3762 1'
+
+    bsd_sum = BSDSum()
+    bsd_sum.update(b'x' * 3000)
+    assert bsd_sum.value() == '5357 3'
+
+    assert parse_checksums([
+        '03762     1 hello.txt',
+        '05357     3 Candida_glabrata.ASM254v2.dna.toplevel.fa.gz',
+        'not a checksum line',
+    ]) == {
+        'hello.txt': '3762 1',
+        'Candida_glabrata.ASM254v2.dna.toplevel.fa.gz': '5357 3',
+    }
+
+
+@pytest.mark.skipif(shutil.which('sum') is None,
+                    reason='The sum command is not installed.')
+def test_sum_process():
+    """The `sum` process gives the same checksums as BSDSum, and is
+    stopped if its checksum is never read."""
+    data = os.urandom(100000)
+    bsd_sum, sum_process = BSDSum(), SumProcess()
+
+    for offset in range(0, len(data), 8192):
+        bsd_sum.update(data[offset:offset + 8192])
+        sum_process.update(data[offset:offset + 8192])
+
+    assert sum_process.value() == bsd_sum.value()
+
+    sum_process = SumProcess()
+    sum_process.update(data)
+    sum_process.close()
+    assert sum_process.process.returncode is not None
@@ -0,0 +1,218 @@
+"""Tests for the crawler.py module of Pynome.
+
+"""
+
+import ftplib
+
+import pytest
+
+from pynome.assemblystorage import AssemblyStorage
+from pynome.crawler import FTPCrawler, FTPEntry, list_ftp_dir
+from pynome.ensembldatabase import EnsemblDatabase
+from pynome.utils import crawl_ftp_dir
+
+from tests.conftest import FakeFTP, ListOnlyFTP
+
+
+IGNORED_DIRS = ['cdna', 'cds', 'dna_index', 'ncrna', 'pep']
+
+
+def serial_crawl(top_dirs):
+    """Crawl the FakeFTP tree with the serial crawl_ftp_dir function."""
+    found = list()
+    for top_dir in top_dirs:
+        crawl_ftp_dir(FakeFTP(), top_dir,
+                      lambda line, parent: found.append((parent, line)),
+                      IGNORED_DIRS)
+    return found
+
+
+def test_concurrent_crawl_matches_serial(fake_ftp, fake_top_dirs):
+    """The concurrent crawl yields the same files, in the same order, as
+    a serial crawl, regardless of the number of workers."""
+    expected = serial_crawl(fake_top_dirs)
+
+    for workers, max_pending in ((1, 1000), (3, 1), (8, 2)):
+        found = list()
+        with FTPCrawler('ftp.test', IGNORED_DIRS, workers,
+                        max_pending=max_pending) as crawler:
+            crawler.crawl(fake_top_dirs,
+                          lambda line, parent: found.append((parent, line)))
+
+        assert found == expected
+
+    # Ignored directories are never entered.
+    assert not any('/cdna/' in parent for parent, _ in expected)
+
+
+def test_worker_errors_are_raised(fake_ftp, fake_top_dirs, monkeypatch):
+    """An error raised while a worker handles a directory is raised by the
+    crawl when it reaches that directory, rather than leaving it waiting."""
+    broken_dir = 'pub/fungi/release-38/fasta/saccharomyces_cerevisiae/'
+
+    class BrokenFTP(fake_ftp):
+        def mlsd(self, path, facts=()):
+            if path == broken_dir:
+                raise ValueError('unparseable listing')
+            return super().mlsd(path, facts)
+
+    def dir_filter(directory):
+        if directory.endswith('/acremonium_chrysogenum_atcc_11550/'):
+            raise ValueError('bad filter')
+        return True
+
+    for ftp_class, crawl_filter in ((BrokenFTP, None), (fake_ftp, dir_filter)):
+        monkeypatch.setattr(ftplib, 'FTP', ftp_class)
+
+        with FTPCrawler('ftp.test', IGNORED_DIRS, 2,
+                        dir_filter=crawl_filter) as crawler:
+            with pytest.raises(ValueError):
+                list(crawler.iter_crawl(fake_top_dirs))
+
+
+def test_reconnected_worker_keeps_one_connection(
+        fake_ftp, fake_top_dirs, monkeypatch):
+    """A worker which reconnects, and then fails to list the directory,
+    keeps using its new connection."""
+    monkeypatch.setattr('pynome.crawler.time.sleep', lambda seconds: None)
+    missing_dir = 'pub/fungi/release-38/fasta/saccharomyces_cerevisiae/'
+    connections = list()
+
+    class DroppingFTP(fake_ftp):
+        def connect(self, host):
+            self.closed = False
+            connections.append(self)
+
+        def quit(self):
+            self.closed = True
+
+        def close(self):
+            self.closed = True
+
+        def mlsd(self, path, facts=()):
+            if self.closed:
+                raise EOFError()
+            # Drop the first connection on the missing directory.
+            if path == missing_dir and len(connections) == 1:
+                raise EOFError()
+            if path == missing_dir:
+                raise ftplib.error_perm('550 Failed to change directory.')
+            return super().mlsd(path, facts)
+
+    monkeypatch.setattr(ftplib, 'FTP', DroppingFTP)
+
+    with FTPCrawler('ftp.test', IGNORED_DIRS, 1,
+                    skip_missing=True) as crawler:
+        found = list(crawler.iter_crawl(fake_top_dirs))
+
+    assert found
+    assert len(connections) == 2
+    assert all(ftp.closed for ftp in connections)
+
+
+def test_list_ftp_dir_mlsd_and_list_fallback():
+    """MLSD and LIST listings give the same typed entries."""
+    directory = 'pub/fungi/release-38/fasta/'
+
+    mlsd_entries = list_ftp_dir(FakeFTP(), directory)
+    list_entries = list_ftp_dir(ListOnlyFTP(), directory)
+
+    assert mlsd_entries == list_entries
+    assert mlsd_entries[0] == FTPEntry(
+        'fungi_ascomycota1_collection', 'dir', 4096, '20180113000000')
+    assert mlsd_entries[-1].type == 'file'
+    assert mlsd_entries[-1].size == 120
+
+    # Once refused, MLSD is not tried again on the same host.
+    ftp = ListOnlyFTP()
+    list_ftp_dir(ftp, directory)
+    assert ftp.listed == [directory]
+
+
+def test_incremental_crawl_reuses_snapshots(fake_ftp, fake_top_dirs):
+    """An incremental crawl only lists the directories that changed."""
+    storage = AssemblyStorage()
+    snapshots = storage.snapshot_store('ensembl')
+
+    def crawl(incremental):
+        found = list()
+        fake_ftp.shared_log.clear()
+        with FTPCrawler('ftp.test', IGNORED_DIRS, 2, snapshots=snapshots,
+                        incremental=incremental) as crawler:
+            crawler.crawl(fake_top_dirs,
+                          lambda entry, parent: found.append((parent, entry)))
+        snapshots.commit()
+        return found, sorted(fake_ftp.shared_log)
+
+    full_found, full_listed = crawl(incremental=False)
+
+    # Nothing has changed, so only the top directories are listed.
+    found, listed = crawl(incremental=True)
+    assert found == full_found
+    assert listed == sorted(fake_top_dirs)
+
+    # Touch a species directory, only it and its parents are listed.
+    collection = 'pub/fungi/release-38/fasta/fungi_ascomycota1_collection/'
+    fake_ftp.default_tree['pub/fungi/release-38/fasta/'][0] = (
+        fake_ftp.default_tree['pub/fungi/release-38/fasta/'][0].replace(
+            '2018', '2019'))
+    fake_ftp.default_tree[collection][0] = (
+        fake_ftp.default_tree[collection][0].replace('2018', '2019'))
+
+    found, listed = crawl(incremental=True)
+    assert found == full_found
+    assert listed == sorted(fake_top_dirs + [
+        collection, collection + '_candida_glabrata/'])
+
+
+def test_resumed_crawl_skips_completed_directories(
+        fake_ftp, fake_top_dirs, test_config, monkeypatch, tmp_path):
+    """An interrupted crawl is resumed from the directories it had not
+    completed, and a dropped connection is reconnected."""
+    monkeypatch.setattr('pynome.crawler.time.sleep', lambda seconds: None)
+    broken_dir = 'pub/fungi/release-38/fasta/saccharomyces_cerevisiae/'
+    drops = list()
+
+    class FlakyFTP(fake_ftp):
+        def mlsd(self, path, facts=()):
+            # Drop the connection once on the gff3 tree, and fail the
+            # broken directory outright.
+            if path == fake_top_dirs[0] and not drops:
+                drops.append(path)
+                raise EOFError()
+            if path == broken_dir and len(drops) == 1:
+                raise ftplib.error_perm('550 Failed to list.')
+            return super().mlsd(path, facts)
+
+    monkeypatch.setattr(ftplib, 'FTP', FlakyFTP)
+
+    def crawl(resume):
+        # Each crawl uses a new connection to the catalog.
+        storage = AssemblyStorage(sqlite_path=str(tmp_path))
+        ed = EnsemblDatabase(**test_config['ensembl_config'])
+        ed.crawl(fake_top_dirs, snapshots=storage.snapshot_store('ensembl'),
+                 resume=resume)
+        return ed.assemblies
+
+    with pytest.raises(ftplib.error_perm):
+        crawl(resume=False)
+
+    assert drops == [fake_top_dirs[0]]
+
+    # The complete assemblies found before the failure were journaled.
+    saved = AssemblyStorage(sqlite_path=str(tmp_path)).query_local_assemblies()
+    assert [a.base_filename for a in saved] == ['candida_glabrata-ASM254v2']
+
+    # Allow the broken directory to be listed, and resume.
+    drops.append(None)
+    fake_ftp.shared_log.clear()
+    assemblies = crawl(resume=True)
+
+    assert broken_dir in fake_ftp.shared_log
+    assert (fake_top_dirs[0] + 'saccharomyces_cerevisiae/'
+            not in fake_ftp.shared_log)
+    assert [a.base_filename for a in assemblies] == [
+        'candida_glabrata-ASM254v2',
+        'Saccharomyces_cerevisiae-R64-1-1',
+        'Acremonium_chrysogenum_atcc_11550-ASM76942v1',
+    ]
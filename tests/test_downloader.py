@@ -0,0 +1,141 @@
+"""Tests for the downloader.py module of Pynome.
+
+"""
+
+import gzip
+import zlib
+import ftplib
+
+from pynome.assembly import Base
+from pynome.catalog import Catalog
+from pynome.checksums import ChecksumError, FileChecksum
+from pynome.downloader import DownloadTask, FTPDownloader
+
+
+def test_download(tmp_path, download_ftp):
+    """Files are downloaded concurrently, a dropped connection is retried,
+    and a failed file does not stop the others."""
+    download_ftp.missing.add('pub/missing.fa.gz')
+    download_ftp.flaky.add('pub/flaky.fa.gz')
+    paths = ['pub/missing.fa.gz', 'pub/flaky.fa.gz'] + [
+        f'pub/{i}.fa.gz' for i in range(6)]
+    tasks = [DownloadTask(path, str(tmp_path / path.split('/')[1]), None)
+             for path in paths]
+
+    results = FTPDownloader('ftp.example.org', workers=3,
+                            progress=False).download(tasks)
+
+    errors = {result.task.remote_path: result.error for result in results}
+    assert len(errors) == len(paths)
+    assert isinstance(errors.pop('pub/missing.fa.gz'), ftplib.error_perm)
+    assert set(errors.values()) == {None}
+
+    assert (tmp_path / 'flaky.fa.gz').read_bytes() == b'pub/flaky.fa.gz'
+    assert (tmp_path / '5.fa.gz').read_bytes() == b'pub/5.fa.gz'
+    assert not (tmp_path / 'missing.fa.gz').exists()
+
+    # Each of at most three workers connects once, and one reconnects after
+    # the drop. Every connection is closed.
+    assert len(download_ftp.connections) <= 4
+    assert all(ftp.closed for ftp in download_ftp.connections)
+
+
+def test_resume(tmp_path, download_ftp):
+    """Complete files are skipped, and partial files are resumed."""
+
+    def task(name):
+        path = f'pub/{name}.fa.gz'
+        return DownloadTask(path, str(tmp_path / f'{name}.fa.gz'), len(path))
+
+    (tmp_path / 'complete.fa.gz').write_bytes(b'pub/complete.fa.gz')
+    (tmp_path / 'partial.fa.gz.part').write_bytes(b'pub/par')
+    (tmp_path / 'stale.fa.gz.part').write_bytes(b'a much longer stale file')
+
+    results = FTPDownloader('ftp.example.org', progress=False).download(
+        [task('complete'), task('partial'), task('stale')])
+
+    assert [result.status for result in results] == [
+        'skipped', 'done', 'done']
+    assert download_ftp.requests == [
+        ('pub/partial.fa.gz', 7), ('pub/stale.fa.gz', None)]
+    assert (tmp_path / 'partial.fa.gz').read_bytes() == b'pub/partial.fa.gz'
+    assert (tmp_path / 'stale.fa.gz').read_bytes() == b'pub/stale.fa.gz'
+    assert not list(tmp_path.glob('*.part'))
+
+
+def test_checksums(tmp_path, download_ftp):
+    """Downloads are checked against the CHECKSUMS file of their directory,
+    corrupt downloads are retried, and every check is recorded."""
+    download_ftp.checksums['pub/sums/CHECKSUMS'] = [
+        '43210     1 good.fa.gz',
+        '44813     1 flaky.fa.gz',
+        '00001     1 bad.fa.gz']
+    download_ftp.corrupt['pub/sums/flaky.fa.gz'] = 1
+
+    catalog = Catalog('sqlite://')
+    Base.metadata.create_all(catalog.engine)
+
+    tasks = [DownloadTask(f'pub/sums/{name}.fa.gz',
+                          str(tmp_path / f'{name}.fa.gz'), None)
+             for name in ('good', 'flaky', 'bad')]
+    results = FTPDownloader('ftp.example.org', retries=2, progress=False,
+                            catalog=catalog).download(tasks)
+
+    statuses = {result.task.remote_path: result.status for result in results}
+    assert statuses == {'pub/sums/good.fa.gz': 'done',
+                        'pub/sums/flaky.fa.gz': 'done',
+                        'pub/sums/bad.fa.gz': 'failed'}
+    assert isinstance(results[-1].error, ChecksumError)
+    assert not (tmp_path / 'bad.fa.gz').exists()
+    assert not list(tmp_path.glob('*.part'))
+
+    checks = {check.remote_path: check.status
+              for check in catalog.session.query(FileChecksum)}
+    assert checks == {'pub/sums/good.fa.gz': 'verified',
+                      'pub/sums/flaky.fa.gz': 'verified',
+                      'pub/sums/bad.fa.gz': 'mismatch'}
+
+
+def test_decompress(tmp_path, download_ftp):
+    """Files are decompressed as they are downloaded, with or without a
+    compressed copy, and truncated files fail."""
+
+    fasta = b'>chr1\n' + b'ACGT' * 5000 + b'\n'
+    compressed = (gzip.compress(fasta[:1000], mtime=0)
+                  + gzip.compress(fasta[1000:], mtime=0))
+    download_ftp.files.update({
+        'pub/genome.fa.gz': compressed,
+        'pub/truncated.fa.gz': compressed[:-20]})
+
+    def download(directory, keep_compressed):
+        directory.mkdir()
+        return FTPDownloader(
+            'ftp.example.org', progress=False, decompress=True,
+            keep_compressed=keep_compressed).download([
+                DownloadTask(f'pub/{name}.fa.gz',
+                             str(directory / f'{name}.fa.gz'),
+                             len(compressed))
+                for name in ('genome', 'truncated')])
+
+    results = download(tmp_path / 'kept', True)
+    assert [result.status for result in results] == ['done', 'failed']
+    assert isinstance(results[1].error, zlib.error)
+    assert results[0].decompressed_path == str(
+        tmp_path / 'kept' / 'genome.fa')
+    assert (tmp_path / 'kept' / 'genome.fa').read_bytes() == fasta
+    assert (tmp_path / 'kept' / 'genome.fa.gz').read_bytes() == compressed
+    assert sorted(path.name for path in (tmp_path / 'kept').iterdir()) == [
+        'genome.fa', 'genome.fa.gz']
+
+    results = download(tmp_path / 'dropped', False)
+    assert [result.status for result in results] == ['done', 'failed']
+    assert sorted(path.name for path in (tmp_path / 'dropped').iterdir()) == [
+        'genome.fa']
+
+    # The decompressed file stands in for the compressed one.
+    results = FTPDownloader(
+        'ftp.example.org', progress=False, decompress=True,
+        keep_compressed=False).download([DownloadTask(
+            'pub/genome.fa.gz', str(tmp_path / 'dropped' / 'genome.fa.gz'),
+            len(compressed))])
+    assert results[0].status == 'skipped'
@@ -29,3 +29,115 @@
 #     # print([x for x in ed.assemblies])
 #
 #     ed.download_metadata()
+
+
+import pandas
+
+from pynome.assemblydatabase import AssemblyCoalescer
+from pynome.ensembldatabase import EnsemblDatabase
+
+
+def test_manifest_discovery(test_config, fake_ftp):
+    """In manifest mode only the directory of each species in the metadata
+    file is listed."""
+    ed = EnsemblDatabase(**dict(
+        test_config['ensembl_config'], discovery_mode='manifest'))
+    ed.metadata_df = pandas.DataFrame({
+        'species': ['_candida_glabrata', 'saccharomyces_cerevisiae',
+                    'pichia_missing', 'escherichia_coli'],
+        'division': ['EnsemblFungi', 'EnsemblFungi', 'EnsemblFungi',
+                     'EnsemblBacteria'],
+        'core_db': ['fungi_ascomycota1_collection_core_38_91_1',
+                    'saccharomyces_cerevisiae_core_38_91_4',
+                    'pichia_missing_core_38_91_1',
+                    'bacteria_0_collection_core_38_91_1'],
+    })
+
+    manifest = ed.manifest_dirs()
+    assert len(manifest) == 6
+    assert manifest[
+        'pub/fungi/release-38/fasta/fungi_ascomycota1_collection/'
+        '_candida_glabrata/dna/'] == '_candida_glabrata'
+    assert 'pub/fungi/release-38/gff3/saccharomyces_cerevisiae/' in manifest
+
+    ed.crawl()
+
+    # Only the species directories are listed, missing ones are skipped.
+    assert sorted(fake_ftp.shared_log) == sorted(manifest)
+    assert sorted(a.base_filename for a in ed.assemblies) == [
+        'Saccharomyces_cerevisiae-R64-1-1',
+        'candida_glabrata-ASM254v2',
+    ]
+    assert all(a.fasta_remote_path and a.gff3_remote_path
+               for a in ed.assemblies)
+
+
+def test_crawl_filters(test_config, fake_ftp, fake_top_dirs):
+    """Filtered directories are never listed."""
+    ed = EnsemblDatabase(**dict(
+        test_config['ensembl_config'],
+        crawl_filters={'species': {'include': ['candida_*']}}))
+
+    ed.crawl(fake_top_dirs)
+
+    assert not any('saccharomyces' in path or 'acremonium' in path
+                   for path in fake_ftp.shared_log)
+    assert [a.base_filename for a in ed.assemblies] == [
+        'candida_glabrata-ASM254v2']
+
+    # Exclude the collection, and limit the depth.
+    ed = EnsemblDatabase(**dict(
+        test_config['ensembl_config'],
+        crawl_filters={'collections': {'exclude': ['re:fungi_.*']},
+                       'max_depth': 1}))
+
+    assert ed.enter_directory('pub/fungi/release-38/fasta/')
+    assert not ed.enter_directory(
+        'pub/fungi/release-38/fasta/fungi_ascomycota1_collection/')
+    assert ed.enter_directory(
+        'pub/fungi/release-38/gff3/saccharomyces_cerevisiae/')
+    assert not ed.enter_directory(
+        'pub/fungi/release-38/fasta/saccharomyces_cerevisiae/dna/')
+
+
+def test_crawl_holds_one_kingdom(test_config, fake_ftp, monkeypatch):
+    """The datatypes of each kingdom are crawled together, so the
+    assemblies waiting on their second file never span several
+    kingdoms."""
+    # Serve a copy of the fungi tree, with other species, as plants.
+    renames = (('pub/fungi/', 'pub/plants/'), ('glabrata', 'auris'),
+               ('cerevisiae', 'paradoxus'), ('chrysogenum', 'rubens'))
+
+    def rename(text):
+        for old, new in renames:
+            text = text.replace(old, new)
+        return text
+
+    for directory, lines in list(fake_ftp.default_tree.items()):
+        fake_ftp.default_tree[rename(directory)] = [
+            rename(line) for line in lines]
+
+    pending_sizes = list()
+
+    class RecordingCoalescer(AssemblyCoalescer):
+        def add(self, record):
+            completed = super().add(record)
+            pending_sizes.append(len(self._pending))
+            return completed
+
+    monkeypatch.setattr(
+        'pynome.ensembldatabase.AssemblyCoalescer', RecordingCoalescer)
+
+    ed = EnsemblDatabase(**dict(
+        test_config['ensembl_config'], kingdoms=['fungi', 'plants']))
+
+    assert ed.top_dirs == [
+        'pub/fungi/release-38/gff3/', 'pub/fungi/release-38/fasta/',
+        'pub/plants/release-38/gff3/', 'pub/plants/release-38/fasta/']
+
+    ed.crawl()
+
+    assert len(ed.assemblies) == 6
+    # The two gff3 files of a kingdom, plus the fungi assembly which has
+    # no gff3 file, rather than every gff3 file of both kingdoms.
+    assert max(pending_sizes) == 3
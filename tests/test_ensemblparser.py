@@ -0,0 +1,48 @@
+"""Tests for the ensemblparser.py module of Pynome.
+
+"""
+
+import logging
+
+from pynome.crawler import list_ftp_dir
+from pynome.ensemblparser import EnsemblFile, EnsemblFilenameParser
+
+from tests.conftest import FAKE_TREE, FakeFTP
+
+
+BAD_FILENAMES = ['chromosome', 'abinitio', 'README', 'CHECKSUMS']
+
+
+def test_parse_many(caplog):
+    """Listing lines and FTPEntry tuples are parsed into the same records,
+    and malformed names are reported once."""
+    parser = EnsemblFilenameParser(BAD_FILENAMES)
+    top_dir = 'pub/fungi/release-38/fasta/fungi_ascomycota1_collection/' \
+        '_candida_glabrata/dna/'
+
+    lines = FAKE_TREE[top_dir] + [
+        '-rw-r--r--  1 ftp ftp 10 Jan 13  2018 broken.fa.gz',
+        '-rw-r--r--  1 ftp ftp 10 Jan 13  2018 md5sum.txt',
+    ]
+
+    with caplog.at_level(logging.WARNING):
+        records = parser.parse_many(lines, top_dir)
+        parser.parse_many(lines, top_dir)
+
+    assert records == [EnsemblFile(
+        kind='fasta', genus='candida', species='glabrata',
+        intraspecific_name=None, assembly_id='ASM254v2',
+        remote_path=top_dir + '_candida_glabrata.ASM254v2.dna.toplevel.fa.gz',
+        size=3650)]
+    assert caplog.text.count('broken.fa.gz') == 1
+
+    entries = list_ftp_dir(FakeFTP(), top_dir)
+    assert parser.parse_many(entries, top_dir) == records
+
+    # A gff3 file with an intraspecific name.
+    record = parser.parse(
+        '-rw-r--r--  1 ftp ftp 99 Jan 13  2018 '
+        'Acremonium_chrysogenum_atcc_11550.ASM76942v1.38.gff3.gz', 'gff3/')
+    assert record.kind == 'gff3'
+    assert record.intraspecific_name == 'atcc_11550'
+    assert record.assembly_id == 'ASM76942v1'
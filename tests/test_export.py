@@ -0,0 +1,48 @@
+"""Tests for the export.py module of Pynome.
+
+"""
+
+import pytest
+
+from pynome.assembly import AssemblyRecord
+from pynome.assemblystorage import AssemblyStorage
+
+
+@pytest.mark.parametrize('suffix', ['.tsv', '.parquet', '.arrow'])
+def test_export_and_import(tmp_path, suffix):
+    """An exported catalog is loaded back with the same values."""
+    if suffix != '.tsv':
+        pytest.importorskip('pyarrow')
+
+    storage = AssemblyStorage(batch_size=2)
+    storage.upsert_assemblies([
+        AssemblyRecord(species='glabrata', genus='Candida',
+                       assembly_id='ASM254v2', version='release-38',
+                       fasta_remote_path='pub/glabrata.fa.gz',
+                       fasta_remote_size=2048, taxonomy_id='5478'),
+        AssemblyRecord(species='albicans', genus='Candida',
+                       intraspecific_name='sc5314',
+                       assembly_id='GCA_000182965v3'),
+        AssemblyRecord(species='cerevisiae', genus='Saccharomyces',
+                       assembly_id='R64-1-1', gff3_remote_size=0),
+    ])
+
+    path = str(tmp_path / ('catalog' + suffix))
+    assert storage.export_catalog(path) == 3
+
+    copy = AssemblyStorage(batch_size=2)
+    assert copy.import_catalog(path) == 3
+
+    def rows(catalog):
+        return list(catalog.iter_assemblies(
+            fields=['base_filename', 'version', 'intraspecific_name',
+                    'fasta_remote_size', 'gff3_remote_size', 'taxonomy_id'],
+            order_by='base_filename'))
+
+    assert rows(copy) == rows(storage)
+
+    if suffix == '.parquet':
+        import pyarrow.parquet
+        schema = pyarrow.parquet.read_schema(path)
+        assert str(schema.field('fasta_remote_size').type) == 'int64'
+        assert pyarrow.parquet.ParquetFile(path).num_row_groups == 2
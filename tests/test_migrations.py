@@ -0,0 +1,52 @@
+"""Tests for the migrations.py module of Pynome.
+
+"""
+
+import sqlite3
+
+from pynome.assemblystorage import AssemblyStorage
+from pynome.migrations import SCHEMA_VERSION
+
+
+def test_migrate_existing_catalog(tmp_path):
+    """A catalog created before the indexes and release-aware primary key
+    existed is upgraded in place."""
+    db_path = str(tmp_path / 'Genome.db')
+
+    # Create a catalog with the original, unindexed Assemblies table.
+    connection = sqlite3.connect(db_path)
+    connection.execute(
+        'CREATE TABLE "Assemblies" (base_filename VARCHAR PRIMARY KEY, '
+        'base_filepath VARCHAR, species VARCHAR, genus VARCHAR, '
+        'intraspecific_name VARCHAR, assembly_id VARCHAR, version VARCHAR, '
+        'gff3_remote_path VARCHAR, gff3_remote_size INTEGER, '
+        'fasta_remote_path VARCHAR, fasta_remote_size INTEGER, '
+        'taxonomy_name VARCHAR, taxonomy_id VARCHAR, '
+        'source_database VARCHAR)')
+    connection.execute(
+        'INSERT INTO "Assemblies" (base_filename, species) '
+        "VALUES ('Candida_glabrata-ASM254v2', 'glabrata')")
+    connection.commit()
+    connection.close()
+
+    storage = AssemblyStorage(sqlite_path=str(tmp_path))
+    assert len(storage.query_local_assemblies_by('species', 'glabrata')) == 1
+
+    connection = sqlite3.connect(db_path)
+    indexes = {name for name, in connection.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' "
+        "AND tbl_name = 'Assemblies' AND name LIKE 'ix_%'")}
+    assert indexes == {
+        'ix_Assemblies_species', 'ix_Assemblies_genus',
+        'ix_Assemblies_taxonomy_id', 'ix_Assemblies_source_database'}
+    assert connection.execute(
+        'PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION
+    assert connection.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+
+    # The release version is part of the primary key.
+    primary_key = [name for _, name, _, _, _, pk in connection.execute(
+        'PRAGMA table_info("Assemblies")') if pk]
+    assert primary_key == ['base_filename', 'version']
+    assert connection.execute(
+        'SELECT version FROM "Assemblies"').fetchall() == [('',)]
+    connection.close()
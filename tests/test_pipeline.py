@@ -0,0 +1,111 @@
+"""Tests for the pipeline.py module of Pynome.
+
+"""
+
+import os
+import gzip
+import subprocess
+
+from pynome.assembly import AssemblyRecord
+from pynome.assemblystorage import AssemblyStorage
+from pynome.pipeline import StageRun
+
+
+def test_prepare_skips_current_stages(tmp_path):
+    """Only stages that failed, or whose inputs changed, are run again."""
+    storage = AssemblyStorage(base_path=str(tmp_path))
+    record = AssemblyRecord(species='glabrata', genus='Candida',
+                            assembly_id='ASM254v2')
+    storage.upsert_assemblies([record])
+
+    # Write the downloaded files.
+    os.makedirs(os.path.dirname(storage.assembly_path(record)))
+    for suffix in ('.fa.gz', '.gff3.gz'):
+        with gzip.open(storage.assembly_path(record, suffix), 'wb') as f:
+            f.write(b'content')
+
+    runs = list()
+    exit_codes = {'hisat_index': [1, 0]}
+
+    def fake_stage(name, suffix):
+        def run(assembly):
+            runs.append(name)
+            with open(storage.assembly_path(assembly, suffix), 'w') as f:
+                f.write(name)
+            returncode = exit_codes.get(name, [0]).pop(0)
+            return subprocess.CompletedProcess([name], returncode)
+        return run
+
+    storage.hisat_index = fake_stage('hisat_index', '.1.ht2')
+    storage.gtf = fake_stage('gtf', '.gtf')
+    storage.splice_site = fake_stage('splice_site', '.Splice_sites')
+
+    # The failed index does not stop the other stages.
+    assert storage.prepare_all() == (0, 1)
+    assert runs == ['hisat_index', 'gtf', 'splice_site']
+    assert os.path.exists(storage.assembly_path(record, '.fa'))
+
+    # Only the failed stage is run again.
+    runs.clear()
+    assert storage.prepare_all() == (1, 0)
+    assert runs == ['hisat_index']
+
+    # Nothing is run on an unchanged catalog.
+    runs.clear()
+    assert storage.prepare_all() == (1, 0)
+    assert runs == []
+
+    # A changed input reruns the stages that depend on it.
+    changed = storage.assembly_path(record, '.gff3.new')
+    with open(changed, 'w') as f:
+        f.write('changed')
+    os.replace(changed, storage.assembly_path(record, '.gff3'))
+    assert storage.prepare_all() == (1, 0)
+    assert runs == ['gtf', 'splice_site']
+
+    statuses = {run.stage: (run.status, run.exit_code)
+                for run in storage.session.query(StageRun)}
+    assert statuses == {'decompress': ('done', 0), 'hisat_index': ('done', 0),
+                        'gtf': ('done', 0), 'splice_site': ('done', 0)}
+
+
+def test_prepare_reuses_outputs_of_identical_inputs(tmp_path):
+    """An assembly with the same files as a prepared one links its outputs
+    instead of running the stages again."""
+    storage = AssemblyStorage(base_path=str(tmp_path))
+    records = [AssemblyRecord(species='glabrata', genus='Candida',
+                              assembly_id=assembly_id)
+               for assembly_id in ('ASM254v1', 'ASM254v2')]
+    storage.upsert_assemblies(records)
+
+    # Both assemblies are downloaded with identical contents.
+    for record in records:
+        os.makedirs(os.path.dirname(storage.assembly_path(record)))
+        for suffix in ('.fa.gz', '.gff3.gz'):
+            download = storage.assembly_path(record, suffix + '.part')
+            with open(download, 'wb') as f:
+                f.write(gzip.compress(suffix.encode(), mtime=0))
+            storage.blobs.store(download, storage.assembly_path(record, suffix))
+
+    runs = list()
+
+    def fake_stage(name, suffix):
+        def run(assembly):
+            runs.append(name)
+            with open(storage.assembly_path(assembly, suffix), 'w') as f:
+                f.write(name)
+            return subprocess.CompletedProcess([name], 0)
+        return run
+
+    storage.hisat_index = fake_stage('hisat_index', '.1.ht2')
+    storage.gtf = fake_stage('gtf', '.gtf')
+    storage.splice_site = fake_stage('splice_site', '.Splice_sites')
+
+    assert storage.prepare_all() == (2, 0)
+    assert runs == ['hisat_index', 'gtf', 'splice_site']
+
+    # Each file is stored once, and linked into both assemblies.
+    for suffix in ('.fa.gz', '.fa', '.1.ht2', '.Splice_sites'):
+        first, second = (os.stat(storage.assembly_path(record, suffix))
+                         for record in records)
+        assert first.st_ino == second.st_ino
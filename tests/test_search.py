@@ -0,0 +1,38 @@
+"""Tests for the search.py module of Pynome.
+
+"""
+
+from pynome.assembly import AssemblyRecord
+from pynome.assemblystorage import AssemblyStorage
+
+
+def test_search():
+    """Searches match prefixes and misspellings, and follow updates."""
+    storage = AssemblyStorage()
+    storage.upsert_assemblies([
+        AssemblyRecord(species='glabrata', genus='Candida',
+                       assembly_id='ASM254v2'),
+        AssemblyRecord(species='albicans', genus='Candida',
+                       intraspecific_name='sc5314',
+                       assembly_id='GCA_000182965v3'),
+        AssemblyRecord(species='cerevisiae', genus='Saccharomyces',
+                       assembly_id='R64-1-1'),
+    ])
+
+    def names(query):
+        return [result.base_filename for result in storage.search(query)]
+
+    assert names('candida glab') == ['Candida_glabrata-ASM254v2']
+    assert names('sc53') == ['Candida_albicans_sc5314-GCA_000182965v3']
+    assert names('cerevisae') == ['Saccharomyces_cerevisiae-R64-1-1']
+    assert sorted(names('candida')) == [
+        'Candida_albicans_sc5314-GCA_000182965v3',
+        'Candida_glabrata-ASM254v2']
+    assert names('zygosaccharomyces') == []
+
+    # The index follows updates to the catalog.
+    storage.bulk_update_assemblies([
+        ('Candida_glabrata-ASM254v2',
+         {'taxonomy_name': 'Nakaseomyces_glabratus'})])
+    assert names('nakaseomyces') == ['Candida_glabrata-ASM254v2']
+    assert names('glabratus') == ['Candida_glabrata-ASM254v2']